@@ -1,7 +1,11 @@
 import streamlit as st
 import json
-from schemas import VeoPromptSchema, UnstructuredInput
+import time
+from schemas import AspectRatio, Duration, VeoPromptSchema, UnstructuredInput
 from gemini_service import GeminiSchemaEnforcer
+from config import load_config
+from errors import CircuitOpenError, SchemaEnforcerError
+from variants import export_zip
 
 # Page configuration
 st.set_page_config(
@@ -34,13 +38,75 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_enforcer():
+    """
+    Process-wide enforcer shared by every browser session, so the Gemini client,
+    response cache, rate limiter and in-flight request coalescing are shared too
+    """
+    return GeminiSchemaEnforcer.from_config(load_config())
+
+try:
+    enforcer = get_enforcer()
+except SchemaEnforcerError as e:
+    st.error(f"Failed to initialize Gemini: {str(e)}")
+    st.stop()
+
 # Initialize session state
-if 'gemini_enforcer' not in st.session_state:
-    st.session_state.gemini_enforcer = GeminiSchemaEnforcer()
 if 'structured_output' not in st.session_state:
     st.session_state.structured_output = None
 if 'input_text' not in st.session_state:
     st.session_state.input_text = ""
+if 'timing' not in st.session_state:
+    st.session_state.timing = None
+if 'variants' not in st.session_state:
+    st.session_state.variants = None
+
+STYLE_FIELDS = ("style", "duration_seconds", "aspect_ratio", "generate_audio")
+
+
+def _plain(value):
+    return value.model_dump(mode="json") if hasattr(value, "model_dump") else getattr(value, "value", value)
+
+
+def stream_output(user_input: str):
+    """
+    Fill the Subject, Scene and Technical Specs panels as streamed sections
+    arrive; returns (result, time to first field, total seconds)
+    """
+    live = st.empty()
+    with live.container():
+        col_left, col_right = st.columns([1, 1])
+        with col_left:
+            st.subheader("🎭 Subject & Scene")
+            panels = {"subject": ("Subject", st.empty()), "scene": ("Scene", st.empty())}
+        with col_right:
+            st.subheader("🎥 Technical Specs")
+            panels["shot"] = ("Shot Composition", st.empty())
+            panels["camera_motion"] = ("Camera Motion", st.empty())
+            panels["style"] = ("Style & Parameters", st.empty())
+    for title, panel in panels.values():
+        panel.markdown(f"**{title}:** ⏳")
+
+    style = {}
+    first_field = None
+    for event in enforcer.stream_to_schema(user_input):
+        if event.final:
+            live.empty()
+            return event.value, first_field, event.elapsed_seconds
+        if first_field is None:
+            first_field = event.elapsed_seconds
+        if event.section in STYLE_FIELDS:
+            style[event.section] = _plain(event.value)
+            name, value = "style", style
+        elif event.section in panels:
+            name, value = event.section, _plain(event.value)
+        else:
+            continue
+        title, panel = panels[name]
+        with enforcer.metrics.stage("render"), panel.container():
+            st.markdown(f"**{title}:**")
+            st.json(value)
 
 # Header
 st.markdown('<h1 class="main-header">🎬 Veo Schema-Enforcing API</h1>', unsafe_allow_html=True)
@@ -74,6 +140,51 @@ with st.sidebar:
             st.session_state.input_text = prompt
             st.rerun()
 
+    st.header("⚡ Response Cache")
+    cache_stats = enforcer.cache.stats
+    cache_col1, cache_col2 = st.columns(2)
+    cache_col1.metric("Hits", cache_stats["hits"])
+    cache_col2.metric("Misses", cache_stats["misses"])
+    st.caption(f"Hit rate: {cache_stats['hit_rate']:.0%} · {cache_stats['entries']} entries in memory")
+    flight_stats = enforcer.single_flight.stats
+    st.caption(
+        f"Coalesced requests: {flight_stats['coalesced']} of "
+        f"{flight_stats['coalesced'] + flight_stats['upstream_calls']} "
+        f"({flight_stats['coalesced_ratio']:.0%})"
+    )
+    repair_stats = enforcer.repair_stats.stats
+    st.caption(
+        f"Repaired locally: {repair_stats['repaired_locally']} · "
+        f"targeted re-asks: {repair_stats['targeted_reasks']} · "
+        f"full retries avoided: {repair_stats['full_retries_avoided']}"
+    )
+    if enforcer.near_duplicates is not None:
+        near_stats = enforcer.near_duplicates.stats
+        st.caption(
+            f"Near-duplicates: {near_stats['reused']} reused · {near_stats['seeded']} seeded "
+            f"of {near_stats['lookups']} lookups ({near_stats['avg_lookup_ms']:.1f} ms per lookup)"
+        )
+    stream_stats = enforcer.stream_stats.stats
+    if stream_stats["streams"]:
+        st.caption(
+            f"Streaming: first field after {stream_stats['avg_time_to_first_field']:.2f}s, "
+            f"complete after {stream_stats['avg_total_latency']:.2f}s on average"
+        )
+
+    if enforcer.metrics.enabled:
+        with st.expander("🩺 Diagnostics"):
+            snapshot = enforcer.metrics.snapshot()
+            st.markdown("**Mean time per stage (ms):**")
+            st.json({name: round(stage["mean_ms"], 3) for name, stage in snapshot["stages"].items()})
+            st.markdown("**Counters:**")
+            st.json(snapshot["counters"])
+            st.download_button(
+                label="⬇️ Prometheus metrics",
+                data=enforcer.metrics.prometheus(),
+                file_name="metrics.prom",
+                mime="text/plain"
+            )
+
 # Main content area
 tab1, tab2, tab3 = st.tabs(["🎯 Generate Prompt", "📋 View Schema", "ℹ️ How It Works"])
 
@@ -96,9 +207,14 @@ with tab1:
     
     with col2:
         clear_button = st.button("🗑️ Clear", use_container_width=True)
+
+    with col3:
+        streaming = st.checkbox("⚡ Show sections as they arrive", value=True)
     
     if clear_button:
         st.session_state.structured_output = None
+        st.session_state.timing = None
+        st.session_state.variants = None
         st.session_state.input_text = ""
         st.rerun()
     
@@ -106,16 +222,38 @@ with tab1:
     if generate_button and user_input:
         with st.spinner("🔄 Processing with Gemini AI..."):
             try:
-                structured_output = st.session_state.gemini_enforcer.normalize_to_schema(user_input)
+                if streaming:
+                    structured_output, first_field, total = stream_output(user_input)
+                else:
+                    started = time.perf_counter()
+                    structured_output = enforcer.normalize_to_schema(user_input)
+                    first_field, total = None, time.perf_counter() - started
                 st.session_state.structured_output = structured_output
+                st.session_state.timing = (first_field, total)
+                st.session_state.variants = None
                 st.success("✅ Schema generated successfully!")
+            except CircuitOpenError as e:
+                if e.fallback is None:
+                    st.error(f"❌ Error: {str(e)}")
+                else:
+                    st.session_state.structured_output = e.fallback
+                    st.session_state.timing = None
+                    st.session_state.variants = None
+                    st.warning("⚠️ Gemini is temporarily unavailable: showing a basic prompt built locally from your description.")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
     # Display results
     if st.session_state.structured_output:
+        render_started = time.perf_counter()
         st.divider()
         st.header("📊 Structured Output")
+        if st.session_state.timing:
+            first_field, total = st.session_state.timing
+            if first_field is not None:
+                st.caption(f"⏱️ First field after {first_field:.2f}s · complete after {total:.2f}s")
+            else:
+                st.caption(f"⏱️ Complete after {total:.2f}s")
         
         # Create two columns for better layout
         col_left, col_right = st.columns([1, 1])
@@ -185,6 +323,53 @@ with tab1:
             use_container_width=True
         )
 
+        with st.expander("🎞️ Aspect Ratio & Duration Variants"):
+            st.markdown(
+                "Aspect ratio and duration are rewritten locally. A shot composed for the other "
+                "orientation is re-framed with one short model call covering only the shot and camera motion."
+            )
+            variant_col1, variant_col2 = st.columns(2)
+            with variant_col1:
+                aspect_ratios = st.multiselect(
+                    "Aspect ratios", [ratio.value for ratio in AspectRatio], default=[ratio.value for ratio in AspectRatio]
+                )
+            with variant_col2:
+                durations = st.multiselect(
+                    "Durations (seconds)", [duration.value for duration in Duration],
+                    default=[duration.value for duration in Duration]
+                )
+            reframe = st.checkbox("Re-frame shots for a new orientation", value=True)
+            if st.button("🎞️ Build Variants", disabled=not (aspect_ratios and durations)):
+                with st.spinner("Building variants..."):
+                    try:
+                        st.session_state.variants = enforcer.variants(
+                            output, aspect_ratios=aspect_ratios, durations=durations, reframe=reframe
+                        )
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
+            if st.session_state.variants:
+                st.dataframe(
+                    [
+                        {
+                            "variant": variant.name,
+                            "framing": variant.prompt.shot.framing,
+                            "camera motion": variant.prompt.camera_motion.type,
+                            "re-framed": variant.reframed,
+                            "note": variant.note or "",
+                        }
+                        for variant in st.session_state.variants
+                    ],
+                    use_container_width=True
+                )
+                st.download_button(
+                    label=f"⬇️ Download all {len(st.session_state.variants)} variants (zip)",
+                    data=export_zip(st.session_state.variants),
+                    file_name="veo_prompt_variants.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+        enforcer.metrics.observe("render", time.perf_counter() - render_started)
+
 with tab2:
     st.header("📋 Veo Prompt Schema Structure")
     st.markdown("""
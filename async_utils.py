@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Process-wide event loop running in a daemon thread. Sync callers
+    (Streamlit sessions, worker threads) submit coroutines here so the async
+    Gemini client, semaphores and limiters all live on a single loop.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="gemini-event-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the background loop and block until it finishes"""
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the background event loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+async def _anext(iterator):
+    return await iterator.__anext__()
+
+
+def iterate_sync(async_iterable):
+    """Iterate an async iterable from sync code, running each step on the background loop"""
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                item = run_sync(_anext(iterator))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if hasattr(iterator, "aclose"):
+            run_sync(iterator.aclose())
@@ -0,0 +1,288 @@
+"""
+Model backends behind GeminiSchemaEnforcer.
+
+A backend takes a prompt plus the tools/tool_config and returns a
+GenerationResult. GeminiBackend talks to the real API; StubBackend is a local,
+deterministic stand-in for load tests and benchmarks that runs offline.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from collections.abc import Mapping
+from typing import Any, AsyncIterator, List, Optional, Protocol
+
+from errors import InitializationError, RateLimitedError, UpstreamError
+
+# Connection-level failures below the SDK's own exception types; worth retrying.
+# Anything else raised by a backend is a bug and propagates unchanged.
+TRANSPORT_ERRORS = (ConnectionError,)
+
+
+def to_plain(value):
+    """Recursively convert proto map/repeated containers into dicts and lists"""
+    if isinstance(value, Mapping):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (str, bytes)):
+        return value
+    if hasattr(value, "__iter__") and not isinstance(value, dict):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def _struct_value(value):
+    kind = value.WhichOneof("kind")
+    if kind == "struct_value":
+        return {key: _struct_value(item) for key, item in value.struct_value.fields.items()}
+    if kind == "list_value":
+        return [_struct_value(item) for item in value.list_value.values]
+    if kind == "null_value" or kind is None:
+        return None
+    return getattr(value, kind)
+
+
+def function_call_args(function_call) -> dict:
+    """
+    Function-call args as plain dicts and lists, read in one pass over the raw
+    protobuf Struct (several times faster than walking the proto-plus wrappers)
+    """
+    try:
+        struct = type(function_call).pb(function_call).args
+    except (AttributeError, TypeError):
+        return to_plain(function_call.args)
+    return {key: _struct_value(item) for key, item in struct.fields.items()}
+
+
+@dataclass
+class FunctionCall:
+    name: str
+    args: Any
+
+
+@dataclass
+class GenerationResult:
+    """Backend-neutral view of a model response"""
+    function_calls: List[FunctionCall] = field(default_factory=list)
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    decode_seconds: float = 0.0
+
+
+class ModelBackend(Protocol):
+    model_name: str
+
+    async def generate(self, prompt: str, tools: list, tool_config: dict) -> GenerationResult:
+        ...
+
+    def stream_json(self, prompt: str, parameters: dict) -> AsyncIterator[str]:
+        """Stream the text of a JSON response to `prompt` whose schema is `parameters`"""
+        ...
+
+
+class GeminiBackend:
+    """
+    Gemini API backend; google.generativeai is imported on construction. Each
+    backend owns a public GenerativeServiceAsyncClient for its own API key
+    instead of the process-global genai.configure() behind
+    GenerativeModel.generate_content_async, so several keys can be used side
+    by side. Requests are built with the library's public protos and
+    content_types helpers.
+    """
+
+    def __init__(self, api_key: str, model_name: str):
+        try:
+            from google.generativeai import protos  # noqa: F401
+        except Exception as e:
+            raise InitializationError(f"Failed to initialize Gemini: {str(e)}") from e
+        self.model_name = model_name
+        self._api_key = api_key
+        self.client = None
+
+    def _ensure_client(self):
+        # Created lazily so the gRPC channel binds to the loop that runs the calls
+        if self.client is None:
+            from google.ai import generativelanguage as glm
+
+            self.client = glm.GenerativeServiceAsyncClient(client_options={"api_key": self._api_key})
+        return self.client
+
+    def _request(self, prompt: str, **fields):
+        from google.generativeai import protos
+        from google.generativeai.types import content_types
+
+        model = self.model_name if "/" in self.model_name else f"models/{self.model_name}"
+        return protos.GenerateContentRequest(model=model, contents=content_types.to_contents(prompt), **fields)
+
+    async def generate(self, prompt: str, tools: list, tool_config: dict) -> GenerationResult:
+        from google.api_core import exceptions as api_exceptions
+
+        from google.generativeai.types import content_types
+
+        request = self._request(
+            prompt,
+            tools=content_types.to_function_library(tools).to_proto(),
+            tool_config=content_types.to_tool_config(tool_config)
+        )
+        try:
+            response = await self._ensure_client().generate_content(request)
+        except api_exceptions.ResourceExhausted as e:
+            raise RateLimitedError(str(e)) from e
+        except api_exceptions.ClientError as e:
+            # 4xx other than 429: the same request will fail again
+            raise UpstreamError(str(e), retryable=False) from e
+        except api_exceptions.GoogleAPIError as e:
+            raise UpstreamError(str(e)) from e
+        except TRANSPORT_ERRORS as e:
+            raise UpstreamError(f"{type(e).__name__}: {e}") from e
+
+        started = time.perf_counter()
+        function_calls = []
+        if response.candidates:
+            for part in response.candidates[0].content.parts:
+                if part.function_call:
+                    function_calls.append(FunctionCall(part.function_call.name, function_call_args(part.function_call)))
+        usage = getattr(response, "usage_metadata", None)
+        return GenerationResult(
+            function_calls=function_calls,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+            total_tokens=getattr(usage, "total_token_count", None),
+            decode_seconds=time.perf_counter() - started
+        )
+
+    async def stream_json(self, prompt: str, parameters: dict) -> AsyncIterator[str]:
+        """
+        JSON-mode streaming. The schema is already described in the prompt;
+        it is not sent as response_schema because that does not keep key order.
+        """
+        from google.api_core import exceptions as api_exceptions
+
+        request = self._request(prompt, generation_config={"response_mime_type": "application/json"})
+        try:
+            response = await self._ensure_client().stream_generate_content(request)
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].content.parts:
+                    yield "".join(part.text for part in chunk.candidates[0].content.parts)
+        except api_exceptions.ResourceExhausted as e:
+            raise RateLimitedError(str(e)) from e
+        except api_exceptions.ClientError as e:
+            raise UpstreamError(str(e), retryable=False) from e
+        except api_exceptions.GoogleAPIError as e:
+            raise UpstreamError(str(e)) from e
+        except TRANSPORT_ERRORS as e:
+            raise UpstreamError(f"{type(e).__name__}: {e}") from e
+
+
+_ONE_OF = re.compile(r"One of: ([^.]+)\.")
+_ID_TAG = re.compile(r"^\[id:([^\]\s]+)\]", re.MULTILINE)
+
+
+class StubBackend:
+    """
+    Offline backend returning schema-valid function-call payloads built from
+    the declaration it is given. Latency (a fixed part, jitter and an optional
+    per-token part), error rate and throttling (a requests-per-minute window
+    that raises RateLimitedError, like a 429) are configurable; a seed makes
+    runs reproducible. `quota_window_seconds` shortens the quota window so
+    benchmarks can compress time.
+    """
+
+    def __init__(self, latency_seconds: float = 0.05, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, requests_per_minute: Optional[float] = None,
+                 seed: Optional[int] = None, model_name: str = "stub",
+                 seconds_per_token: float = 0.0, quota_window_seconds: float = 60.0):
+        self.model_name = model_name
+        self.latency_seconds = latency_seconds
+        self.seconds_per_token = seconds_per_token
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.quota_window_seconds = quota_window_seconds
+        self.random = random.Random(seed)
+        self._window = deque()
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def _throttle(self):
+        if self.requests_per_minute is None:
+            return
+        now = time.monotonic()
+        while self._window and now - self._window[0] > self.quota_window_seconds:
+            self._window.popleft()
+        if len(self._window) >= self.requests_per_minute:
+            self.throttled += 1
+            raise RateLimitedError("429 Resource has been exhausted (stub quota)")
+        self._window.append(now)
+
+    def _value(self, name: str, schema: dict, prompt: str):
+        type_ = schema["type"]
+        if type_ == "object":
+            return {
+                child_name: self._value(child_name, child, prompt)
+                for child_name, child in schema.get("properties", {}).items()
+            }
+        if type_ == "array":
+            item_schema = schema["items"]
+            if "id" in item_schema.get("properties", {}):
+                # Packed request: one entry per tagged description, like the real model
+                return [
+                    {**self._value(name, item_schema, f"{prompt}|{item_id}"), "id": item_id}
+                    for item_id in _ID_TAG.findall(prompt)
+                ]
+            return [self._value(name, item_schema, prompt)]
+        if "enum" in schema:
+            return self.random.choice(schema["enum"])
+        if type_ == "integer":
+            match = _ONE_OF.search(schema.get("description", ""))
+            if match:
+                return int(self.random.choice(match.group(1).split(", ")))
+            return self.random.randint(1, 10)
+        if type_ == "number":
+            return self.random.random()
+        if type_ == "boolean":
+            return True
+        return f"{name.replace('_', ' ')} {zlib.crc32(prompt.encode('utf-8')):08x}"
+
+    async def generate(self, prompt: str, tools: list, tool_config: dict) -> GenerationResult:
+        self.calls += 1
+        self._throttle()
+        declaration = tools[0]["function_declarations"][0]
+        args = self._value(declaration["name"], declaration["parameters"], prompt)
+        prompt_tokens = max(1, (len(prompt) + len(str(declaration))) // 4)
+        output_tokens = max(1, len(str(args)) // 4)
+
+        latency = self.latency_seconds + self.random.uniform(0, self.latency_jitter)
+        latency += (prompt_tokens + output_tokens) * self.seconds_per_token
+        if latency:
+            await asyncio.sleep(latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.failed += 1
+            raise UpstreamError("500 Internal error (stub)")
+        return GenerationResult(
+            function_calls=[FunctionCall(declaration["name"], args)],
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            total_tokens=prompt_tokens + output_tokens
+        )
+
+    async def stream_json(self, prompt: str, parameters: dict,
+                          chunk_chars: int = 32) -> AsyncIterator[str]:
+        """Stream a generated payload as JSON text; the per-token latency applies per chunk"""
+        self.calls += 1
+        self._throttle()
+        text = json.dumps(self._value("veo_prompt", parameters, prompt))
+        await asyncio.sleep(self.latency_seconds + self.random.uniform(0, self.latency_jitter))
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.failed += 1
+            raise UpstreamError("500 Internal error (stub)")
+        for start in range(0, len(text), chunk_chars):
+            chunk = text[start:start + chunk_chars]
+            if self.seconds_per_token:
+                await asyncio.sleep(max(1, len(chunk) // 4) * self.seconds_per_token)
+            yield chunk
@@ -0,0 +1,421 @@
+"""
+Headless bulk normalizer: streams UnstructuredInput records from JSONL (or stdin)
+and writes VeoPromptResponse records to JSONL as each one completes.
+
+    python batch_normalize.py requests.jsonl -o results.jsonl --concurrency 8
+    cat requests.jsonl | python batch_normalize.py - --unordered > results.jsonl
+    python batch_normalize.py requests.jsonl -o results.jsonl --pack-size 8
+
+With --job-db the run is a durable job (see jobs.py): inputs and results are
+checkpointed to SQLite, duplicates are normalized once, and rerunning the same
+command after a crash or a quota wall resumes where it stopped.
+
+    python batch_normalize.py requests.jsonl -o results.jsonl --job-db jobs.db --job-id nightly
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from pydantic import ValidationError
+
+from cache import fingerprint, make_cache_key
+from errors import CircuitOpenError, RateLimitedError
+from jobs import DONE, FAILED, JobStore
+from keypool import BATCH, lane
+from schemas import UnstructuredInput, VeoPromptResponse, VeoPromptSchema
+
+
+@dataclass
+class BatchSummary:
+    """Throughput and error summary for a bulk run"""
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    pending: int = 0
+    elapsed_seconds: float = 0.0
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def format(self) -> str:
+        lines = [
+            f"Processed {self.total} records in {self.elapsed_seconds:.2f}s "
+            f"({self.throughput:.2f} records/s)",
+            f"  succeeded: {self.succeeded}",
+            f"  failed:    {self.failed}",
+        ]
+        for error_type, count in self.errors.most_common():
+            lines.append(f"    {error_type}: {count}")
+        if self.pending:
+            lines.append(f"  pending:   {self.pending} (rerun with the same job to resume)")
+        return "\n".join(lines)
+
+
+def iter_records(stream):
+    """Yield (line_number, raw_line) for every non-blank line without reading ahead"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def iter_chunks(records, size: int):
+    """Group (line_number, raw_line) records into lists of at most `size`"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _normalize_texts(enforcer, texts: list) -> list:
+    """
+    Normalize texts, packing them into shared model calls when there is more
+    than one, in the batch lane so interactive callers sharing the keys go
+    first. Returns a VeoPromptSchema or exception per text, in order.
+    """
+    with lane(BATCH):
+        if len(texts) == 1:
+            try:
+                return [enforcer.normalize_to_schema(texts[0])]
+            except Exception as e:
+                return [e]
+        if texts:
+            return enforcer.normalize_many(texts)
+        return []
+
+
+def _normalize_records(enforcer, chunk: list) -> list:
+    """
+    Normalize a chunk of (line_number, raw_line) records. Returns
+    (line_number, VeoPromptResponse or exception) pairs in input order.
+    """
+    outcomes = []
+    texts = []
+    for line_number, raw_line in chunk:
+        try:
+            record = UnstructuredInput.model_validate_json(raw_line)
+        except ValidationError as e:
+            outcomes.append((line_number, e))
+            continue
+        outcomes.append((line_number, record.text))
+        texts.append(record.text)
+
+    structured_prompts = iter(_normalize_texts(enforcer, texts))
+
+    results = []
+    for line_number, outcome in outcomes:
+        if isinstance(outcome, str):
+            structured_prompt = next(structured_prompts)
+            status = "success"
+            if isinstance(structured_prompt, CircuitOpenError) and structured_prompt.fallback is not None:
+                structured_prompt, status = structured_prompt.fallback, "degraded"
+            if not isinstance(structured_prompt, Exception):
+                structured_prompt = VeoPromptResponse(
+                    status=status,
+                    structured_prompt=structured_prompt,
+                    raw_text_input=outcome
+                )
+            outcome = structured_prompt
+        results.append((line_number, outcome))
+    return results
+
+
+def _write_error(summary: BatchSummary, errors_out, line_number: int, error_type: str, error: str):
+    summary.total += 1
+    summary.failed += 1
+    summary.errors[error_type] += 1
+    errors_out.write(json.dumps({
+        "line": line_number,
+        "status": "error",
+        "error_type": error_type,
+        "error": error
+    }) + "\n")
+    errors_out.flush()
+
+
+def _write_outcome(summary: BatchSummary, out, errors_out, line_number: int, outcome):
+    if isinstance(outcome, Exception):
+        error_type = "InvalidInput" if isinstance(outcome, ValidationError) else type(outcome).__name__
+        _write_error(summary, errors_out, line_number, error_type, str(outcome))
+        return
+    summary.total += 1
+    summary.succeeded += 1
+    out.write(outcome.model_dump_json() + "\n")
+    out.flush()
+
+
+def run_batch(enforcer, records, out, errors_out, concurrency: int = 4,
+              ordered: bool = True, pack_size: int = 1) -> BatchSummary:
+    """
+    Normalize records with at most `concurrency` workers in flight, each
+    handling `pack_size` records (packed into shared model calls when above 1).
+    At most 2 * concurrency * pack_size records are held in memory at any time,
+    so memory stays constant regardless of input size. With ordered=True
+    results are written in input order, otherwise as soon as each chunk completes.
+    """
+    summary = BatchSummary()
+    window = max(1, concurrency * 2)
+    started = time.perf_counter()
+
+    def emit(future):
+        for line_number, outcome in future.result():
+            _write_outcome(summary, out, errors_out, line_number, outcome)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        chunks = iter_chunks(records, max(1, pack_size))
+        if ordered:
+            in_flight = deque()
+            for chunk in chunks:
+                if len(in_flight) >= window:
+                    emit(in_flight.popleft())
+                in_flight.append(executor.submit(_normalize_records, enforcer, chunk))
+            while in_flight:
+                emit(in_flight.popleft())
+        else:
+            in_flight = set()
+            for chunk in chunks:
+                if len(in_flight) >= window:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        emit(future)
+                in_flight.add(executor.submit(_normalize_records, enforcer, chunk))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    emit(future)
+
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
+
+
+def _ingest(enforcer, store: JobStore, job_id: str, records, after_line: int, checkpoint_every: int):
+    """Record the job's inputs with their content hashes, committing every `checkpoint_every` lines"""
+    items = []
+    line_number = after_line
+    for line_number, raw_line in records:
+        if line_number <= after_line:
+            continue
+        try:
+            text = UnstructuredInput.model_validate_json(raw_line).text
+        except ValidationError as e:
+            items.append((line_number, None, None, str(e)))
+        else:
+            input_hash = make_cache_key(text, enforcer.model_name, enforcer.config_fingerprint)
+            items.append((line_number, input_hash, text, None))
+        if len(items) >= checkpoint_every:
+            store.add_items(job_id, items, line_number)
+            items = []
+    store.add_items(job_id, items, line_number, complete=True)
+
+
+def _pending_chunks(store: JobStore, job_id: str, size: int):
+    after_hash = ""
+    while True:
+        page = store.pending(job_id, after_hash)
+        if not page:
+            return
+        after_hash = page[-1][0]
+        yield from iter_chunks(page, size)
+
+
+def _normalize_pending(enforcer, chunk: list) -> list:
+    structured_prompts = _normalize_texts(enforcer, [text for _, text in chunk])
+    return [(input_hash, outcome) for (input_hash, _), outcome in zip(chunk, structured_prompts)]
+
+
+def _process_job(enforcer, store: JobStore, job_id: str, concurrency: int, pack_size: int,
+                 on_checkpoint=None) -> bool:
+    """
+    Normalize the job's pending inputs, checkpointing each chunk as it
+    completes and calling `on_checkpoint()` after each one. Passes repeat while
+    retryable failures are left. Stops early (returns False) on a quota wall or
+    an open circuit, leaving those inputs pending.
+    """
+    window = max(1, concurrency * 2)
+    stopped = False
+
+    def checkpoint(future) -> int:
+        nonlocal stopped
+        outcomes = []
+        for input_hash, outcome in future.result():
+            if isinstance(outcome, (RateLimitedError, CircuitOpenError)):
+                stopped = True
+            else:
+                outcomes.append((input_hash, outcome))
+        store.record(outcomes)
+        if on_checkpoint is not None:
+            on_checkpoint()
+        return len(outcomes)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while not stopped:
+            recorded = 0
+            in_flight = set()
+            for chunk in _pending_chunks(store, job_id, max(1, pack_size)):
+                if stopped:
+                    break
+                if len(in_flight) >= window:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    recorded += sum(checkpoint(future) for future in done)
+                in_flight.add(executor.submit(_normalize_pending, enforcer, chunk))
+            recorded += sum(checkpoint(future) for future in in_flight)
+            if not recorded:
+                break
+    return not stopped
+
+
+def _write_job_result(summary: BatchSummary, out, errors_out, result):
+    if result.status == DONE:
+        outcome = VeoPromptResponse(
+            status="success",
+            structured_prompt=VeoPromptSchema.model_validate_json(result.payload),
+            raw_text_input=result.text
+        )
+        _write_outcome(summary, out, errors_out, result.line, outcome)
+    elif result.status == FAILED:
+        _write_error(summary, errors_out, result.line, result.error_type, result.error)
+    else:
+        summary.pending += 1
+
+
+def run_job(enforcer, store: JobStore, job_id: str, records, out, errors_out, concurrency: int = 4,
+            pack_size: int = 1, checkpoint_every: int = 500, source: str = None,
+            ordered: bool = True) -> BatchSummary:
+    """
+    Durable counterpart of run_batch: ingest records into the job (resuming
+    after its ingestion checkpoint), normalize every distinct input not
+    already done in this or an earlier job, then write the job's results in
+    input order. With ordered=False, results are written at every checkpoint
+    in completion order instead. Inputs left pending by a quota wall are
+    counted in `pending`.
+    """
+    summary = BatchSummary()
+    started = time.perf_counter()
+    job = store.open_job(job_id, source)
+    if not job["ingest_complete"]:
+        _ingest(enforcer, store, job_id, records, job["ingested_line"], checkpoint_every)
+
+    cursor = 0
+
+    def write_finished():
+        nonlocal cursor
+        for result in store.finished(job_id, after=cursor):
+            cursor = result.finished_seq
+            _write_job_result(summary, out, errors_out, result)
+
+    _process_job(enforcer, store, job_id, concurrency, pack_size, on_checkpoint=None if ordered else write_finished)
+
+    if ordered:
+        for result in store.results(job_id, finished_only=False):
+            _write_job_result(summary, out, errors_out, result)
+    else:
+        write_finished()
+        summary.pending = store.progress(job_id)["pending"]
+    summary.elapsed_seconds = time.perf_counter() - started
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Normalize JSONL video descriptions into Veo prompts")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="JSONL file of UnstructuredInput records, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Where to write VeoPromptResponse JSONL (default: stdout)")
+    parser.add_argument("--errors", default="-",
+                        help="Where to write per-record error JSONL (default: stderr)")
+    parser.add_argument("-c", "--concurrency", type=int, default=None,
+                        help="Number of concurrent Gemini calls (default: MAX_CONCURRENT_REQUESTS or 64)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="Write results in completion order instead of input order")
+    parser.add_argument("--pack-size", type=int, default=1,
+                        help="Records packed into each Gemini call (default: 1, no packing)")
+    parser.add_argument("--rpm", type=float, default=None,
+                        help="Requests per minute allowed upstream (default: REQUESTS_PER_MINUTE or unlimited)")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Tokens per minute allowed upstream (default: TOKENS_PER_MINUTE or unlimited)")
+    parser.add_argument("--cache-db", default=None,
+                        help="SQLite file for the response cache")
+    parser.add_argument("--job-db", default=None,
+                        help="SQLite job store; makes the run durable and resumable")
+    parser.add_argument("--job-id", default=None,
+                        help="Job to create or resume (default: derived from the input path)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Attempts per input before a retryable failure is final (with --job-db)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from config import load_config
+    from gemini_service import GeminiSchemaEnforcer
+
+    # Options left unset fall back to the environment and secrets, like the service itself
+    config = load_config(
+        cache_db_path=args.cache_db,
+        max_concurrent_requests=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm
+    )
+    enforcer = GeminiSchemaEnforcer.from_config(config)
+
+    job_id = args.job_id
+    if args.job_db and job_id is None:
+        if args.input == "-":
+            print("--job-id is required with --job-db when reading stdin", file=sys.stderr)
+            return 2
+        job_id = fingerprint(os.path.abspath(args.input))[:16]
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    errors_out = sys.stderr if args.errors == "-" else open(args.errors, "w", encoding="utf-8")
+    try:
+        if args.job_db:
+            print(f"Job {job_id} in {args.job_db}", file=sys.stderr)
+            store = JobStore(args.job_db, max_attempts=args.max_attempts)
+            try:
+                summary = run_job(
+                    enforcer,
+                    store,
+                    job_id,
+                    iter_records(source),
+                    out,
+                    errors_out,
+                    concurrency=config.max_concurrent_requests,
+                    pack_size=args.pack_size,
+                    source=args.input,
+                    ordered=not args.unordered
+                )
+            finally:
+                store.close()
+        else:
+            summary = run_batch(
+                enforcer,
+                iter_records(source),
+                out,
+                errors_out,
+                concurrency=config.max_concurrent_requests,
+                ordered=not args.unordered,
+                pack_size=args.pack_size
+            )
+    finally:
+        for stream in (source, out, errors_out):
+            if stream not in (sys.stdin, sys.stdout, sys.stderr):
+                stream.close()
+
+    print(summary.format(), file=sys.stderr)
+    return 1 if summary.failed or summary.pending else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Offline load and CPU benchmark for GeminiSchemaEnforcer, driven by StubBackend.
+
+Reports p50/p95/p99 latency and throughput at several concurrency levels, and
+the CPU cost of prompt construction, function-call arg conversion and Pydantic
+validation.
+
+    python benchmarks/bench_enforcer.py --requests 400 --concurrency 1 8 32 128
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import StubBackend, function_call_args, to_plain  # noqa: E402
+from declarations import PROMPT_TEMPLATE  # noqa: E402
+from gemini_service import GeminiSchemaEnforcer  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+from schemas import VeoPromptSchema  # noqa: E402
+
+SAMPLE_TEXT = (
+    "A detective walks through rainy noir streets at night, neon lights reflecting "
+    "in puddles, shot like a classic film noir with dramatic shadows"
+)
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_load(enforcer, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await enforcer.anormalize_to_schema(f"{SAMPLE_TEXT} #{i}")
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+    }
+
+
+def _proto_function_call(payload: dict):
+    """Function call as the Gemini client returns it (proto message), if available"""
+    try:
+        from google.generativeai import protos
+    except ImportError:
+        return None
+    return protos.FunctionCall(name="create_veo_prompt", args=payload)
+
+
+def measure_cpu(number: int) -> dict:
+    payload = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+    function_call = _proto_function_call(payload)
+    converted = function_call_args(function_call) if function_call is not None else payload
+
+    def per_call_us(statement) -> float:
+        return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e6
+
+    return {
+        "prompt_construction_us": per_call_us(lambda: PROMPT_TEMPLATE.format(unstructured_text=SAMPLE_TEXT)),
+        "arg_conversion_us": per_call_us(
+            lambda: function_call_args(function_call) if function_call is not None else to_plain(payload)
+        ),
+        "pydantic_validation_us": per_call_us(lambda: VeoPromptSchema(**converted)),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Stub latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cpu-iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", action="store_true", help="Run with per-stage instrumentation enabled")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    load_results = []
+    for concurrency in args.concurrency:
+        backend = StubBackend(
+            latency_seconds=args.latency,
+            latency_jitter=args.jitter,
+            error_rate=args.error_rate,
+            seed=args.seed
+        )
+        enforcer = GeminiSchemaEnforcer(
+            backend=backend,
+            rate_limiter=RateLimiter(max_concurrency=concurrency),
+            metrics=Metrics(enabled=args.metrics)
+        )
+        load_results.append(asyncio.run(run_load(enforcer, args.requests, concurrency)))
+        if args.metrics:
+            load_results[-1]["stages"] = enforcer.metrics.snapshot()["stages"]
+    cpu = measure_cpu(args.cpu_iterations)
+
+    if args.json:
+        print(json.dumps({"load": load_results, "cpu": cpu}, indent=2))
+        return 0
+
+    print(f"Load (stub latency {args.latency * 1000:.0f}ms + up to {args.jitter * 1000:.0f}ms jitter, "
+          f"{args.requests} requests per level)")
+    print(f"  {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7}")
+    for row in load_results:
+        print(f"  {row['concurrency']:>5} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['throughput_rps']:>9.1f} {row['errors']:>7}")
+        for name, stage in row.get("stages", {}).items():
+            print(f"        {name:<18} {stage['mean_ms']:9.3f} ms mean over {stage['count']}")
+    print("CPU cost per call")
+    for name, value in cpu.items():
+        print(f"  {name:<24} {value:9.1f} us")
+    print(f"  {'total local overhead':<24} {statistics.fsum(cpu.values()):9.1f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
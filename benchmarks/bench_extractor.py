@@ -0,0 +1,126 @@
+"""
+Pre-extraction benchmark: coverage, extraction latency and the token and
+latency savings of the pre-extract path against the model-only path.
+
+Runs offline against StubBackend with latency proportional to tokens. Pass a
+JSONL file of UnstructuredInput records to measure your own corpus; otherwise
+the sidebar examples plus a few labelled briefs are used.
+
+    python benchmarks/bench_extractor.py --input requests.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import StubBackend  # noqa: E402
+from extractor import extract  # noqa: E402
+from gemini_service import GeminiSchemaEnforcer  # noqa: E402
+from schemas import UnstructuredInput  # noqa: E402
+
+DEFAULT_CORPUS = [
+    "A detective walks through rainy noir streets at night, neon lights reflecting in puddles, shot like a classic film noir with dramatic shadows",
+    "Show a sleek black smartphone slowly rotating on a white minimalist background with dramatic studio lighting highlighting its edges",
+    "Aerial drone footage of a lion pride walking across African savanna during golden hour sunset, documentary style with natural sounds",
+    "A parkour athlete jumps between urban rooftops at sunset, captured with dynamic camera following the motion, energetic and thrilling",
+    "Close-up of hands chopping fresh vegetables on a wooden cutting board, bright kitchen lighting, warm and inviting atmosphere",
+    "Vertical 9:16 TikTok clip, 6 seconds: handheld close-up of a barista pouring latte art, 50mm, morning natural light",
+    "Subject: a lighthouse keeper\nAction: climbing the spiral stairs\nLocation: old stone lighthouse\nTime: dusk\n"
+    "Lighting: warm lantern light\nFraming: medium shot\nCamera motion: crane\nStyle: cinematic",
+]
+
+
+def load_corpus(path):
+    if path is None:
+        return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [UnstructuredInput.model_validate_json(line).text for line in f if line.strip()]
+
+
+def run(corpus, pre_extract: bool, args) -> dict:
+    backend = StubBackend(
+        latency_seconds=args.latency,
+        seconds_per_token=args.seconds_per_token,
+        seed=0
+    )
+    enforcer = GeminiSchemaEnforcer(backend=backend, pre_extract=pre_extract)
+    original_generate = backend.generate
+    tokens = 0
+    latencies = []
+
+    async def counting_generate(prompt, tools, tool_config):
+        nonlocal tokens
+        result = await original_generate(prompt, tools, tool_config)
+        tokens += result.total_tokens
+        return result
+
+    backend.generate = counting_generate
+
+    async def main():
+        for text in corpus:
+            started = time.perf_counter()
+            await enforcer.anormalize_to_schema(text)
+            latencies.append(time.perf_counter() - started)
+
+    asyncio.run(main())
+    return {
+        "model_calls": backend.calls,
+        "total_tokens": tokens,
+        "mean_latency_ms": statistics.fmean(latencies) * 1000,
+        "extraction": enforcer.extraction_stats.stats if pre_extract else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=None, help="JSONL file of UnstructuredInput records")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub fixed latency in seconds")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0005,
+                        help="Stub latency per prompt+output token")
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.input)
+
+    extraction_us = []
+    for text in corpus:
+        started = time.perf_counter()
+        for _ in range(100):
+            extract(text)
+        extraction_us.append((time.perf_counter() - started) / 100 * 1e6)
+
+    model_only = run(corpus, pre_extract=False, args=args)
+    pre_extracted = run(corpus, pre_extract=True, args=args)
+    report = {
+        "inputs": len(corpus),
+        "extraction_us": {"mean": statistics.fmean(extraction_us), "max": max(extraction_us)},
+        "model_only": model_only,
+        "pre_extract": pre_extracted,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    stats = pre_extracted["extraction"]
+    saved_tokens = model_only["total_tokens"] - pre_extracted["total_tokens"]
+    print(f"Pre-extraction over {len(corpus)} inputs")
+    print(f"  extraction latency   mean {report['extraction_us']['mean']:.1f} us, max {report['extraction_us']['max']:.1f} us")
+    print(f"  field coverage       {stats['coverage_rate']:.1%}")
+    print(f"  model calls skipped  {stats['model_calls_skipped']} ({stats['skip_rate']:.1%}), partial calls {stats['partial_calls']}")
+    print(f"  {'':<20} {'model-only':>12} {'pre-extract':>12}")
+    print(f"  {'model calls':<20} {model_only['model_calls']:>12} {pre_extracted['model_calls']:>12}")
+    print(f"  {'tokens (stub)':<20} {model_only['total_tokens']:>12} {pre_extracted['total_tokens']:>12}")
+    print(f"  {'mean latency ms':<20} {model_only['mean_latency_ms']:>12.1f} {pre_extracted['mean_latency_ms']:>12.1f}")
+    if model_only["total_tokens"]:
+        print(f"  token savings        {saved_tokens} ({saved_tokens / model_only['total_tokens']:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Offline benchmark for the multi-key scheduler, with StubBackends as a fake
+upstream: every key has its own quota and answers 429 once it is exceeded.
+
+A batch job is submitted all at once while interactive requests arrive at a
+steady rate. For one key and for a pool of keys, with the per-key limits
+unknown (learned from 429s) and configured, it reports throughput, upstream
+429s and p50/p95 latency per lane. Time is compressed: quotas are per
+`--window` seconds instead of per minute.
+
+    python benchmarks/bench_keypool.py --keys 3 --quota 40 --window 5 --batch 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import StubBackend  # noqa: E402
+from gemini_service import GeminiSchemaEnforcer  # noqa: E402
+from keypool import BATCH, INTERACTIVE, KeyPool, KeySlot, lane  # noqa: E402
+from resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+
+SAMPLE_TEXT = (
+    "A detective walks through rainy noir streets at night, neon lights reflecting "
+    "in puddles, shot like a classic film noir with dramatic shadows"
+)
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def build_pool(keys: int, quota: int, window: float, configured: bool, latency: float) -> KeyPool:
+    return KeyPool([
+        KeySlot(
+            f"key{index}",
+            StubBackend(latency_seconds=latency, latency_jitter=latency, requests_per_minute=quota,
+                        quota_window_seconds=window, seed=index),
+            requests_per_minute=quota * 0.9 if configured else None,
+            max_concurrency=16,
+            window_seconds=window
+        )
+        for index in range(1, keys + 1)
+    ])
+
+
+async def run_mixed(pool: KeyPool, batch: int, interactive_rate: float) -> dict:
+    enforcer = GeminiSchemaEnforcer(
+        backend=pool, rate_limiter=pool, pre_extract=False, request_timeout=None,
+        retry_policy=RetryPolicy(max_attempts=6),
+        circuit_breaker=CircuitBreaker(failure_threshold=1000)
+    )
+    latencies = {INTERACTIVE: [], BATCH: []}
+    errors = {INTERACTIVE: 0, BATCH: 0}
+
+    async def one(text: str, priority: int):
+        with lane(priority):
+            started = time.perf_counter()
+            try:
+                await enforcer.anormalize_to_schema(text)
+            except Exception:
+                errors[priority] += 1
+                return
+            latencies[priority].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    batch_tasks = [asyncio.ensure_future(one(f"{SAMPLE_TEXT} batch #{i}", BATCH)) for i in range(batch)]
+    interactive_tasks = []
+    index = 0
+    while not all(task.done() for task in batch_tasks):
+        interactive_tasks.append(asyncio.ensure_future(one(f"{SAMPLE_TEXT} interactive #{index}", INTERACTIVE)))
+        index += 1
+        await asyncio.sleep(1 / interactive_rate)
+    await asyncio.gather(*batch_tasks, *interactive_tasks)
+    elapsed = time.perf_counter() - started
+
+    row = {
+        "elapsed_s": elapsed,
+        "throughput_rps": (batch + index) / elapsed,
+        "upstream_429": sum(slot.backend.throttled for slot in pool.slots),
+        "failovers": pool.failovers,
+    }
+    for priority, name in ((INTERACTIVE, "interactive"), (BATCH, "batch")):
+        values = sorted(latencies[priority])
+        row[f"{name}_p50_ms"] = percentile(values, 0.50) * 1000
+        row[f"{name}_p95_ms"] = percentile(values, 0.95) * 1000
+        row[f"{name}_errors"] = errors[priority]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--quota", type=int, default=40, help="Requests per window each fake key accepts")
+    parser.add_argument("--window", type=float, default=5.0, help="Quota window in seconds")
+    parser.add_argument("--batch", type=int, default=300, help="Batch records submitted at once")
+    parser.add_argument("--interactive-rate", type=float, default=4.0, help="Interactive requests per second")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("1 key, learned", 1, False),
+        (f"{args.keys} keys, learned", args.keys, False),
+        (f"{args.keys} keys, configured", args.keys, True),
+    ]
+    header = (f"{'scenario':<22} {'time s':>7} {'rps':>7} {'429s':>5} {'fail':>5} "
+              f"{'int p50':>8} {'int p95':>8} {'bat p50':>8} {'bat p95':>8} {'errors':>7}")
+    print(header)
+    print("-" * len(header))
+    for name, keys, configured in scenarios:
+        pool = build_pool(keys, args.quota, args.window, configured, args.latency)
+        row = asyncio.run(run_mixed(pool, args.batch, args.interactive_rate))
+        print(
+            f"{name:<22} {row['elapsed_s']:>7.1f} {row['throughput_rps']:>7.1f} {row['upstream_429']:>5} "
+            f"{row['failovers']:>5} {row['interactive_p50_ms']:>8.0f} {row['interactive_p95_ms']:>8.0f} "
+            f"{row['batch_p50_ms']:>8.0f} {row['batch_p95_ms']:>8.0f} "
+            f"{row['interactive_errors'] + row['batch_errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Near-duplicate index benchmark: lookup and insert latency, reuse and seed
+rates, and how long a persisted index takes to open.
+
+Inputs are replayed in order: each one is looked up, and unless its stored
+neighbour is reused, a prompt is built for it (locally, with
+extractor.degraded_result, standing in for the model) and added to the
+index. Pass a JSONL file of UnstructuredInput records to measure your own
+corpus; otherwise a synthetic stream mixes new descriptions with trivial
+edits (case, whitespace, punctuation, filler words) and real ones (a swapped
+adjective, an added detail), and rates are also broken down by edit.
+
+    python benchmarks/bench_neardup.py --records 20000
+    python benchmarks/bench_neardup.py --input requests.jsonl --threshold 0.85
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import degraded_result  # noqa: E402
+from neardup import NearDuplicateIndex  # noqa: E402
+from schemas import UnstructuredInput  # noqa: E402
+
+ADJECTIVES = ["weathered", "young", "elderly", "cheerful", "mysterious", "tired", "elegant", "rugged",
+              "curious", "nervous", "confident", "lonely"]
+SUBJECTS = ["fisherman", "dancer", "detective", "chef", "astronaut", "violinist", "skateboarder",
+            "librarian", "farmer", "street artist", "mountain climber", "barista"]
+ACTIONS = ["walks along", "runs through", "waits in", "dances across", "explores", "paints a mural in",
+           "cooks dinner in", "plays music in", "searches", "rests in"]
+PLACES = ["a rainy neon-lit alley", "a quiet harbor", "a crowded night market", "an abandoned factory",
+          "a sunlit wheat field", "a snowy mountain pass", "a cozy bookshop", "a desert highway",
+          "a rooftop garden", "a misty forest"]
+TIMES = ["at golden hour", "at night", "at dawn", "at midday", "during a thunderstorm", "at dusk"]
+STYLES = ["cinematic film look", "documentary style", "dreamy pastel grade", "gritty handheld realism",
+          "vintage 16mm texture", "high-contrast noir"]
+DETAILS = ["with a stray dog following", "while fireworks burst overhead", "as snow starts to fall",
+           "with a red umbrella", "while a train passes behind", "as the crowd cheers"]
+FILLERS = ["Please create: ", "Make a video of: ", "", "Video idea - "]
+EDITS = ("case", "whitespace", "punctuation", "filler", "swap_adjective", "add_detail")
+
+
+def _description(rng: random.Random) -> list:
+    return [rng.choice(ADJECTIVES), rng.choice(SUBJECTS), rng.choice(ACTIONS), rng.choice(PLACES),
+            rng.choice(TIMES), rng.choice(STYLES)]
+
+
+def _render(parts: list) -> str:
+    adjective, subject, action, place, time_of_day, style = parts[:6]
+    text = f"A {adjective} {subject} {action} {place} {time_of_day}, {style}"
+    return text + (f", {parts[6]}" if len(parts) > 6 else "")
+
+
+def _edit(rng: random.Random, prefix: str, parts: list, edit: str) -> str:
+    text = prefix + _render(parts)
+    if edit == "case":
+        return text.upper() if rng.random() < 0.5 else text.lower()
+    if edit == "whitespace":
+        return "  " + text.replace(" ", "   ", 3) + "\n"
+    if edit == "punctuation":
+        return text.replace(",", ";") + "!!"
+    if edit == "filler":
+        return ("Please " if prefix else "Please make a video: ") + text + ", thanks"
+    if edit == "swap_adjective":
+        return prefix + _render([rng.choice([a for a in ADJECTIVES if a != parts[0]])] + parts[1:])
+    return prefix + _render(parts + [rng.choice(DETAILS)])
+
+
+def synthetic_stream(records: int, new_rate: float, seed: int = 11):
+    """(text, kind) pairs; kind is 'new' or the edit applied to an earlier description"""
+    rng = random.Random(seed)
+    seen = []
+    for _ in range(records):
+        if not seen or rng.random() < new_rate:
+            prefix, parts = rng.choice(FILLERS), _description(rng)
+            seen.append((prefix, parts))
+            yield prefix + _render(parts), "new"
+        else:
+            edit = rng.choice(EDITS)
+            yield _edit(rng, *rng.choice(seen), edit), edit
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield UnstructuredInput.model_validate_json(line).text, "corpus"
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=None, help="JSONL of UnstructuredInput records")
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--new-rate", type=float, default=0.4, help="Share of synthetic inputs that are new")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed-threshold", type=float, default=0.7)
+    args = parser.parse_args()
+
+    stream = load_corpus(args.input) if args.input else synthetic_stream(args.records, args.new_rate)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "neardup.db")
+        index = NearDuplicateIndex(path, threshold=args.threshold, seed_threshold=args.seed_threshold,
+                                   max_entries=None)
+        lookups = []
+        inserts = []
+        outcomes = defaultdict(Counter)
+        samples = []
+        for text, kind in stream:
+            started = time.perf_counter()
+            seed = index.seed(text)
+            lookups.append(time.perf_counter() - started)
+            outcome = "miss" if seed is None else "reuse" if seed.reuse else "seed"
+            outcomes[kind][outcome] += 1
+            if seed is None or not seed.reuse:
+                prompt = degraded_result(text)
+                started = time.perf_counter()
+                index.add(text, prompt)
+                inserts.append(time.perf_counter() - started)
+            samples.append(text)
+        stats = index.stats
+        entries = len(index)
+        index.close()
+
+        started = time.perf_counter()
+        reopened = NearDuplicateIndex(path, threshold=args.threshold, seed_threshold=args.seed_threshold)
+        first_lookup = reopened.seed(samples[-1])
+        open_ms = 1000 * (time.perf_counter() - started)
+        reopened.close()
+        size_mb = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+        ) / 1e6
+
+    print(f"{stats['lookups']} inputs, {entries} indexed entries, {size_mb:.1f} MB on disk\n")
+    print(f"lookup  p50 {1000 * percentile(lookups, 0.5):.3f} ms  p95 {1000 * percentile(lookups, 0.95):.3f} ms"
+          f"  p99 {1000 * percentile(lookups, 0.99):.3f} ms  mean {1000 * statistics.fmean(lookups):.3f} ms")
+    if inserts:
+        print(f"insert  p50 {1000 * percentile(inserts, 0.5):.3f} ms  p95 {1000 * percentile(inserts, 0.95):.3f} ms")
+    print(f"reopen + first lookup: {open_ms:.2f} ms ({'hit' if first_lookup else 'miss'})\n")
+    print(f"reused {stats['reuse_rate']:.1%} · seeded {stats['seed_rate']:.1%} "
+          f"(avg {stats['avg_fields_regenerated']:.1f} fields regenerated) · "
+          f"missed {stats['misses'] / stats['lookups']:.1%}\n")
+
+    header = f"{'input':<16} {'count':>8} {'reuse':>8} {'seed':>8} {'miss':>8}"
+    print(header)
+    print("-" * len(header))
+    for kind, counts in sorted(outcomes.items()):
+        total = sum(counts.values())
+        print(f"{kind:<16} {total:>8} {counts['reuse'] / total:>8.1%} {counts['seed'] / total:>8.1%} "
+              f"{counts['miss'] / total:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
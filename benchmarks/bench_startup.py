@@ -0,0 +1,94 @@
+"""
+Startup benchmark for gemini_service.
+
+Each sample runs in a fresh interpreter and measures:
+  - cold import of gemini_service (must not pull in Streamlit or google.generativeai)
+  - GeminiSchemaEnforcer construction (pays the lazy google.generativeai import)
+  - the first normalize_to_schema call, with the network round-trip replaced by
+    a canned response so only local first-call overhead is timed
+
+    python benchmarks/bench_startup.py --samples 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time, types, warnings
+warnings.filterwarnings("ignore")
+
+started = time.perf_counter()
+import gemini_service
+import_seconds = time.perf_counter() - started
+heavy_modules = [name for name in ("streamlit", "google.generativeai") if name in sys.modules]
+
+started = time.perf_counter()
+enforcer = gemini_service.GeminiSchemaEnforcer(api_key="benchmark-key")
+init_seconds = time.perf_counter() - started
+
+from schemas import VeoPromptSchema
+example = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+
+async def generate_content(*args, **kwargs):
+    function_call = types.SimpleNamespace(name="create_veo_prompt", args=example)
+    part = types.SimpleNamespace(function_call=function_call)
+    candidate = types.SimpleNamespace(content=types.SimpleNamespace(parts=[part]))
+    return types.SimpleNamespace(candidates=[candidate], usage_metadata=None)
+
+enforcer.backend.client = types.SimpleNamespace(generate_content=generate_content)
+
+started = time.perf_counter()
+enforcer.normalize_to_schema("A chef cooking pasta in a busy kitchen")
+first_call_seconds = time.perf_counter() - started
+
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "init_seconds": init_seconds,
+    "first_call_seconds": first_call_seconds,
+    "heavy_modules_on_import": heavy_modules,
+}))
+'''
+
+
+def run_sample() -> dict:
+    env = dict(os.environ, GEMINI_API_KEY="benchmark-key")
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print raw results as JSON")
+    args = parser.parse_args(argv)
+
+    samples = [run_sample() for _ in range(args.samples)]
+    report = {
+        metric: {
+            "median_ms": statistics.median(s[metric] for s in samples) * 1000,
+            "max_ms": max(s[metric] for s in samples) * 1000,
+        }
+        for metric in ("import_seconds", "init_seconds", "first_call_seconds")
+    }
+    heavy_modules = sorted({name for s in samples for name in s["heavy_modules_on_import"]})
+
+    if args.json:
+        print(json.dumps({"metrics": report, "heavy_modules_on_import": heavy_modules}, indent=2))
+    else:
+        print(f"gemini_service startup ({args.samples} cold samples)")
+        for metric, values in report.items():
+            print(f"  {metric:<20} median {values['median_ms']:8.1f} ms   max {values['max_ms']:8.1f} ms")
+        print(f"  heavy modules loaded by import: {', '.join(heavy_modules) or 'none'}")
+    return 1 if heavy_modules else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Throughput of the offline corpus validator.
+
+Writes a synthetic JSONL archive of Veo prompts (a few percent invalid: bad
+enums, missing required fields, wrong types) and validates it three ways: the
+dict path used in the Gemini flow (json.loads + VeoPromptSchema(**data)), the
+compiled validator on raw bytes in one process, and validate_corpus over a
+process pool. Reports records/s and the projected time for a million records.
+
+    python benchmarks/bench_validator.py --records 500000 --workers 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import ValidationError  # noqa: E402
+
+from schemas import VeoPromptSchema  # noqa: E402
+from validate_corpus import validate_files  # noqa: E402
+
+EXAMPLE = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+
+
+def _record(rng: random.Random, index: int, invalid_rate: float) -> dict:
+    record = json.loads(json.dumps(EXAMPLE))
+    record["subject"]["description"] = f"subject {index}"
+    record["scene"]["location"] = f"location {rng.randrange(1000)}"
+    record["duration_seconds"] = rng.choice((4, 6, 8))
+    record["aspect_ratio"] = rng.choice(("16:9", "9:16"))
+    if rng.random() < invalid_rate:
+        corruption = rng.randrange(4)
+        if corruption == 0:
+            record["duration_seconds"] = 5
+        elif corruption == 1:
+            record["aspect_ratio"] = "4:3"
+        elif corruption == 2:
+            del record["scene"]["lighting"]
+        else:
+            record["negative_prompt"] = "text overlays, captions"
+    return record
+
+
+def write_corpus(path: str, records: int, invalid_rate: float, seed: int = 7):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for index in range(records):
+            f.write(json.dumps(_record(rng, index, invalid_rate), separators=(",", ":")) + "\n")
+
+
+def dict_path(path: str) -> tuple:
+    started = time.perf_counter()
+    records = invalid = 0
+    with open(path, "rb") as f:
+        for line in f:
+            records += 1
+            try:
+                VeoPromptSchema(**json.loads(line))
+            except ValidationError:
+                invalid += 1
+    return records, invalid, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--invalid-rate", type=float, default=0.03)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-mb", type=float, default=8.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.jsonl")
+        write_corpus(path, args.records, args.invalid_rate)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{args.records} records, {size_mb:.1f} MB, {os.cpu_count()} CPUs\n")
+
+        rows = []
+        records, invalid, elapsed = dict_path(path)
+        rows.append(("json.loads + VeoPromptSchema(**data)", records, invalid, elapsed))
+        report = validate_files([path], workers=1, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+        rows.append(("validate_json on bytes, 1 process", report.records, report.invalid, report.elapsed_seconds))
+        if args.workers > 1:
+            report = validate_files([path], workers=args.workers, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+            rows.append((f"validate_corpus, {args.workers} processes", report.records, report.invalid,
+                         report.elapsed_seconds))
+
+        header = f"{'method':<40} {'records/s':>12} {'invalid':>8} {'1M records':>11}"
+        print(header)
+        print("-" * len(header))
+        for name, records, invalid, elapsed in rows:
+            rate = records / elapsed if elapsed else 0.0
+            print(f"{name:<40} {rate:>12,.0f} {invalid:>8} {1_000_000 / rate if rate else 0:>10.1f}s")
+        print()
+        print(report.format(top=8))
+
+
+if __name__ == "__main__":
+    main()
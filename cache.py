@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from schemas import VeoPromptSchema
+
+
+def normalize_input_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a cache entry"""
+    return " ".join(text.split())
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of the pieces of configuration that shape a model response"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def make_cache_key(unstructured_text: str, model_name: str, config_fingerprint: str) -> str:
+    """Cache key covering the input text, the model and the declaration/prompt fingerprint"""
+    return fingerprint(normalize_input_text(unstructured_text), model_name, config_fingerprint)
+
+
+class SQLiteStore:
+    """On-disk second tier for the response cache"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, ttl_seconds: Optional[float]):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if ttl_seconds is not None and time.time() - created_at > ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return payload, created_at
+
+    def set(self, key: str, payload: str, created_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, payload, created_at),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for validated Veo prompts: an in-process LRU with size and
+    TTL eviction, optionally backed by a SQLite store shared between processes
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 24 * 3600,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = SQLiteStore(db_path) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, payload: str, created_at: float):
+        self._entries[key] = (payload, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[VeoPromptSchema]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, created_at = entry
+                if self._expired(created_at):
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return VeoPromptSchema.model_validate_json(payload)
+
+        if self._store is not None:
+            row = self._store.get(key, self.ttl_seconds)
+            if row is not None:
+                payload, created_at = row
+                with self._lock:
+                    self._remember(key, payload, created_at)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return VeoPromptSchema.model_validate_json(payload)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: VeoPromptSchema):
+        payload = value.model_dump_json()
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, payload, created_at)
+        if self._store is not None:
+            self._store.set(key, payload, created_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._store is not None:
+            self._store.clear()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
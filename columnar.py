@@ -0,0 +1,381 @@
+"""
+Columnar export of normalized prompts for analytics.
+
+VeoPromptSchema is flattened to one column per leaf field (subject_description,
+scene_location, shot_framing, camera_motion_type, audio_ambient, ...), with
+negative_prompt as a list column and a boolean `audio` column that tells a
+missing audio object from one whose fields are all null. Rows are written in
+row groups of bounded size, so memory stays flat however many prompts are
+exported:
+
+- Parquet (.parquet) or Arrow IPC (.arrow, .feather) when pyarrow is installed,
+  with dictionary encoding for low-cardinality columns such as shot_framing,
+  style and aspect_ratio
+- otherwise compact line-delimited JSON (.jsonl): a header line naming the
+  columns, then one JSON array per row
+
+read_prompts() reads any of these back into VeoPromptSchema objects lazily,
+one row group at a time.
+
+    python columnar.py results.jsonl -o prompts.parquet
+    python columnar.py --job-db jobs.db --job-id nightly -o nightly.parquet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from declarations import unwrap_annotation
+from schemas import VeoPromptSchema
+
+DEFAULT_ROW_GROUP_SIZE = 50_000
+JSONL_FORMAT = "veo-columnar-jsonl"
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Free-text fields whose values repeat a lot across prompts
+DICTIONARY_COLUMNS = frozenset({
+    "shot_framing", "shot_lens", "shot_camera_equipment", "shot_frame_rate",
+    "camera_motion_type", "scene_time_of_day", "scene_weather", "style",
+})
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    path: Tuple[str, ...]
+    annotation: type
+    is_list: bool = False
+    presence: bool = False
+
+    @property
+    def dictionary(self) -> bool:
+        return self.name in DICTIONARY_COLUMNS or (
+            isinstance(self.annotation, type) and issubclass(self.annotation, Enum)
+            and issubclass(self.annotation, str)
+        )
+
+
+def _columns(model_cls: Type[BaseModel], path: tuple = ()) -> List[Column]:
+    columns = []
+    for name, field in model_cls.model_fields.items():
+        annotation, is_list = unwrap_annotation(field.annotation)
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            if not field.is_required():
+                # Tells an absent object (None) from one whose fields are all null
+                columns.append(Column("_".join(path + (name,)), path + (name,), bool, presence=True))
+            columns.extend(_columns(annotation, path + (name,)))
+        else:
+            columns.append(Column("_".join(path + (name,)), path + (name,), annotation, is_list))
+    return columns
+
+
+COLUMNS = _columns(VeoPromptSchema)
+COLUMN_NAMES = [column.name for column in COLUMNS]
+
+
+def flatten(prompt: VeoPromptSchema) -> list:
+    """Column values of one prompt, in COLUMNS order"""
+    data = prompt.model_dump(mode="json")
+    values = []
+    for column in COLUMNS:
+        value = data
+        for part in column.path:
+            value = value.get(part) if value is not None else None
+        values.append(value is not None if column.presence else value)
+    return values
+
+
+def unflatten(row) -> VeoPromptSchema:
+    """
+    VeoPromptSchema from a row (a dict keyed by column name, or values in
+    COLUMNS order). Null columns stay explicit nulls rather than falling back
+    to field defaults; optional objects are rebuilt from their presence column.
+    """
+    if not isinstance(row, dict):
+        row = dict(zip(COLUMN_NAMES, row))
+    data = {}
+    absent = set()
+    for column in COLUMNS:
+        if column.presence:
+            present = row.get(column.name)
+            if present is None:
+                # Exports without presence columns: present if any of its columns is set
+                prefix = column.path
+                present = any(
+                    row.get(other.name) is not None for other in COLUMNS
+                    if other.path[:len(prefix)] == prefix and other is not column
+                )
+            if not present:
+                absent.add(column.path)
+            continue
+        target = data
+        for part in column.path[:-1]:
+            target = target.setdefault(part, {})
+        target[column.path[-1]] = row.get(column.name)
+    for path in absent:
+        target = data
+        for part in path[:-1]:
+            target = target[part]
+        target[path[-1]] = None
+    return VeoPromptSchema.model_validate(data)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow export need pyarrow (pip install pyarrow); use a .jsonl path instead") from e
+    return pyarrow
+
+
+def pyarrow_available() -> bool:
+    try:
+        _require_pyarrow()
+    except ImportError:
+        return False
+    return True
+
+
+def format_for(path: str) -> str:
+    """Output format from the file extension; unknown extensions get compact JSONL"""
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "jsonl")
+
+
+def arrow_schema():
+    pa = _require_pyarrow()
+    fields = []
+    for column in COLUMNS:
+        if column.is_list:
+            type_ = pa.list_(pa.string())
+        elif column.presence or column.annotation is bool:
+            type_ = pa.bool_()
+        elif isinstance(column.annotation, type) and issubclass(column.annotation, int):
+            type_ = pa.int8() if issubclass(column.annotation, Enum) else pa.int64()
+        else:
+            type_ = pa.string()
+        if column.dictionary:
+            type_ = pa.dictionary(pa.int32(), type_)
+        fields.append(pa.field(column.name, type_))
+    return pa.schema(fields)
+
+
+class ColumnarWriter:
+    """
+    Streams prompts to a Parquet, Arrow IPC or compact JSONL file, holding at
+    most `row_group_size` rows in memory. Use as a context manager.
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = "zstd"):
+        self.path = path
+        self.format = format or format_for(path)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._buffer = []
+        # Arrow IPC dictionary columns keep one growing dictionary across batches, so later
+        # batches only add delta entries (IPC files do not allow replacing one); Parquet
+        # row groups each get their own, so their size stays flat
+        self._dictionaries = {}
+        if self.format == "jsonl":
+            self._file = open(path, "w", encoding="utf-8")
+            self._file.write(json.dumps({"format": JSONL_FORMAT, "columns": COLUMN_NAMES}) + "\n")
+            return
+        pa = _require_pyarrow()
+        self._schema = arrow_schema()
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+
+            dictionary_columns = [column.name for column in COLUMNS if column.dictionary]
+            self._writer = pq.ParquetWriter(
+                path, self._schema, compression=compression, use_dictionary=dictionary_columns
+            )
+        elif self.format == "arrow":
+            self._writer = pa.ipc.new_file(
+                path, self._schema,
+                options=pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+            )
+        else:
+            raise ValueError(f"Unknown columnar format: {self.format}")
+
+    def write(self, prompt: VeoPromptSchema):
+        self._buffer.append(flatten(prompt))
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def write_all(self, prompts: Iterable[VeoPromptSchema]) -> int:
+        for prompt in prompts:
+            self.write(prompt)
+        return self.rows + len(self._buffer)
+
+    def flush(self):
+        """Write the buffered rows as one row group"""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        self.rows += len(rows)
+        if self.format == "jsonl":
+            self._file.writelines(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+            return
+        pa = _require_pyarrow()
+        arrays = []
+        for index, field in enumerate(self._schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(self._dictionary_array(field, values))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if self.format == "parquet":
+            self._writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            self._writer.write_batch(batch)
+
+    def _dictionary_array(self, field, values: list):
+        pa = _require_pyarrow()
+        dictionary = self._dictionaries.setdefault(field.name, {}) if self.format == "arrow" else {}
+        indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=field.type.index_type),
+            pa.array(list(dictionary), type=field.type.value_type)
+        )
+
+    def close(self):
+        self.flush()
+        if self.format == "jsonl":
+            self._file.close()
+        else:
+            self._writer.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_rows(path: str, format: Optional[str] = None, columns: List[str] = None,
+              batch_size: int = 10_000) -> Iterator[dict]:
+    """Rows as dicts keyed by column name, read one row group or batch at a time"""
+    format = format or format_for(path)
+    if format == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != JSONL_FORMAT:
+                raise ValueError(f"{path} is not a columnar JSONL export")
+            names = header["columns"]
+            for line in f:
+                row = dict(zip(names, json.loads(line)))
+                yield row if columns is None else {name: row.get(name) for name in columns}
+        return
+    pa = _require_pyarrow()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+        for batch in batches:
+            yield from batch.to_pylist()
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            batch = reader.get_batch(index)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield from batch.to_pylist()
+
+
+def read_prompts(path: str, format: Optional[str] = None, batch_size: int = 10_000) -> Iterator[VeoPromptSchema]:
+    """VeoPromptSchema objects from an export, built one row at a time"""
+    for row in iter_rows(path, format, batch_size=batch_size):
+        yield unflatten(row)
+
+
+def _prompts_from_jsonl(stream, skipped: list) -> Iterator[VeoPromptSchema]:
+    """
+    VeoPromptSchema lines, or records with a structured_prompt (batch_normalize.py
+    and `jobs.py results` output); error records and invalid lines are counted
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if b'"structured_prompt"' in line:
+                yield VeoPromptSchema.model_validate(json.loads(line)["structured_prompt"])
+            else:
+                yield VeoPromptSchema.model_validate_json(line)
+        except (ValueError, KeyError, TypeError):
+            skipped[0] += 1
+
+
+def _prompts_from_job(db_path: str, job_id: str) -> Iterator[VeoPromptSchema]:
+    from jobs import DONE, JobStore
+
+    store = JobStore(db_path)
+    try:
+        for result in store.results(job_id):
+            if result.status == DONE:
+                yield VeoPromptSchema.model_validate_json(result.payload)
+    finally:
+        store.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Export normalized Veo prompts to a columnar file")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="JSONL of VeoPromptSchema records or batch/job results, or '-' for stdin")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Output file; .parquet, .arrow/.feather or .jsonl (no extension: Parquet "
+                             "if pyarrow is installed, else JSONL)")
+    parser.add_argument("--format", choices=("parquet", "arrow", "jsonl"), default=None,
+                        help="Override the format implied by the extension")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--job-db", default=None, help="Export the finished results of a job store instead")
+    parser.add_argument("--job-id", default=None)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    output = args.output
+    format = args.format
+    if format is None and not os.path.splitext(output)[1]:
+        format = "parquet" if pyarrow_available() else "jsonl"
+        output = f"{output}.{format}"
+
+    started = time.perf_counter()
+    skipped = [0]
+    source = None
+    if args.job_db:
+        if not args.job_id:
+            print("--job-id is required with --job-db", file=sys.stderr)
+            return 2
+        prompts = _prompts_from_job(args.job_db, args.job_id)
+    else:
+        source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+        prompts = _prompts_from_jsonl(source, skipped)
+    try:
+        with ColumnarWriter(output, format=format, row_group_size=args.row_group_size) as writer:
+            rows = writer.write_all(prompts)
+    finally:
+        if source is not None and source is not sys.stdin.buffer:
+            source.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Wrote {rows} prompts to {output} ({writer.format}, {os.path.getsize(output) / 1e6:.2f} MB) "
+        f"in {elapsed:.2f}s" + (f"; skipped {skipped[0]} error or invalid lines" if skipped[0] else ""),
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
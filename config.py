@@ -0,0 +1,172 @@
+"""
+Configuration for the schema enforcer.
+
+Every setting is resolved in this order: explicit argument, environment
+variable, Streamlit secrets. Streamlit itself is never imported here: inside a
+running Streamlit app `st.secrets` is used, otherwise `.streamlit/secrets.toml`
+is read directly so workers and servers start without Streamlit.
+"""
+import os
+import sys
+import tomllib
+from dataclasses import dataclass
+from typing import Optional
+
+from errors import ConfigurationError
+
+DEFAULT_MODEL_NAME = 'gemini-2.0-flash-exp'
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ("1", "true", "yes", "on"):
+        return True
+    if str(value).strip().lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(value)
+
+
+def _parse_list(value) -> tuple:
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(",")
+    return tuple(item.strip() for item in items if str(item).strip())
+
+
+def _load_secrets() -> dict:
+    if "streamlit" in sys.modules:
+        try:
+            return dict(sys.modules["streamlit"].secrets)
+        except Exception:
+            return {}
+    path = os.environ.get("STREAMLIT_SECRETS_PATH", SECRETS_PATH)
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except FileNotFoundError:
+        return {}
+    except tomllib.TOMLDecodeError as e:
+        raise ConfigurationError(f"Invalid secrets file {path}: {e}")
+
+
+@dataclass
+class GeminiConfig:
+    """Settings shared by the Streamlit app, the HTTP service and batch workers"""
+    api_key: str
+    model_name: str = DEFAULT_MODEL_NAME
+    cache_max_entries: int = 1024
+    cache_ttl_seconds: Optional[float] = 24 * 3600
+    cache_db_path: Optional[str] = None
+    max_concurrent_requests: int = 64
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    pre_extract: bool = True
+    request_timeout_seconds: Optional[float] = 30.0
+    max_retries: int = 2
+    hedge_requests: bool = False
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    metrics_enabled: bool = False
+    metrics_log_json: bool = False
+    api_keys: tuple = ()
+    key_requests_per_minute: Optional[float] = None
+    key_tokens_per_minute: Optional[float] = None
+    key_max_concurrent_requests: int = 16
+    near_duplicate_index: bool = False
+    near_duplicate_db_path: Optional[str] = None
+    near_duplicate_threshold: float = 0.9
+    near_duplicate_seed_threshold: float = 0.7
+
+
+_FIELD_TYPES = {
+    "api_key": str,
+    "model_name": str,
+    "cache_max_entries": int,
+    "cache_ttl_seconds": float,
+    "cache_db_path": str,
+    "max_concurrent_requests": int,
+    "requests_per_minute": float,
+    "tokens_per_minute": float,
+    "pre_extract": _parse_bool,
+    "request_timeout_seconds": float,
+    "max_retries": int,
+    "hedge_requests": _parse_bool,
+    "breaker_failure_threshold": int,
+    "breaker_reset_seconds": float,
+    "metrics_enabled": _parse_bool,
+    "metrics_log_json": _parse_bool,
+    "api_keys": _parse_list,
+    "key_requests_per_minute": float,
+    "key_tokens_per_minute": float,
+    "key_max_concurrent_requests": int,
+    "near_duplicate_index": _parse_bool,
+    "near_duplicate_db_path": str,
+    "near_duplicate_threshold": float,
+    "near_duplicate_seed_threshold": float,
+}
+
+_SETTING_NAMES = {
+    "api_key": "GEMINI_API_KEY",
+    "model_name": "MODEL_NAME",
+    "cache_max_entries": "CACHE_MAX_ENTRIES",
+    "cache_ttl_seconds": "CACHE_TTL_SECONDS",
+    "cache_db_path": "CACHE_DB_PATH",
+    "max_concurrent_requests": "MAX_CONCURRENT_REQUESTS",
+    "requests_per_minute": "REQUESTS_PER_MINUTE",
+    "tokens_per_minute": "TOKENS_PER_MINUTE",
+    "pre_extract": "PRE_EXTRACT",
+    "request_timeout_seconds": "REQUEST_TIMEOUT_SECONDS",
+    "max_retries": "MAX_RETRIES",
+    "hedge_requests": "HEDGE_REQUESTS",
+    "breaker_failure_threshold": "BREAKER_FAILURE_THRESHOLD",
+    "breaker_reset_seconds": "BREAKER_RESET_SECONDS",
+    "metrics_enabled": "METRICS_ENABLED",
+    "metrics_log_json": "METRICS_LOG_JSON",
+    "api_keys": "GEMINI_API_KEYS",
+    "key_requests_per_minute": "KEY_REQUESTS_PER_MINUTE",
+    "key_tokens_per_minute": "KEY_TOKENS_PER_MINUTE",
+    "key_max_concurrent_requests": "KEY_MAX_CONCURRENT_REQUESTS",
+    "near_duplicate_index": "NEAR_DUPLICATE_INDEX",
+    "near_duplicate_db_path": "NEAR_DUPLICATE_DB_PATH",
+    "near_duplicate_threshold": "NEAR_DUPLICATE_THRESHOLD",
+    "near_duplicate_seed_threshold": "NEAR_DUPLICATE_SEED_THRESHOLD",
+}
+
+
+def load_config(**overrides) -> GeminiConfig:
+    """
+    Build a GeminiConfig from explicit keyword overrides, environment
+    variables and Streamlit secrets, in that order of precedence
+    """
+    unknown = set(overrides) - set(_SETTING_NAMES)
+    if unknown:
+        raise ConfigurationError(f"Unknown configuration options: {', '.join(sorted(unknown))}")
+
+    secrets = None
+    values = {}
+    for field_name, setting_name in _SETTING_NAMES.items():
+        value = overrides.get(field_name)
+        if value is None:
+            value = os.environ.get(setting_name)
+        if value is None:
+            if secrets is None:
+                secrets = _load_secrets()
+            value = secrets.get(setting_name)
+        if value is None or value == "":
+            continue
+        try:
+            values[field_name] = _FIELD_TYPES[field_name](value)
+        except (TypeError, ValueError):
+            raise ConfigurationError(f"Invalid value for {setting_name}: {value!r}")
+
+    if "api_key" not in values and values.get("api_keys"):
+        values["api_key"] = values["api_keys"][0]
+    if "api_key" not in values:
+        raise ConfigurationError(
+            "GEMINI_API_KEY is not set: pass api_key explicitly, set the environment "
+            "variable or add it to .streamlit/secrets.toml (or list several keys in GEMINI_API_KEYS)"
+        )
+    return GeminiConfig(**values)
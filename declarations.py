@@ -0,0 +1,342 @@
+"""
+Gemini function declaration derived from VeoPromptSchema.
+
+The declaration, the tools list and the static part of the prompt template are
+generated once at import from `VeoPromptSchema.model_json_schema()`, so the
+model is constrained to the same enums the Pydantic validation accepts.
+Gemini's schema subset has no `default` and only supports string enums, so
+defaults and integer enum values are carried over in the descriptions.
+"""
+import json
+import typing
+from enum import Enum
+
+from pydantic import BaseModel
+
+from errors import DeclarationDriftError
+from schemas import VeoPromptSchema
+
+FUNCTION_NAME = "create_veo_prompt"
+FUNCTION_DESCRIPTION = (
+    "Convert unstructured video description into a structured Veo video generation prompt "
+    "with all required elements: subject, scene, shot composition, camera motion, style, "
+    "and technical parameters."
+)
+PACKED_FUNCTION_NAME = "create_veo_prompts"
+PACKED_FUNCTION_DESCRIPTION = (
+    "Convert several tagged video descriptions into structured Veo video generation prompts, "
+    "one entry per description, each tagged with the ID of its description."
+)
+
+
+def _resolve_ref(node: dict, defs: dict) -> dict:
+    """Inline a $ref (bare or wrapped in a single allOf), keeping sibling keys like description"""
+    node = dict(node)
+    ref = node.pop("$ref", None)
+    all_of = node.get("allOf")
+    if ref is None and all_of and len(all_of) == 1 and "$ref" in all_of[0]:
+        node.pop("allOf")
+        ref = all_of[0]["$ref"]
+    if ref is None:
+        return node
+    target = defs[ref.rsplit("/", 1)[-1]]
+    return {**target, **node}
+
+
+def _append_sentence(description: str, sentence: str) -> str:
+    description = description.strip()
+    if description and not description.endswith("."):
+        description += "."
+    return f"{description} {sentence}".strip()
+
+
+def _convert(node: dict, defs: dict) -> dict:
+    """Convert one JSON schema node into Gemini's OpenAPI subset"""
+    node = _resolve_ref(node, defs)
+    any_of = node.pop("anyOf", None)
+    if any_of is not None:
+        options = [option for option in any_of if option.get("type") != "null"]
+        if len(options) != 1:
+            raise ValueError(f"Unsupported union in schema: {any_of}")
+        node = {**_resolve_ref(options[0], defs), **node}
+
+    converted = {"type": node["type"]}
+    description = node.get("description", "")
+
+    if "enum" in node:
+        if node["type"] == "string":
+            converted["enum"] = [str(value) for value in node["enum"]]
+        else:
+            description = _append_sentence(description, f"One of: {', '.join(str(value) for value in node['enum'])}.")
+    default = node.get("default")
+    if default is not None:
+        description = _append_sentence(description, f"Default: {json.dumps(default)}.")
+
+    if description:
+        converted["description"] = description
+    if node["type"] == "object":
+        converted["properties"] = {
+            name: _convert(child, defs) for name, child in node.get("properties", {}).items()
+        }
+        if node.get("required"):
+            converted["required"] = list(node["required"])
+    elif node["type"] == "array":
+        converted["items"] = _convert(node["items"], defs)
+    return converted
+
+
+def build_parameters(model_cls: typing.Type[BaseModel] = VeoPromptSchema) -> dict:
+    """Gemini parameter schema for a Pydantic model"""
+    schema = model_cls.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}))
+
+
+def build_function_declaration(parameters: dict = None) -> dict:
+    return {
+        "name": FUNCTION_NAME,
+        "description": FUNCTION_DESCRIPTION,
+        "parameters": parameters if parameters is not None else build_parameters(),
+    }
+
+
+def unwrap_annotation(annotation):
+    """Strip Optional[...] and return (base_type, is_list)"""
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    if typing.get_origin(annotation) in (list, typing.List):
+        return typing.get_args(annotation)[0], True
+    return annotation, False
+
+
+def verify_declaration(parameters: dict, model_cls: typing.Type[BaseModel] = VeoPromptSchema, path: str = ""):
+    """
+    Check a parameter schema against the Pydantic model field by field:
+    property names, required fields, nested objects and enum values.
+    Raises DeclarationDriftError on the first mismatch.
+    """
+    def drift(message):
+        raise DeclarationDriftError(f"{path or model_cls.__name__}: {message}")
+
+    properties = parameters.get("properties", {})
+    if set(properties) != set(model_cls.model_fields):
+        drift(f"properties {sorted(properties)} != fields {sorted(model_cls.model_fields)}")
+    required = {name for name, field in model_cls.model_fields.items() if field.is_required()}
+    if set(parameters.get("required", [])) != required:
+        drift(f"required {sorted(parameters.get('required', []))} != {sorted(required)}")
+
+    for name, field in model_cls.model_fields.items():
+        prop = properties[name]
+        field_path = f"{path}.{name}" if path else name
+        annotation, is_list = unwrap_annotation(field.annotation)
+        if is_list:
+            if prop["type"] != "array":
+                drift(f"{field_path} should be an array")
+            prop = prop["items"]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            if prop["type"] != "object":
+                drift(f"{field_path} should be an object")
+            verify_declaration(prop, annotation, field_path)
+        elif isinstance(annotation, type) and issubclass(annotation, Enum):
+            values = [member.value for member in annotation]
+            if issubclass(annotation, str):
+                if prop.get("enum") != values:
+                    drift(f"{field_path} enum {prop.get('enum')} != {values}")
+            elif prop["type"] != "integer" or f"One of: {', '.join(map(str, values))}." not in prop.get("description", ""):
+                drift(f"{field_path} should be an integer restricted to {values}")
+
+
+def _enum_constraints(model_cls: typing.Type[BaseModel] = VeoPromptSchema, names=None) -> str:
+    """Prompt lines listing the allowed values of top-level enum fields (all, or only `names`)"""
+    lines = []
+    for name, field in model_cls.model_fields.items():
+        if names is not None and name not in names:
+            continue
+        annotation, _ = unwrap_annotation(field.annotation)
+        if isinstance(annotation, type) and issubclass(annotation, Enum):
+            values = ", ".join(json.dumps(member.value) for member in annotation)
+            line = f"For {name}, use one of {values}. {field.description}."
+            if field.default is not None:
+                line += f" Default: {json.dumps(getattr(field.default, 'value', field.default))}."
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def leaf_paths(parameters: dict, required_only: bool = False, prefix: str = "") -> list:
+    """Dotted paths of the scalar/array fields in a parameter schema"""
+    paths = []
+    required = set(parameters.get("required", []))
+    for name, child in parameters.get("properties", {}).items():
+        if required_only and name not in required:
+            continue
+        path = f"{prefix}{name}"
+        if child["type"] == "object":
+            paths.extend(leaf_paths(child, required_only, f"{path}."))
+        else:
+            paths.append(path)
+    return paths
+
+
+def select_parameters(parameters: dict, include=None, exclude=None, prefix: str = ""):
+    """
+    Copy of a parameter schema restricted to the dotted paths in `include`
+    (and everything below them) minus the paths in `exclude`. Objects left
+    without properties are dropped, and an object stays required only while it
+    still has required children. Returns None if nothing is left.
+    """
+    include = set(include) if include is not None else None
+    exclude = set(exclude or ())
+    properties = {}
+    for name, child in parameters.get("properties", {}).items():
+        path = f"{prefix}{name}"
+        if path in exclude:
+            continue
+        selected_by_include = include is None or path in include
+        if child["type"] == "object":
+            child_include = None if selected_by_include else {
+                p for p in include if p.startswith(f"{path}.")
+            }
+            if child_include is not None and not child_include:
+                continue
+            selected = select_parameters(child, child_include, exclude, f"{path}.")
+            if selected is not None:
+                properties[name] = selected
+        elif selected_by_include:
+            properties[name] = child
+    if not properties:
+        return None
+
+    selected = {key: value for key, value in parameters.items() if key not in ("properties", "required")}
+    selected["properties"] = properties
+    required = [
+        name for name in parameters.get("required", [])
+        if name in properties
+        and (properties[name]["type"] != "object" or properties[name].get("required"))
+    ]
+    if required:
+        selected["required"] = required
+    return selected
+
+
+def build_packed_function_declaration(parameters: dict) -> dict:
+    """Array-typed declaration carrying one prompt per tagged description"""
+    item = dict(parameters)
+    item["properties"] = {
+        "id": {"type": "string", "description": "ID of the description this prompt was generated for, copied exactly"},
+        **parameters["properties"],
+    }
+    item["required"] = ["id", *parameters.get("required", [])]
+    return {
+        "name": PACKED_FUNCTION_NAME,
+        "description": PACKED_FUNCTION_DESCRIPTION,
+        "parameters": {
+            "type": "object",
+            "properties": {"prompts": {"type": "array", "items": item}},
+            "required": ["prompts"],
+        },
+    }
+
+
+PROMPT_HEADER = """
+Analyze the following video description and extract all relevant elements to create a complete Veo video generation prompt.
+
+Fill in missing details with professional, cinematic defaults based on the context.
+For camera specifications, use industry-standard equipment and techniques.
+For lighting and ambiance, infer from the described mood or setting.
+
+"""
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def build_partial_prompt_template(parameters: dict) -> str:
+    """
+    Shorter prompt for a reduced declaration: only the constraints of the
+    remaining enum fields, plus a `{known_details}` slot listing the values
+    that were already determined locally
+    """
+    return PROMPT_HEADER + _escape(_enum_constraints(names=set(parameters["properties"]))) + """
+
+These details are already known; keep the rest consistent with them and do not return them:
+{known_details}
+
+Video Description:
+{unstructured_text}
+
+Extract and structure the remaining elements.
+"""
+
+
+def build_stream_prompt_template(parameters: dict, partial: bool = False) -> str:
+    """
+    Prompt for streamed JSON output instead of a function call. The schema is
+    written into the prompt with an explicit key order (subject first) so
+    sections can be parsed and shown as soon as each one is complete; with
+    `partial`, a `{known_details}` slot lists values determined locally.
+    """
+    order = ", ".join(parameters["properties"])
+    template = PROMPT_HEADER + _escape(_enum_constraints(names=set(parameters["properties"]))) + """
+
+Respond with a single JSON object and nothing else. Write its top-level keys in this order: """ + order + """.
+It must match this JSON schema:
+""" + _escape(json.dumps(parameters, separators=(",", ":")))
+    if partial:
+        template += """
+
+These details are already known; keep the rest consistent with them and do not return them:
+{known_details}"""
+    return template + """
+
+Video Description:
+{unstructured_text}
+"""
+
+
+PARAMETERS = build_parameters()
+
+FUNCTION_DECLARATION = build_function_declaration(PARAMETERS)
+TOOLS = [{"function_declarations": [FUNCTION_DECLARATION]}]
+TOOL_CONFIG = {'function_calling_config': 'ANY'}
+
+PROMPT_TEMPLATE = PROMPT_HEADER + _escape(_enum_constraints()) + """
+
+Video Description:
+{unstructured_text}
+
+Extract and structure ALL elements: subject details, scene setup, camera work, style, and technical parameters.
+"""
+
+PACKED_FUNCTION_DECLARATION = build_packed_function_declaration(PARAMETERS)
+PACKED_TOOLS = [{"function_declarations": [PACKED_FUNCTION_DECLARATION]}]
+
+PACKED_PROMPT_TEMPLATE = PROMPT_HEADER + _escape(_enum_constraints()) + """
+
+Each video description below starts with an ID tag like [id:d0]. Call create_veo_prompts once,
+with exactly one entry per description, and copy each description's ID into the entry's id field.
+Treat every description independently.
+
+Video Descriptions:
+{descriptions}
+
+Extract and structure ALL elements for every description: subject details, scene setup, camera work, style, and technical parameters.
+"""
+
+REFRAME_PARAMETERS = select_parameters(PARAMETERS, include={"shot", "camera_motion"})
+REFRAME_FUNCTION_DECLARATION = build_function_declaration(REFRAME_PARAMETERS)
+REFRAME_TOOLS = [{"function_declarations": [REFRAME_FUNCTION_DECLARATION]}]
+
+REFRAME_PROMPT_TEMPLATE = """
+The Veo video prompt below was written for a {source_aspect_ratio} ({source_orientation}) frame.
+Re-frame it for a {aspect_ratio} ({orientation}) frame.
+
+Keep the subject, scene, style and audio exactly as they are. Only rewrite the shot composition
+and camera motion so the framing, lens and movement work in the new frame; for vertical video,
+favour closer framing and vertical or push-in movement over wide, lateral moves.
+
+Current prompt:
+{prompt_json}
+
+Return the new shot and camera_motion.
+"""
@@ -0,0 +1,52 @@
+class SchemaEnforcerError(Exception):
+    """Base class for errors raised by the schema enforcer"""
+    retryable = False
+
+
+class ConfigurationError(SchemaEnforcerError):
+    """Missing or invalid configuration, e.g. no Gemini API key"""
+
+
+class InitializationError(SchemaEnforcerError):
+    """The Gemini client could not be created"""
+
+
+class DeclarationDriftError(SchemaEnforcerError):
+    """The Gemini function declaration no longer matches VeoPromptSchema"""
+
+
+class InvalidResponseError(SchemaEnforcerError):
+    """The model's output could not be turned into a valid VeoPromptSchema"""
+
+
+class UpstreamError(SchemaEnforcerError):
+    """
+    The model backend returned an error. Server-side and transient errors are
+    retryable; client errors (invalid argument, permission denied) are not.
+    """
+    retryable = True
+
+    def __init__(self, message: str, retryable: bool = None):
+        super().__init__(message)
+        if retryable is not None:
+            self.retryable = retryable
+
+
+class RateLimitedError(UpstreamError):
+    """The model backend rejected the request for quota reasons (HTTP 429)"""
+
+
+class DeadlineExceededError(UpstreamError):
+    """The model call did not finish within its deadline"""
+
+
+class CircuitOpenError(UpstreamError):
+    """
+    Failing fast because the upstream is degraded. `fallback` holds a
+    best-effort VeoPromptSchema built locally, when one could be made.
+    """
+    retryable = False
+
+    def __init__(self, message: str, fallback=None):
+        super().__init__(message)
+        self.fallback = fallback
@@ -0,0 +1,330 @@
+"""
+Local rule-based pre-extraction of cinematography details.
+
+Runs before the model call and fills the VeoPromptSchema fields it is confident
+about, using two sources:
+
+  - labelled lines such as "Location: a rooftop bar" or "Lens = 85mm", taken verbatim
+  - a compiled lexicon of cinematography vocabulary ("9:16", "85mm", "golden hour",
+    "drone shot", "close-up", "8 seconds", ...), matched in a single regex pass
+
+Matches preceded by a negation ("no close-ups", "without music") are ignored,
+and single-valued fields (aspect ratio, duration, lens, frame rate, framing,
+camera motion, style) are dropped when the text mentions conflicting values.
+Nouns that are often part of the scene (an iPhone, a drone, pans) only count
+with camera context ("shot on iPhone", "drone footage", "the camera pans").
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+
+from cache import fingerprint
+from declarations import PARAMETERS, leaf_paths
+from schemas import VeoPromptSchema
+
+REQUIRED_PATHS = frozenset(leaf_paths(PARAMETERS, required_only=True))
+ALL_PATHS = frozenset(leaf_paths(PARAMETERS))
+
+_NUMBER_WORDS = {"four": 4, "six": 6, "eight": 8}
+_ALLOWED_DURATIONS = {4, 6, 8}
+
+
+def _duration(match):
+    raw = match.group(1)
+    seconds = _NUMBER_WORDS.get(raw, None) if not raw.isdigit() else int(raw)
+    return seconds if seconds in _ALLOWED_DURATIONS else None
+
+
+# (field path, pattern, value or callable(match) -> value). Alternatives are tried
+# left to right at each position, so longer phrases come before their prefixes.
+LEXICON = [
+    ("aspect_ratio", r"9\s*:\s*16|vertical (?:video|format|frame)|portrait (?:mode|orientation|format)"
+                     r"|tiktok (?:video|format)|instagram reels?|youtube shorts", "9:16"),
+    ("aspect_ratio", r"16\s*:\s*9|widescreen|landscape (?:mode|orientation|format)", "16:9"),
+    ("duration_seconds", r"(\d+|four|six|eight)[\s-]*(?:seconds?|secs?|s)", _duration),
+    ("shot.lens", r"(\d{2,3})\s?mm(?: lens)?", lambda m: f"{m.group(1)}mm"),
+    ("shot.frame_rate", r"(\d{2,3})\s?(?:fps|frames per second)", lambda m: f"{m.group(1)}fps"),
+    ("shot.camera_equipment", r"arri alexa(?: mini lf| mini| lf| 35)?", "ARRI Alexa"),
+    ("shot.camera_equipment", r"red (?:komodo|v-raptor|monstro)", "RED"),
+    ("shot.camera_equipment", r"sony (?:venice|fx[369])", "Sony Cinema Line"),
+    ("shot.camera_equipment", r"(?:shot|filmed|recorded) (?:on|with) (?:an? )?iphone|iphone (?:camera|footage|video)",
+     "iPhone"),
+    ("shot.camera_equipment", r"gopro", "GoPro"),
+    ("shot.framing", r"extreme close[- ]?ups?", "extreme close-up"),
+    ("shot.framing", r"medium close[- ]?ups?", "medium close-up"),
+    ("shot.framing", r"close[- ]?ups?", "close-up"),
+    ("shot.framing", r"medium (?:wide )?shots?|mid[- ]shots?", "medium shot"),
+    ("shot.framing", r"extreme wide shots?|establishing shots?", "establishing shot"),
+    ("shot.framing", r"wide(?:[- ]angle)? shots?|long shots?", "wide shot"),
+    ("shot.framing", r"aerial (?:shots?|footage|view)|bird'?s[- ]eye view", "aerial shot"),
+    ("shot.framing", r"over[- ]the[- ]shoulder(?: shots?)?", "over-the-shoulder shot"),
+    ("shot.framing", r"pov shots?|point[- ]of[- ]view shots?", "POV shot"),
+    ("camera_motion.type", r"dolly zoom|vertigo effect", "dolly zoom"),
+    ("camera_motion.type", r"dolly(?:ing)?(?: in| out)?|push[- ]in", "dolly"),
+    ("camera_motion.type", r"crane(?: shot)?|jib", "crane"),
+    ("camera_motion.type", r"orbit(?:ing|al)?|arc shot", "orbit"),
+    ("camera_motion.type", r"steadicam|gimbal", "steadicam"),
+    ("camera_motion.type", r"hand[- ]?held", "handheld"),
+    ("camera_motion.type", r"static (?:shot|camera)|locked[- ]off|tripod", "static"),
+    ("camera_motion.type", r"fpv(?: drone)?|drone (?:shots?|footage|camera|view|flyover)"
+                           r"|(?:shot|filmed|captured) (?:by|with|from) (?:an? )?drone", "drone"),
+    ("camera_motion.type", r"tracking(?: shot)?|(?:camera )?following the (?:subject|motion|action)", "tracking"),
+    ("camera_motion.type", r"(?:slow|quick|whip) pans?|camera (?:\w+ly )?pan(?:s|ning)"
+                           r"|pan(?:s|ning)? (?:left|right)|panning shot", "pan"),
+    ("camera_motion.type", r"tilt(?:s|ing)? (?:up|down)", "tilt"),
+    ("camera_motion.type", r"slow zoom|zoom(?:s|ing)? (?:in|out)", "zoom"),
+    ("scene.time_of_day", r"golden hour", "golden hour"),
+    ("scene.time_of_day", r"blue hour", "blue hour"),
+    ("scene.time_of_day", r"sunrise", "sunrise"),
+    ("scene.time_of_day", r"sunset", "sunset"),
+    ("scene.time_of_day", r"dawn", "dawn"),
+    ("scene.time_of_day", r"dusk|twilight", "dusk"),
+    ("scene.time_of_day", r"midnight", "midnight"),
+    ("scene.time_of_day", r"night(?:time)?", "night"),
+    ("scene.time_of_day", r"midday|noon", "midday"),
+    ("scene.time_of_day", r"morning", "morning"),
+    ("scene.time_of_day", r"afternoon", "afternoon"),
+    ("scene.time_of_day", r"evening", "evening"),
+    ("scene.weather", r"thunderstorms?|storm(?:y|s)?", "stormy"),
+    ("scene.weather", r"rain(?:y|ing|fall)?", "rainy"),
+    ("scene.weather", r"snow(?:y|ing|fall)?", "snowy"),
+    ("scene.weather", r"fog(?:gy)?|mist(?:y)?", "foggy"),
+    ("scene.weather", r"overcast|cloudy", "overcast"),
+    ("scene.weather", r"clear (?:blue )?sky|sunny", "clear sky"),
+    ("scene.lighting", r"neon(?: lights?| lighting| signs?)?", "neon lighting"),
+    ("scene.lighting", r"studio lighting", "studio lighting"),
+    ("scene.lighting", r"natural (?:sun)?light(?:ing)?", "natural light"),
+    ("scene.lighting", r"candle ?light", "candlelight"),
+    ("scene.lighting", r"moonlight|moonlit", "moonlight"),
+    ("scene.lighting", r"back[- ]?lit|backlighting", "backlit"),
+    ("scene.lighting", r"dramatic (?:lighting|shadows)", "dramatic lighting"),
+    ("scene.lighting", r"low[- ]key lighting", "low-key lighting"),
+    ("scene.lighting", r"high[- ]key lighting", "high-key lighting"),
+    ("scene.lighting", r"soft (?:light|lighting)", "soft lighting"),
+    ("scene.lighting", r"bright (?:\w+ )?lighting", "bright lighting"),
+    ("style", r"film noir|noir", "film noir"),
+    ("style", r"documentary", "documentary"),
+    ("style", r"black[- ]and[- ]white", "black and white"),
+    ("style", r"claymation|stop[- ]motion", "stop-motion"),
+    ("style", r"anime", "anime"),
+    ("style", r"animated|animation", "animated"),
+    ("style", r"cyberpunk", "cyberpunk"),
+    ("style", r"horror", "horror"),
+    ("style", r"vintage|retro", "vintage"),
+    ("style", r"photorealistic|hyperrealistic", "photorealistic"),
+    ("style", r"cinematic", "cinematic"),
+    ("generate_audio", r"silent film|no (?:audio|sound)|without (?:audio|sound)", False),
+]
+
+# Technical fields, canonicalized through the lexicon even when labelled
+CANONICAL_PATHS = frozenset({"aspect_ratio", "duration_seconds", "shot.lens", "shot.frame_rate"})
+
+# Fields where two different values in one text mean we are not confident
+EXCLUSIVE_PATHS = CANONICAL_PATHS | {"shot.framing", "camera_motion.type", "style"}
+
+# Labelled lines ("Location: ...") map straight onto fields
+LABELS = {
+    "subject": "subject.description",
+    "character": "subject.description",
+    "action": "subject.action",
+    "wardrobe": "subject.wardrobe",
+    "outfit": "subject.wardrobe",
+    "expression": "subject.expression",
+    "emotion": "subject.expression",
+    "location": "scene.location",
+    "setting": "scene.location",
+    "time": "scene.time_of_day",
+    "time of day": "scene.time_of_day",
+    "lighting": "scene.lighting",
+    "ambiance": "scene.ambiance",
+    "mood": "scene.ambiance",
+    "weather": "scene.weather",
+    "framing": "shot.framing",
+    "shot": "shot.framing",
+    "lens": "shot.lens",
+    "camera": "shot.camera_equipment",
+    "camera equipment": "shot.camera_equipment",
+    "frame rate": "shot.frame_rate",
+    "camera motion": "camera_motion.type",
+    "camera movement": "camera_motion.type",
+    "movement": "camera_motion.type",
+    "style": "style",
+    "ambient sound": "audio.ambient",
+    "ambient": "audio.ambient",
+    "voice": "audio.voice_tone",
+    "voice tone": "audio.voice_tone",
+    "music": "audio.music_style",
+    "negative prompt": "negative_prompt",
+    "avoid": "negative_prompt",
+    "duration": "duration_seconds",
+    "aspect ratio": "aspect_ratio",
+}
+
+# Part of the cache key, so editing the lexicon or labels invalidates old entries
+EXTRACTOR_FINGERPRINT = fingerprint(
+    [(path, pattern, getattr(value, "__name__", value)) for path, pattern, value in LEXICON],
+    LABELS,
+    sorted(EXCLUSIVE_PATHS)
+)
+
+# Lexicon patterns are lowercase and matched against lowercased text, which is
+# noticeably faster than re.IGNORECASE over this many alternatives
+_LEXICON_PATTERN = re.compile(
+    r"(?<!\w)(?:" + "|".join(f"(?P<r{i}>{pattern})" for i, (_, pattern, _) in enumerate(LEXICON)) + r")(?!\w)"
+)
+_RULE_PATTERNS = [re.compile(pattern) for _, pattern, _ in LEXICON]
+_NEGATION = re.compile(r"(?:\bno|\bnot|\bwithout|\bavoid|\bnever)\s+(?:\w+\s+)?$")
+_LABEL_PATTERN = re.compile(
+    r"^\s*(?:[-*]\s*)?(" + "|".join(sorted(map(re.escape, LABELS), key=len, reverse=True)) + r")\s*[:=]\s*(.+?)\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+@dataclass
+class Extraction:
+    """Fields filled locally, as nested VeoPromptSchema-shaped values plus their dotted paths"""
+    values: dict = field(default_factory=dict)
+    paths: frozenset = frozenset()
+
+    @property
+    def covers_required(self) -> bool:
+        return REQUIRED_PATHS <= self.paths
+
+    @property
+    def coverage(self) -> float:
+        return len(self.paths & ALL_PATHS) / len(ALL_PATHS)
+
+    def flat(self) -> dict:
+        flat = {}
+        for path in sorted(self.paths):
+            value = self.values
+            for key in path.split("."):
+                value = value[key]
+            flat[path] = value
+        return flat
+
+
+def _lexicon_value(path_index: int, match):
+    path, _, value = LEXICON[path_index]
+    if callable(value):
+        inner = _RULE_PATTERNS[path_index].fullmatch(match.group(0))
+        return value(inner) if inner else None
+    return value
+
+
+def _scan_lexicon(text: str) -> dict:
+    text = text.lower()
+    found = {}
+    conflicts = set()
+    for match in _LEXICON_PATTERN.finditer(text):
+        if _NEGATION.search(text, max(0, match.start() - 24), match.start()):
+            continue
+        index = int(match.lastgroup[1:])
+        value = _lexicon_value(index, match)
+        if value is None:
+            continue
+        path = LEXICON[index][0]
+        if path not in found:
+            found[path] = value
+        elif found[path] != value and path in EXCLUSIVE_PATHS:
+            conflicts.add(path)
+    for path in conflicts:
+        del found[path]
+    return found
+
+
+def _scan_labels(text: str) -> dict:
+    found = {}
+    for match in _LABEL_PATTERN.finditer(text):
+        path = LABELS[match.group(1).lower()]
+        value = match.group(2)
+        if path == "negative_prompt":
+            found[path] = [item.strip() for item in value.split(",") if item.strip()]
+        elif path in CANONICAL_PATHS:
+            # Technical labels still go through the lexicon so they are canonical
+            lexicon_value = _scan_lexicon(value).get(path)
+            if lexicon_value is not None:
+                found[path] = lexicon_value
+        else:
+            found[path] = value
+    return found
+
+
+def extract(text: str) -> Extraction:
+    """Run the labelled-line and lexicon passes; labelled values win"""
+    flat = _scan_lexicon(text)
+    flat.update(_scan_labels(text))
+    values = {}
+    for path, value in flat.items():
+        target = values
+        *parents, leaf = path.split(".")
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = value
+    return Extraction(values=values, paths=frozenset(flat))
+
+
+# Neutral values for the required fields the extraction did not cover
+DEGRADED_DEFAULTS = {
+    "subject": {"action": "as described"},
+    "scene": {"location": "as described", "time_of_day": "daytime", "lighting": "natural"},
+    "shot": {"framing": "medium shot"},
+    "camera_motion": {"type": "static"},
+    "style": "cinematic",
+}
+
+
+def degraded_result(text: str, extraction: Extraction = None):
+    """
+    Best-effort VeoPromptSchema built only from local extraction and neutral
+    defaults, for when the model is unavailable. The raw text becomes the
+    subject description unless one was extracted.
+    """
+    extraction = extraction if extraction is not None else extract(text)
+    values = deep_merge(DEGRADED_DEFAULTS, {"subject": {"description": " ".join(text.split())[:500]}})
+    return VeoPromptSchema(**deep_merge(values, extraction.values))
+
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """Merge nested dicts; values from `override` win"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class ExtractionStats:
+    """Coverage and savings of the pre-extraction stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inputs = 0
+        self.fields_extracted = 0
+        self.partial_calls = 0
+        self.model_calls_skipped = 0
+        self.estimated_tokens_saved = 0
+
+    def record(self, extraction: Extraction, skipped: bool, tokens_saved: int):
+        with self._lock:
+            self.inputs += 1
+            self.fields_extracted += len(extraction.paths & ALL_PATHS)
+            if skipped:
+                self.model_calls_skipped += 1
+            elif extraction.paths:
+                self.partial_calls += 1
+            self.estimated_tokens_saved += tokens_saved
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "inputs": self.inputs,
+                "coverage_rate": self.fields_extracted / (self.inputs * len(ALL_PATHS)) if self.inputs else 0.0,
+                "partial_calls": self.partial_calls,
+                "model_calls_skipped": self.model_calls_skipped,
+                "skip_rate": self.model_calls_skipped / self.inputs if self.inputs else 0.0,
+                "estimated_tokens_saved": self.estimated_tokens_saved,
+            }
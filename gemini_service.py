@@ -1,129 +1,798 @@
-import google.generativeai as genai
-import streamlit as st
-from schemas import VeoPromptSchema
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from pydantic import TypeAdapter, ValidationError
+from schemas import AspectRatio, Duration, VeoPromptSchema
+from cache import ResponseCache, fingerprint, make_cache_key
+from rate_limit import RateLimiter, estimate_tokens
+from async_utils import iterate_sync, run_sync
+from singleflight import SingleFlight
+from config import GeminiConfig, load_config
+from errors import CircuitOpenError, DeadlineExceededError, InvalidResponseError, SchemaEnforcerError, UpstreamError
+from resilience import CircuitBreaker, LatencyTracker, RetryPolicy
+from metrics import Metrics
+from backends import GeminiBackend, GenerationResult, ModelBackend
+from keypool import KeyPool
+from neardup import NearDuplicateIndex, Seed
+from declarations import (
+    FUNCTION_DECLARATION, PACKED_FUNCTION_DECLARATION, PACKED_PROMPT_TEMPLATE, PACKED_TOOLS,
+    PARAMETERS, PROMPT_TEMPLATE, REFRAME_FUNCTION_DECLARATION, REFRAME_PROMPT_TEMPLATE, REFRAME_TOOLS,
+    TOOLS, TOOL_CONFIG,
+    build_function_declaration, build_partial_prompt_template, build_stream_prompt_template, select_parameters
+)
+from packing import (
+    DEFAULT_PACK_SIZE, DEFAULT_PACK_TOKEN_BUDGET, PackItem, PackSizer, demultiplex, render_descriptions
+)
+from extractor import EXTRACTOR_FINGERPRINT, Extraction, ExtractionStats, deep_merge, degraded_result, extract
+from repair import RepairStats, invalid_paths, known_values, repair
+from streaming import SectionParser, StreamEvent, StreamStats
+from variants import ORIENTATIONS, Variant, derive, needs_reframe, variant_matrix
+
+CONFIG_FINGERPRINT = fingerprint(FUNCTION_DECLARATION, PROMPT_TEMPLATE)
+DECLARATION_TOKENS = estimate_tokens(json.dumps(FUNCTION_DECLARATION))
+PACKED_DECLARATION_TOKENS = estimate_tokens(json.dumps(PACKED_FUNCTION_DECLARATION))
+PACKED_OVERHEAD_TOKENS = estimate_tokens(PACKED_PROMPT_TEMPLATE) + PACKED_DECLARATION_TOKENS
+REFRAME_FINGERPRINT = fingerprint(REFRAME_FUNCTION_DECLARATION, REFRAME_PROMPT_TEMPLATE)
+REFRAME_DECLARATION_TOKENS = estimate_tokens(json.dumps(REFRAME_FUNCTION_DECLARATION))
+
+@dataclass(frozen=True)
+class RequestPlan:
+    """Tools and prompt template for one model call, with the declaration's token estimate"""
+    tools: list
+    prompt_template: str
+    declaration_tokens: int
+    partial: bool = False
+    parameters: dict = None
+
+    def render(self, unstructured_text: str, extraction: Extraction = None) -> str:
+        if not self.partial:
+            return self.prompt_template.format(unstructured_text=unstructured_text)
+        known_details = "\n".join(
+            f"- {path}: {json.dumps(value)}" for path, value in extraction.flat().items()
+        )
+        return self.prompt_template.format(unstructured_text=unstructured_text, known_details=known_details)
+
+FULL_PLAN = RequestPlan(TOOLS, PROMPT_TEMPLATE, DECLARATION_TOKENS)
+
+@lru_cache(maxsize=256)
+def partial_plan(known_paths: frozenset) -> RequestPlan:
+    """Reduced declaration and shorter prompt covering only the fields not already known"""
+    parameters = select_parameters(PARAMETERS, exclude=known_paths)
+    if not known_paths or parameters is None:
+        return FULL_PLAN
+    declaration = build_function_declaration(parameters)
+    return RequestPlan(
+        tools=[{"function_declarations": [declaration]}],
+        prompt_template=build_partial_prompt_template(parameters),
+        declaration_tokens=estimate_tokens(json.dumps(declaration)),
+        partial=True
+    )
+
+@lru_cache(maxsize=256)
+def reask_plan(paths: frozenset) -> RequestPlan:
+    """Declaration and prompt asking again for only the given (invalid) fields"""
+    parameters = select_parameters(PARAMETERS, include=paths)
+    if parameters is None:
+        return FULL_PLAN
+    declaration = build_function_declaration(parameters)
+    return RequestPlan(
+        tools=[{"function_declarations": [declaration]}],
+        prompt_template=build_partial_prompt_template(parameters),
+        declaration_tokens=estimate_tokens(json.dumps(declaration)),
+        partial=True
+    )
+
+@lru_cache(maxsize=256)
+def stream_plan(known_paths: frozenset) -> RequestPlan:
+    """JSON-mode streaming prompt covering the fields not already known"""
+    parameters = select_parameters(PARAMETERS, exclude=known_paths) if known_paths else None
+    partial = parameters is not None
+    parameters = parameters or PARAMETERS
+    return RequestPlan(
+        tools=[],
+        prompt_template=build_stream_prompt_template(parameters, partial=partial),
+        declaration_tokens=0,
+        partial=partial,
+        parameters=parameters
+    )
+
+SECTION_ADAPTERS = {
+    name: TypeAdapter(field.annotation) for name, field in VeoPromptSchema.model_fields.items()
+}
 
 class GeminiSchemaEnforcer:
-    def __init__(self):
-        """Initialize Gemini with function calling capabilities using Streamlit secrets"""
+    def __init__(self, cache: ResponseCache = None, rate_limiter: RateLimiter = None,
+                 api_key: str = None, model_name: str = None, backend: ModelBackend = None,
+                 pre_extract: bool = True, request_timeout: float = 30.0,
+                 retry_policy: RetryPolicy = None, hedge: bool = False,
+                 circuit_breaker: CircuitBreaker = None, metrics: Metrics = None,
+                 near_duplicates: NearDuplicateIndex = None):
+        """
+        Initialize Gemini with function calling capabilities. Without an explicit
+        backend, the API key and model name fall back to environment variables and
+        Streamlit secrets. Raises ConfigurationError or InitializationError on failure.
+        With pre_extract, a local rule-based pass fills the fields it is confident
+        about and only the rest is requested from the model.
+        Every model call gets request_timeout seconds (None for no deadline), is
+        retried with jittered backoff on retryable errors, and fails fast with
+        CircuitOpenError while the circuit breaker is open. With hedge, a second
+        request is sent once a call is slower than the recent p95.
+        Per-stage timings and counters go to `metrics` (disabled by default).
+        With a near-duplicate index, an input close to one normalized before
+        reuses its prompt, or seeds a call for only the fields that changed.
+        """
+        if backend is None:
+            config = load_config(api_key=api_key, model_name=model_name)
+            backend = GeminiBackend(config.api_key, config.model_name)
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.pre_extract = pre_extract
+        self.config_fingerprint = (
+            fingerprint(CONFIG_FINGERPRINT, EXTRACTOR_FINGERPRINT) if pre_extract else CONFIG_FINGERPRINT
+        )
+        self.single_flight = SingleFlight()
+        self.extraction_stats = ExtractionStats()
+        self.repair_stats = RepairStats()
+        self.request_timeout = request_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.hedge = hedge
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.stream_stats = StreamStats()
+        self.metrics = metrics or Metrics()
+        self.resilience_stats = {"retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "degraded": 0}
+        self.pack_sizer = PackSizer(overhead_tokens=PACKED_OVERHEAD_TOKENS)
+        self.packing_stats = {"packed_requests": 0, "packed_items": 0, "retried_items": 0}
+        self.near_duplicates = near_duplicates
+        self.near_duplicate_namespace = fingerprint(self.model_name, self.config_fingerprint)
+
+    @classmethod
+    def from_config(cls, config: GeminiConfig = None) -> "GeminiSchemaEnforcer":
+        """
+        Build an enforcer with its cache and rate limiter from a GeminiConfig.
+        With several API keys, a KeyPool schedules calls over them and takes
+        the place of both the backend and the shared rate limiter.
+        """
+        config = config or load_config()
+        backend = None
+        rate_limiter = RateLimiter(
+            max_concurrency=config.max_concurrent_requests,
+            requests_per_minute=config.requests_per_minute,
+            tokens_per_minute=config.tokens_per_minute
+        )
+        if len(config.api_keys) > 1:
+            backend = rate_limiter = KeyPool.for_keys(
+                config.api_keys,
+                config.model_name,
+                requests_per_minute=config.key_requests_per_minute,
+                tokens_per_minute=config.key_tokens_per_minute,
+                max_concurrency=config.key_max_concurrent_requests
+            )
+        return cls(
+            cache=ResponseCache(
+                max_entries=config.cache_max_entries,
+                ttl_seconds=config.cache_ttl_seconds,
+                db_path=config.cache_db_path
+            ),
+            rate_limiter=rate_limiter,
+            backend=backend,
+            api_key=config.api_key,
+            model_name=config.model_name,
+            pre_extract=config.pre_extract,
+            request_timeout=config.request_timeout_seconds,
+            retry_policy=RetryPolicy(max_attempts=config.max_retries + 1),
+            hedge=config.hedge_requests,
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=config.breaker_failure_threshold,
+                reset_timeout_seconds=config.breaker_reset_seconds
+            ),
+            metrics=Metrics(enabled=config.metrics_enabled, log_json=config.metrics_log_json),
+            near_duplicates=NearDuplicateIndex(
+                path=config.near_duplicate_db_path,
+                threshold=config.near_duplicate_threshold,
+                seed_threshold=config.near_duplicate_seed_threshold
+            ) if config.near_duplicate_index or config.near_duplicate_db_path else None
+        )
+
+    def _function_args(self, result: GenerationResult, known: dict = None) -> dict:
+        """Extract the function call args from a model response and merge known values"""
+        if result.function_calls:
+            structured_data = result.function_calls[0].args
+            if known:
+                structured_data = deep_merge(structured_data, known)
+            return structured_data
+        else:
+            raise InvalidResponseError("Gemini did not return a function call")
+
+    def _validate(self, structured_data: dict, record: bool = True):
+        """
+        Validate model output, running the local repair pass only if it fails.
+        Returns (VeoPromptSchema, None), or (None, (repaired data, ValidationError))
+        when fields are still invalid after repair. Re-ask responses pass
+        record=False, since repair_stats counts them with record_reask only.
+        """
+        with self.metrics.stage("validate"):
+            try:
+                result = VeoPromptSchema(**structured_data)
+            except ValidationError:
+                pass
+            else:
+                if record:
+                    self.repair_stats.record_valid()
+                return result, None
+
+            repaired, fixes = repair(structured_data)
+            try:
+                result = VeoPromptSchema(**repaired)
+            except ValidationError as e:
+                if record:
+                    self.repair_stats.record_invalid(fixes)
+                return None, (repaired, e)
+            if record:
+                self.repair_stats.record_repaired(fixes)
+            return result, None
+
+    async def _send(self, prompt: str, tools: list, estimated_tokens: int,
+                    track_latency: bool = False, admitted: asyncio.Event = None) -> GenerationResult:
+        """
+        One upstream request under the rate limiter, bounded by the request
+        deadline; `admitted` is set once the rate limiter lets it through
+        """
+        queued = time.perf_counter()
+        async with self.rate_limiter.acquire(estimated_tokens) as settle:
+            if admitted is not None:
+                admitted.set()
+            started = time.perf_counter()
+            self.metrics.observe("queue", started - queued)
+            try:
+                response = await asyncio.wait_for(
+                    self.backend.generate(prompt, tools, TOOL_CONFIG),
+                    self.request_timeout
+                )
+            except asyncio.TimeoutError:
+                self.resilience_stats["timeouts"] += 1
+                self.metrics.inc("timeouts_total")
+                raise DeadlineExceededError(f"Gemini did not respond within {self.request_timeout}s")
+            settle(response.total_tokens)
+        elapsed = time.perf_counter() - started
+        if track_latency:
+            self.latency.record(elapsed)
+        self.metrics.observe("model", elapsed - response.decode_seconds)
+        self.metrics.observe("decode", response.decode_seconds)
+        self.metrics.tokens(response.prompt_tokens, response.output_tokens)
+        return response
+
+    async def _hedged(self, prompt: str, tools: list, estimated_tokens: int, delay: float) -> GenerationResult:
+        """
+        Send a second request if the first is slower than `delay` once admitted
+        by the rate limiter, unless the limiter has no free slot for it; the
+        first success wins
+        """
+        admitted = asyncio.Event()
+        first = asyncio.ensure_future(
+            self._send(prompt, tools, estimated_tokens, track_latency=True, admitted=admitted)
+        )
+        pending = {first}
         try:
-            api_key = st.secrets["GEMINI_API_KEY"]
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        except Exception as e:
-            st.error(f"Failed to initialize Gemini: {str(e)}")
-            st.stop()
-        
-    def _create_function_declaration(self):
-        """Create function declaration for Veo prompt structure"""
-        return {
-            "name": "create_veo_prompt",
-            "description": "Convert unstructured video description into a structured Veo video generation prompt with all required elements: subject, scene, shot composition, camera motion, style, and technical parameters.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "subject": {
-                        "type": "object",
-                        "description": "Subject/character specifications",
-                        "properties": {
-                            "description": {"type": "string", "description": "Detailed description of subject"},
-                            "action": {"type": "string", "description": "What the subject is doing"},
-                            "wardrobe": {"type": "string", "description": "Clothing details"},
-                            "expression": {"type": "string", "description": "Facial expression"}
-                        },
-                        "required": ["description", "action"]
-                    },
-                    "scene": {
-                        "type": "object",
-                        "description": "Scene environment specifications",
-                        "properties": {
-                            "location": {"type": "string"},
-                            "time_of_day": {"type": "string"},
-                            "lighting": {"type": "string"},
-                            "ambiance": {"type": "string"},
-                            "weather": {"type": "string"}
-                        },
-                        "required": ["location", "time_of_day", "lighting"]
-                    },
-                    "shot": {
-                        "type": "object",
-                        "properties": {
-                            "framing": {"type": "string", "description": "Shot framing type"},
-                            "lens": {"type": "string"},
-                            "camera_equipment": {"type": "string"},
-                            "frame_rate": {"type": "string"}
-                        },
-                        "required": ["framing"]
-                    },
-                    "camera_motion": {
-                        "type": "object",
-                        "properties": {
-                            "type": {"type": "string", "description": "Camera motion type"},
-                            "description": {"type": "string"}
-                        },
-                        "required": ["type"]
-                    },
-                    "style": {"type": "string", "description": "Visual style"},
-                    "audio": {
-                        "type": "object",
-                        "properties": {
-                            "ambient": {"type": "string"},
-                            "voice_tone": {"type": "string"},
-                            "music_style": {"type": "string"}
-                        }
-                    },
-                    "duration_seconds": {
-                        "type": "integer", 
-                        "description": "Video duration in seconds (typically 4, 6, or 8)"
-                    },
-                    "aspect_ratio": {
-                        "type": "string",
-                        "description": "Video aspect ratio (typically 16:9 or 9:16)"
-                    },
-                    "generate_audio": {"type": "boolean"},
-                    "negative_prompt": {
-                        "type": "array",
-                        "items": {"type": "string"}
-                    }
-                },
-                "required": ["subject", "scene", "shot", "camera_motion", "style"]
-            }
-        }
-    
-    def normalize_to_schema(self, unstructured_text: str) -> VeoPromptSchema:
+            # Time spent queued for a slot is not upstream latency, so it does not count towards `delay`
+            admission = asyncio.ensure_future(admitted.wait())
+            try:
+                await asyncio.wait({first, admission}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                admission.cancel()
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done and not self.rate_limiter.saturated:
+                self.resilience_stats["hedges"] += 1
+                self.metrics.inc("hedges_total")
+                pending.add(asyncio.ensure_future(self._send(prompt, tools, estimated_tokens, track_latency=True)))
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.resilience_stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call(self, prompt: str, tools: list, estimated_tokens: int, hedge: bool = False) -> GenerationResult:
+        """
+        Model call with the circuit breaker, per-request deadline, optional hedging
+        and jittered exponential backoff on retryable upstream errors
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.circuit_breaker.allow()
+            hedge_delay = self.latency.percentile(0.95) if hedge and self.hedge else None
+            try:
+                if hedge_delay is not None:
+                    response = await self._hedged(prompt, tools, estimated_tokens, hedge_delay)
+                else:
+                    response = await self._send(prompt, tools, estimated_tokens, track_latency=hedge)
+            except UpstreamError as e:
+                if e.retryable:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.release()
+                if not e.retryable or attempt >= self.retry_policy.max_attempts:
+                    raise
+                retry_reason = type(e).__name__
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            else:
+                self.circuit_breaker.record_success()
+                return response
+            self.resilience_stats["retries"] += 1
+            self.metrics.inc("retries_total", type=retry_reason)
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+
+    async def _reask(self, unstructured_text: str, repaired: dict, error: ValidationError) -> VeoPromptSchema:
+        """Ask the model again for only the fields that are still invalid, keeping the rest"""
+        paths = invalid_paths(error)
+        values, known_paths = known_values(repaired, paths)
+        plan = reask_plan(paths)
+        prompt = plan.render(unstructured_text, Extraction(values=values, paths=known_paths))
+        response = await self._call(prompt, plan.tools, estimate_tokens(prompt) + plan.declaration_tokens, hedge=True)
+        result, failure = self._validate(self._function_args(response, values), record=False)
+        self.repair_stats.record_reask(recovered=result is not None)
+        if failure is not None:
+            raise InvalidResponseError(f"Gemini returned an invalid prompt: {failure[1]}") from failure[1]
+        return result
+
+    def _near_duplicate(self, unstructured_text: str):
+        """Seed from the closest past input, or None without an index or a close enough match"""
+        if self.near_duplicates is None:
+            return None
+        with self.metrics.stage("near_duplicate"):
+            seed = self.near_duplicates.seed(unstructured_text, self.near_duplicate_namespace)
+        result = "miss" if seed is None else "reuse" if seed.reuse else "seed"
+        self.metrics.inc("near_duplicate_lookups_total", result=result)
+        return seed
+
+    def _extract(self, unstructured_text: str, seed: Seed = None) -> Extraction:
+        """Local extraction, on top of the still-valid fields of a near-duplicate seed"""
+        extraction = extract(unstructured_text) if self.pre_extract else Extraction()
+        if seed is None:
+            return extraction
+        return Extraction(values=deep_merge(seed.values, extraction.values), paths=seed.paths | extraction.paths)
+
+    def _store(self, cache_key: str, unstructured_text: str, result: VeoPromptSchema):
+        if self.cache is not None:
+            self.cache.set(cache_key, result)
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(unstructured_text, result, self.near_duplicate_namespace)
+
+    def _cached(self, cache_key: str) -> Optional[VeoPromptSchema]:
+        if self.cache is None:
+            return None
+        with self.metrics.stage("cache"):
+            cached = self.cache.get(cache_key)
+        self.metrics.inc("cache_lookups_total", result="miss" if cached is None else "hit")
+        return cached
+
+    def _prepare(self, unstructured_text: str, cache_key: str) -> tuple:
+        """
+        Near-duplicate reuse, local extraction and local completion, shared by
+        the normalize and stream paths: (result, None) when no model call is
+        needed, otherwise (None, extraction)
+        """
+        seed = self._near_duplicate(unstructured_text)
+        if seed is not None and seed.reuse:
+            if self.cache is not None:
+                self.cache.set(cache_key, seed.prompt)
+            return seed.prompt, None
+        with self.metrics.stage("extract"):
+            extraction = self._extract(unstructured_text, seed)
+        regenerate = seed.regenerate - extraction.paths if seed is not None else frozenset()
+        if extraction.covers_required and not regenerate:
+            try:
+                result = VeoPromptSchema(**extraction.values)
+            except ValidationError:
+                result = None
+            if result is not None:
+                self._record_extraction(unstructured_text, extraction)
+                self._store(cache_key, unstructured_text, result)
+                return result, None
+        return None, extraction
+
+    def _record_extraction(self, unstructured_text: str, extraction: Extraction, estimated_tokens: int = None):
+        """Pre-extraction stats; `estimated_tokens` is the model call's, None when the call was skipped"""
+        if not self.pre_extract:
+            return
+        full_tokens = estimate_tokens(FULL_PLAN.render(unstructured_text)) + DECLARATION_TOKENS
+        if estimated_tokens is None:
+            self.extraction_stats.record(extraction, skipped=True, tokens_saved=full_tokens)
+        else:
+            self.extraction_stats.record(extraction, skipped=False, tokens_saved=full_tokens - estimated_tokens)
+
+    async def anormalize_to_schema(self, unstructured_text: str) -> VeoPromptSchema:
+        """
+        Convert unstructured text to structured Veo prompt using function calling,
+        without blocking the event loop for the network round-trip. Identical
+        concurrent requests share a single upstream call. Raises UpstreamError
+        subclasses (check `.retryable`) or InvalidResponseError; while the circuit
+        breaker is open, CircuitOpenError carries a locally built `.fallback`.
+        Any other exception is a bug, not an upstream failure, and propagates as is.
+        """
+        with self.metrics.request("normalize"):
+            cache_key = make_cache_key(unstructured_text, self.model_name, self.config_fingerprint)
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
+
+            return await self.single_flight.do(
+                cache_key,
+                lambda: self._generate(unstructured_text, cache_key)
+            )
+
+    async def _generate(self, unstructured_text: str, cache_key: str) -> VeoPromptSchema:
+        result, extraction = self._prepare(unstructured_text, cache_key)
+        if result is not None:
+            return result
+
+        with self.metrics.stage("prompt"):
+            plan = partial_plan(extraction.paths)
+            enhanced_prompt = plan.render(unstructured_text, extraction)
+        estimated_tokens = estimate_tokens(enhanced_prompt) + plan.declaration_tokens
+        self._record_extraction(unstructured_text, extraction, estimated_tokens)
+
+        try:
+            response = await self._call(enhanced_prompt, plan.tools, estimated_tokens, hedge=True)
+            result, failure = self._validate(self._function_args(response, extraction.values))
+            if failure is not None:
+                result = await self._reask(unstructured_text, *failure)
+        except CircuitOpenError as e:
+            e.fallback = self._degraded(unstructured_text, extraction)
+            raise
+
+        self._store(cache_key, unstructured_text, result)
+        return result
+
+    async def astream_to_schema(self, unstructured_text: str):
+        """
+        Streaming variant of anormalize_to_schema: an async generator of
+        StreamEvents, one per top-level section (subject, scene, shot, ...) as
+        soon as it has arrived and validated, then a final event with the full
+        VeoPromptSchema. Sections known locally are emitted before the model call.
+        The stream runs in a task of its own, so a slow consumer never holds a
+        rate limiter permit; identical concurrent requests share it.
         """
-        Convert unstructured text to structured Veo prompt using function calling
-        """
-        function_declaration = self._create_function_declaration()
-        tools = [{"function_declarations": [function_declaration]}]
-        
-        enhanced_prompt = f"""
-        Analyze the following video description and extract all relevant elements to create a complete Veo video generation prompt.
-        
-        Fill in missing details with professional, cinematic defaults based on the context.
-        For camera specifications, use industry-standard equipment and techniques.
-        For lighting and ambiance, infer from the described mood or setting.
-        
-        For duration_seconds, use 8 for detailed scenes, 6 for medium length, or 4 for short clips.
-        For aspect_ratio, use "16:9" for landscape/cinematic or "9:16" for vertical/mobile content.
-        
-        Video Description:
-        {unstructured_text}
-        
-        Extract and structure ALL elements: subject details, scene setup, camera work, style, and technical parameters.
-        """
-        
+        started = time.perf_counter()
+        first_field = None
+
+        def event(section, value, final=False):
+            nonlocal first_field
+            elapsed = time.perf_counter() - started
+            if first_field is None:
+                first_field = elapsed
+                self.metrics.observe("first_field", elapsed)
+            if final:
+                self.stream_stats.record(first_field, elapsed)
+                self.metrics.observe("stream_total", elapsed)
+            return StreamEvent(section, value, elapsed, final)
+
+        sections = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self._stream(unstructured_text, lambda name, value: sections.put_nowait((name, value)))
+        )
+        task.add_done_callback(lambda _: sections.put_nowait(None))
+        emitted = set()
         try:
-            response = self.model.generate_content(
-                enhanced_prompt,
-                tools=tools,
-                tool_config={'function_calling_config': 'ANY'}
+            while True:
+                item = await sections.get()
+                if item is None:
+                    break
+                name, value = item
+                emitted.add(name)
+                yield event(name, value)
+            result = task.result()
+        finally:
+            task.cancel()
+
+        # Sections of a cached, coalesced or re-asked result that were not streamed
+        for name in VeoPromptSchema.model_fields:
+            if name not in emitted:
+                yield event(name, getattr(result, name))
+        yield event(None, result, final=True)
+
+    async def _stream(self, unstructured_text: str, publish) -> VeoPromptSchema:
+        """Result for astream_to_schema, passing each validated section to `publish(name, value)`"""
+        with self.metrics.request("stream"):
+            cache_key = make_cache_key(unstructured_text, self.model_name, self.config_fingerprint)
+            cached = self._cached(cache_key)
+            if cached is not None:
+                return cached
+
+            return await self.single_flight.do(
+                cache_key,
+                lambda: self._generate_streamed(unstructured_text, cache_key, publish)
             )
-            
-            if response.candidates[0].content.parts[0].function_call:
-                function_call = response.candidates[0].content.parts[0].function_call
-                structured_data = dict(function_call.args)
-                return VeoPromptSchema(**structured_data)
+
+    async def _generate_streamed(self, unstructured_text: str, cache_key: str, publish) -> VeoPromptSchema:
+        result, extraction = self._prepare(unstructured_text, cache_key)
+        if result is not None:
+            return result
+
+        with self.metrics.stage("prompt"):
+            plan = stream_plan(extraction.paths)
+            prompt = plan.render(unstructured_text, extraction)
+        estimated_tokens = estimate_tokens(prompt)
+        self._record_extraction(unstructured_text, extraction, estimated_tokens)
+        # Sections known locally go out before the model call; the model streams the rest
+        streamed = set(plan.parameters["properties"])
+        for name, value in extraction.values.items():
+            if name not in streamed:
+                section = self._validate_section(name, value)
+                if section is not None:
+                    publish(name, section)
+
+        try:
+            data = await self._call_streamed(prompt, plan.parameters, estimated_tokens, extraction, publish)
+            result, failure = self._validate(deep_merge(data, extraction.values))
+            if failure is not None:
+                result = await self._reask(unstructured_text, *failure)
+        except CircuitOpenError as e:
+            e.fallback = self._degraded(unstructured_text, extraction)
+            raise
+        self._store(cache_key, unstructured_text, result)
+        return result
+
+    async def _call_streamed(self, prompt: str, parameters: dict, estimated_tokens: int,
+                             extraction: Extraction, publish) -> dict:
+        """
+        Streamed model call with the circuit breaker, per-chunk deadline and
+        jittered backoff on retryable errors, as long as no section has been
+        published yet. Returns the raw sections by name.
+        """
+        data = {}
+        attempt = 0
+        while True:
+            attempt += 1
+            self.circuit_breaker.allow()
+            try:
+                await self._send_streamed(prompt, parameters, estimated_tokens, extraction, data, publish)
+            except UpstreamError as e:
+                if e.retryable:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.release()
+                if not e.retryable or data or attempt >= self.retry_policy.max_attempts:
+                    raise
+                retry_reason = type(e).__name__
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
             else:
-                raise ValueError("Gemini did not return a function call")
-        except Exception as e:
-            raise Exception(f"Error during schema normalization: {str(e)}")
+                self.circuit_breaker.record_success()
+                return data
+            self.resilience_stats["retries"] += 1
+            self.metrics.inc("retries_total", type=retry_reason)
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+
+    async def _send_streamed(self, prompt: str, parameters: dict, estimated_tokens: int,
+                             extraction: Extraction, data: dict, publish):
+        """One streamed upstream request under the rate limiter, filling `data` as sections arrive"""
+        queued = time.perf_counter()
+        async with self.rate_limiter.acquire(estimated_tokens) as settle:
+            started = time.perf_counter()
+            self.metrics.observe("queue", started - queued)
+            parser = SectionParser()
+            output_tokens = 0
+            chunks = self.backend.stream_json(prompt, parameters).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.request_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.resilience_stats["timeouts"] += 1
+                    self.metrics.inc("timeouts_total")
+                    raise DeadlineExceededError(f"Gemini stream stalled for {self.request_timeout}s")
+                output_tokens += estimate_tokens(chunk)
+                for name, value in parser.feed(chunk):
+                    if name not in VeoPromptSchema.model_fields:
+                        continue
+                    known = extraction.values.get(name)
+                    if isinstance(value, dict) and isinstance(known, dict):
+                        value = deep_merge(value, known)
+                    data[name] = value
+                    section = self._validate_section(name, value)
+                    if section is not None:
+                        publish(name, section)
+            # Streamed responses carry no usage metadata: settle on the estimate
+            settle(estimated_tokens + output_tokens)
+        self.metrics.observe("model", time.perf_counter() - started)
+
+    def _validate_section(self, name: str, value):
+        """Validated value of one top-level field, repaired if needed, or None"""
+        try:
+            return SECTION_ADAPTERS[name].validate_python(value)
+        except ValidationError:
+            pass
+        repaired, _ = repair({name: value})
+        try:
+            return SECTION_ADAPTERS[name].validate_python(repaired.get(name))
+        except ValidationError:
+            return None
+
+    def stream_to_schema(self, unstructured_text: str):
+        """Blocking iterator over astream_to_schema events, for Streamlit and other sync callers"""
+        return iterate_sync(self.astream_to_schema(unstructured_text))
+
+    def _degraded(self, unstructured_text: str, extraction: Extraction = None):
+        """Locally built result served while the upstream is unavailable (never cached)"""
+        try:
+            result = degraded_result(unstructured_text, extraction)
+        except ValidationError:
+            return None
+        self.resilience_stats["degraded"] += 1
+        return result
+
+    def normalize_to_schema(self, unstructured_text: str) -> VeoPromptSchema:
+        """
+        Convert unstructured text to structured Veo prompt using function calling.
+        Thin blocking wrapper over anormalize_to_schema.
+        """
+        return run_sync(self.anormalize_to_schema(unstructured_text))
+
+    async def _generate_pack(self, pack: list) -> dict:
+        """One packed model call; returns item id -> VeoPromptSchema or the item's exception"""
+        prompt = PACKED_PROMPT_TEMPLATE.format(descriptions=render_descriptions(pack))
+        response = await self._call(prompt, PACKED_TOOLS, estimate_tokens(prompt) + PACKED_DECLARATION_TOKENS)
+        self.packing_stats["packed_requests"] += 1
+        self.packing_stats["packed_items"] += len(pack)
+        self.pack_sizer.observe(len(pack), response.output_tokens)
+        if not response.function_calls:
+            raise InvalidResponseError("Gemini did not return a function call")
+
+        entries = demultiplex(response.function_calls, pack)
+        outcomes = {}
+        for item in pack:
+            entry = entries.get(item.id)
+            if entry is None:
+                outcomes[item.id] = InvalidResponseError(f"Gemini returned no prompt for description {item.id}")
+                continue
+            if item.known_values:
+                entry = deep_merge(entry, item.known_values)
+            result, failure = self._validate(entry)
+            outcomes[item.id] = result if failure is None else InvalidResponseError(
+                f"Gemini returned an invalid prompt for description {item.id}: {failure[1]}"
+            )
+        return outcomes
+
+    async def anormalize_many(self, unstructured_texts: list, max_pack_size: int = DEFAULT_PACK_SIZE,
+                              token_budget: int = DEFAULT_PACK_TOKEN_BUDGET, max_attempts: int = 3) -> list:
+        """
+        Normalize several descriptions, packing up to max_pack_size of them (within
+        token_budget) into each model call. Every item is validated independently and
+        only missing or invalid items are re-packed, up to max_attempts (upstream
+        errors are already retried with backoff per call). Returns one VeoPromptSchema
+        or exception per input, in input order.
+        """
+        results = [None] * len(unstructured_texts)
+        positions = {}
+        pending = []
+        for index, unstructured_text in enumerate(unstructured_texts):
+            cache_key = make_cache_key(unstructured_text, self.model_name, self.config_fingerprint)
+            if cache_key in positions:
+                positions[cache_key].append(index)
+                continue
+            positions[cache_key] = [index]
+            result = self._cached(cache_key)
+            if result is None:
+                result, extraction = self._prepare(unstructured_text, cache_key)
+            if result is not None:
+                results[index] = result
+                continue
+            if self.pre_extract:
+                self.extraction_stats.record(extraction, skipped=False, tokens_saved=0)
+            pending.append(PackItem(f"d{len(pending)}", unstructured_text, cache_key, extraction.values or None))
+
+        while pending:
+            packs = self.pack_sizer.packs(pending, max_pack_size, token_budget)
+            pack_outcomes = await asyncio.gather(
+                *(self._generate_pack(pack) for pack in packs),
+                return_exceptions=True
+            )
+            retry = []
+            for pack, outcomes in zip(packs, pack_outcomes):
+                for item in pack:
+                    item.attempts += 1
+                    outcome = outcomes if isinstance(outcomes, BaseException) else outcomes[item.id]
+                    if isinstance(outcome, BaseException):
+                        self.metrics.inc("errors_total", type=type(outcome).__name__)
+                        if isinstance(outcome, InvalidResponseError) and item.attempts < max_attempts:
+                            retry.append(item)
+                            self.packing_stats["retried_items"] += 1
+                            continue
+                        if isinstance(outcome, CircuitOpenError):
+                            outcome = CircuitOpenError(str(outcome), fallback=self._degraded(item.text))
+                    else:
+                        self._store(item.cache_key, item.text, outcome)
+                    for index in positions[item.cache_key]:
+                        results[index] = outcome
+            pending = retry
+
+        for cache_key, indexes in positions.items():
+            for index in indexes[1:]:
+                results[index] = results[indexes[0]]
+        return results
+
+    def normalize_many(self, unstructured_texts: list, **kwargs) -> list:
+        """Blocking wrapper over anormalize_many"""
+        return run_sync(self.anormalize_many(unstructured_texts, **kwargs))
+
+    async def _reframe(self, prompt: VeoPromptSchema, aspect_ratio: AspectRatio) -> VeoPromptSchema:
+        """`prompt` re-framed for `aspect_ratio` by a narrow call regenerating only shot and camera_motion"""
+        source = AspectRatio(prompt.aspect_ratio)
+        prompt_json = prompt.model_dump_json()
+        cache_key = fingerprint("reframe", prompt_json, aspect_ratio.value, self.model_name, REFRAME_FINGERPRINT)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        async def generate():
+            request = REFRAME_PROMPT_TEMPLATE.format(
+                source_aspect_ratio=source.value,
+                source_orientation=ORIENTATIONS[source],
+                aspect_ratio=aspect_ratio.value,
+                orientation=ORIENTATIONS[aspect_ratio],
+                prompt_json=prompt_json
+            )
+            response = await self._call(request, REFRAME_TOOLS, estimate_tokens(request) + REFRAME_DECLARATION_TOKENS)
+            self.metrics.inc("reframes_total")
+            args = self._function_args(response)
+            data = derive(prompt, aspect_ratio).model_dump()
+            data.update({name: args[name] for name in ("shot", "camera_motion") if name in args})
+            result, failure = self._validate(data)
+            if failure is not None:
+                raise InvalidResponseError(f"Gemini returned an invalid re-framing: {failure[1]}") from failure[1]
+            if self.cache is not None:
+                self.cache.set(cache_key, result)
+            return result
+
+        return await self.single_flight.do(cache_key, generate)
+
+    async def avariants(self, prompt: VeoPromptSchema, aspect_ratios=tuple(AspectRatio),
+                        durations=tuple(Duration), reframe: bool = True) -> list:
+        """
+        Aspect-ratio x duration variants of a normalized prompt. Technical
+        parameters are rewritten locally; an orientation change whose shot is
+        composed for the other frame is re-framed with one narrow model call
+        (skipped with reframe=False). If that call fails, the variant keeps the
+        original shot and says so in its `note`.
+        """
+        with self.metrics.request("variants"):
+            aspect_ratios = list(dict.fromkeys(AspectRatio(value) for value in aspect_ratios))
+            targets = [value for value in aspect_ratios if reframe and needs_reframe(prompt, value)]
+            outcomes = await asyncio.gather(
+                *(self._reframe(prompt, value) for value in targets), return_exceptions=True
+            )
+            bases = {}
+            for aspect_ratio, outcome in zip(targets, outcomes):
+                duration = Duration(prompt.duration_seconds)
+                if isinstance(outcome, SchemaEnforcerError):
+                    note = f"Not re-framed ({type(outcome).__name__}): only the aspect ratio was changed"
+                    bases[aspect_ratio] = Variant(aspect_ratio, duration, derive(prompt, aspect_ratio), note=note)
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    bases[aspect_ratio] = Variant(aspect_ratio, duration, outcome, reframed=True)
+            return variant_matrix(prompt, aspect_ratios, durations, bases)
+
+    def variants(self, prompt: VeoPromptSchema, **kwargs) -> list:
+        """Blocking wrapper over avariants"""
+        return run_sync(self.avariants(prompt, **kwargs))
@@ -0,0 +1,337 @@
+"""
+Durable, resumable bulk normalization jobs.
+
+A JobStore is a SQLite file holding every job's inputs in order and one
+result row per distinct input, keyed by its content hash (the cache key:
+whitespace-normalized text, model and declaration/prompt fingerprint). The
+same input within a job or in any later job is therefore normalized once.
+Each result row records its status (pending, done, failed), attempts and the
+validated VeoPromptSchema JSON. A failed input gets a fresh set of attempts
+when a later job, or a rerun of the same job, includes it again.
+
+Every input gets a completion cursor (finished_seq) in the transaction that
+gives it a final outcome, from one counter shared by all jobs, so a reader
+that remembers the largest finished_seq it has seen reads only what finished
+since, whatever the input order.
+
+Ingestion and results are committed in chunks, so a job killed by a crash,
+a deploy or a quota wall resumes from its last checkpoint; finished results
+can be read while the job is still running (WAL mode allows concurrent readers).
+batch_normalize.py drives jobs with --job-db; this module also has a small
+CLI for inspecting them:
+
+    python jobs.py status  nightly-2024-06-01 --db jobs.db
+    python jobs.py results nightly-2024-06-01 --db jobs.db --after 5000 > new.jsonl
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from errors import InvalidResponseError
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    " id TEXT PRIMARY KEY,"
+    " source TEXT,"
+    " created_at REAL NOT NULL,"
+    " ingested_line INTEGER NOT NULL DEFAULT 0,"
+    " ingest_complete INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS items ("
+    " job_id TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " line INTEGER NOT NULL,"
+    " input_hash TEXT,"
+    " error TEXT,"
+    " finished_seq INTEGER,"
+    " PRIMARY KEY (job_id, seq))",
+    "CREATE INDEX IF NOT EXISTS items_by_hash ON items (job_id, input_hash)",
+    "CREATE INDEX IF NOT EXISTS items_by_input ON items (input_hash)",
+    "CREATE INDEX IF NOT EXISTS items_by_finished ON items (job_id, finished_seq)",
+    "CREATE TABLE IF NOT EXISTS results ("
+    " input_hash TEXT PRIMARY KEY,"
+    " text TEXT NOT NULL,"
+    " status TEXT NOT NULL,"
+    " attempts INTEGER NOT NULL DEFAULT 0,"
+    " payload TEXT,"
+    " error_type TEXT,"
+    " error TEXT,"
+    " updated_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS clock (id INTEGER PRIMARY KEY CHECK (id = 0), finished_seq INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO clock (id, finished_seq) VALUES (0, 0)",
+)
+
+_FAILED_OF_JOB = (
+    "SELECT r.input_hash FROM items i JOIN results r ON r.input_hash = i.input_hash"
+    " WHERE i.job_id = ? AND r.status = ?"
+)
+
+
+def _retryable(error: Exception) -> bool:
+    return getattr(error, "retryable", False) or isinstance(error, InvalidResponseError)
+
+
+_RESULT_COLUMNS = (
+    "i.seq, i.line, COALESCE(r.status, ?), r.text, r.payload,"
+    " CASE WHEN i.error IS NULL THEN r.error_type ELSE 'InvalidInput' END,"
+    " COALESCE(i.error, r.error), COALESCE(r.attempts, 0), i.finished_seq"
+)
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """One input of a job: `payload` is VeoPromptSchema JSON when status is done"""
+    seq: int
+    line: int
+    status: str
+    text: Optional[str]
+    payload: Optional[str]
+    error_type: Optional[str]
+    error: Optional[str]
+    attempts: int
+    finished_seq: Optional[int]
+
+
+class JobStore:
+    """SQLite store of jobs, their inputs and the shared per-input results"""
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def open_job(self, job_id: str, source: Optional[str] = None) -> dict:
+        """
+        Create the job if it is new, and return its row (ingested_line tells
+        where ingestion stopped). Inputs of the job that failed before are
+        pending again.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, source, created_at) VALUES (?, ?, ?)",
+                (job_id, source, time.time()),
+            )
+            self._conn.execute(
+                f"UPDATE items SET finished_seq = NULL WHERE input_hash IN ({_FAILED_OF_JOB})", (job_id, FAILED)
+            )
+            self._conn.execute(
+                f"UPDATE results SET status = ?, attempts = 0 WHERE input_hash IN ({_FAILED_OF_JOB})",
+                (PENDING, job_id, FAILED),
+            )
+            return self._job(job_id)
+
+    def _job(self, job_id: str) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT id, source, created_at, ingested_line, ingest_complete FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "source", "created_at", "ingested_line", "ingest_complete"), row))
+
+    def _tick(self) -> int:
+        """Next completion cursor; call inside the transaction that finishes the inputs"""
+        self._conn.execute("UPDATE clock SET finished_seq = finished_seq + 1 WHERE id = 0")
+        return self._conn.execute("SELECT finished_seq FROM clock WHERE id = 0").fetchone()[0]
+
+    def add_items(self, job_id: str, items: Iterable[tuple], line: int, complete: bool = False):
+        """
+        Append (line, input_hash, text, input_error) items and move the ingestion
+        checkpoint to `line` in one transaction. Inputs already known (from this
+        job or any other) keep their result, unless it failed: those are pending again.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            tick = self._tick()
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            for item_line, input_hash, text, input_error in items:
+                seq += 1
+                status = None
+                if input_hash is not None:
+                    row = self._conn.execute(
+                        "SELECT status FROM results WHERE input_hash = ?", (input_hash,)
+                    ).fetchone()
+                    status = row[0] if row is not None else None
+                    if status is None:
+                        self._conn.execute(
+                            "INSERT INTO results (input_hash, text, status, updated_at) VALUES (?, ?, ?, ?)",
+                            (input_hash, text, PENDING, now),
+                        )
+                    elif status == FAILED:
+                        self._conn.execute(
+                            "UPDATE results SET status = ?, attempts = 0, updated_at = ? WHERE input_hash = ?",
+                            (PENDING, now, input_hash),
+                        )
+                        self._conn.execute(
+                            "UPDATE items SET finished_seq = NULL WHERE input_hash = ?", (input_hash,)
+                        )
+                # Invalid inputs and inputs already done are finished as soon as they are ingested
+                finished = input_hash is None or status == DONE
+                self._conn.execute(
+                    "INSERT INTO items (job_id, seq, line, input_hash, error, finished_seq) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, seq, item_line, input_hash, input_error, tick if finished else None),
+                )
+            self._conn.execute(
+                "UPDATE jobs SET ingested_line = ?, ingest_complete = ? WHERE id = ?",
+                (line, int(complete), job_id),
+            )
+
+    def pending(self, job_id: str, after_hash: str = "", limit: int = 1000) -> list:
+        """Distinct (input_hash, text) of the job still to normalize, paged by hash"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT DISTINCT r.input_hash, r.text FROM items i JOIN results r ON r.input_hash = i.input_hash"
+                " WHERE i.job_id = ? AND r.status = ? AND r.input_hash > ?"
+                " ORDER BY r.input_hash LIMIT ?",
+                (job_id, PENDING, after_hash, limit),
+            ).fetchall()
+
+    def record(self, outcomes: Iterable[tuple]):
+        """
+        Checkpoint (input_hash, VeoPromptSchema or exception) outcomes in one
+        transaction. A failure stays pending for another attempt while it is
+        retryable, or an invalid model response that a new sample may fix, and
+        under max_attempts.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            tick = self._tick()
+            for input_hash, outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    self._conn.execute(
+                        "UPDATE results SET attempts = attempts + 1, error_type = ?, error = ?, updated_at = ?,"
+                        " status = CASE WHEN ? AND attempts + 1 < ? THEN ? ELSE ? END"
+                        " WHERE input_hash = ?",
+                        (type(outcome).__name__, str(outcome), now,
+                         _retryable(outcome), self.max_attempts, PENDING, FAILED, input_hash),
+                    )
+                else:
+                    self._conn.execute(
+                        "UPDATE results SET status = ?, attempts = attempts + 1, payload = ?,"
+                        " error_type = NULL, error = NULL, updated_at = ? WHERE input_hash = ?",
+                        (DONE, outcome.model_dump_json(), now, input_hash),
+                    )
+                self._conn.execute(
+                    "UPDATE items SET finished_seq = ?"
+                    " WHERE input_hash = ? AND (SELECT status FROM results WHERE input_hash = ?) != ?",
+                    (tick, input_hash, input_hash, PENDING),
+                )
+
+    def results(self, job_id: str, finished_only: bool = True, page_size: int = 1000) -> Iterator[JobResult]:
+        """Job inputs in input order; by default only those with a final outcome"""
+        after_seq = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {_RESULT_COLUMNS} FROM items i LEFT JOIN results r ON r.input_hash = i.input_hash"
+                    " WHERE i.job_id = ? AND i.seq > ? ORDER BY i.seq LIMIT ?",
+                    (FAILED, job_id, after_seq, page_size),
+                ).fetchall()
+            for row in rows:
+                result = JobResult(*row)
+                if not finished_only or result.status != PENDING:
+                    yield result
+            if len(rows) < page_size:
+                return
+            after_seq = rows[-1][0]
+
+    def finished(self, job_id: str, after: int = 0, page_size: int = 1000) -> Iterator[JobResult]:
+        """Job inputs with a final outcome in completion order, after the completion cursor `after`"""
+        after_key = (after + 1, 0)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT {_RESULT_COLUMNS} FROM items i LEFT JOIN results r ON r.input_hash = i.input_hash"
+                    " WHERE i.job_id = ? AND (i.finished_seq, i.seq) > (?, ?)"
+                    " ORDER BY i.finished_seq, i.seq LIMIT ?",
+                    (FAILED, job_id, *after_key, page_size),
+                ).fetchall()
+            for row in rows:
+                yield JobResult(*row)
+            if len(rows) < page_size:
+                return
+            after_key = (rows[-1][-1], rows[-1][0])
+
+    def progress(self, job_id: str) -> dict:
+        """Input counts by status, distinct inputs and whether ingestion finished"""
+        with self._lock:
+            job = self._job(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            counts = dict(self._conn.execute(
+                "SELECT COALESCE(r.status, ?), COUNT(*) FROM items i"
+                " LEFT JOIN results r ON r.input_hash = i.input_hash WHERE i.job_id = ? GROUP BY 1",
+                (FAILED, job_id),
+            ).fetchall())
+            distinct = self._conn.execute(
+                "SELECT COUNT(DISTINCT input_hash) FROM items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        total = sum(counts.values())
+        return {
+            "job_id": job_id,
+            "inputs": total,
+            "distinct_inputs": distinct,
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0),
+            "ingest_complete": bool(job["ingest_complete"]),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Inspect durable normalization jobs")
+    parser.add_argument("command", choices=("status", "results"))
+    parser.add_argument("job_id")
+    parser.add_argument("--db", required=True, help="SQLite job store")
+    parser.add_argument("--after", type=int, default=0,
+                        help="Only results finished after this completion cursor: the largest "
+                             "finished_seq already read (for incremental reads)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    store = JobStore(args.db)
+    try:
+        if args.command == "status":
+            try:
+                print(json.dumps(store.progress(args.job_id), indent=2))
+            except KeyError:
+                print(f"Unknown job: {args.job_id}", file=sys.stderr)
+                return 1
+            return 0
+        for result in store.finished(args.job_id, after=args.after):
+            record = {"seq": result.seq, "line": result.line, "finished_seq": result.finished_seq,
+                      "status": result.status}
+            if result.status == DONE:
+                record["structured_prompt"] = json.loads(result.payload)
+            else:
+                record["error_type"] = result.error_type
+                record["error"] = result.error
+            print(json.dumps(record))
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
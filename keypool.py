@@ -0,0 +1,405 @@
+"""
+Quota-aware scheduling of model calls over several API keys.
+
+Each KeySlot wraps one backend (one key, one client) with its own request and
+token budgets, a concurrency limit and a health state. The budgets are
+learned: a 429 cuts the key's effective requests per minute to 70% of what it
+was actually sending and cools the key down, successes raise it again
+additively. KeyPool routes every call to the key with the most headroom, fails
+over to another key on a 429 and only raises RateLimitedError when every key
+has been throttled for that call, or when no other key frees up within the
+failover budget (the wait would otherwise eat into the request deadline).
+
+Calls run in one of two priority lanes. INTERACTIVE (the default) always goes
+first; BATCH, set with `with lane(BATCH):` around bulk work, waits behind any
+interactive caller and keeps a share of every key's budget and concurrency
+free, so Streamlit requests are not stuck behind a batch job.
+
+KeyPool is both the backend and the rate limiter of the enforcer: acquire()
+picks a key before the request deadline starts, generate() and stream_json()
+then use that key. Like the other asyncio primitives here, a pool belongs to
+one event loop.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, List, Optional, Sequence
+
+from backends import GenerationResult
+from errors import RateLimitedError, UpstreamError
+from rate_limit import estimate_tokens
+
+INTERACTIVE = 0
+BATCH = 1
+
+current_lane = contextvars.ContextVar("keypool_lane", default=INTERACTIVE)
+_admission = contextvars.ContextVar("keypool_admission", default=None)
+
+
+@contextmanager
+def lane(priority: int):
+    """Run the calls made inside the block (including via run_sync) in the given lane"""
+    token = current_lane.set(priority)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+class KeySlot:
+    """
+    One API key: its backend, configured limits (None for unknown), the
+    learned requests-per-minute, in-flight count and cooldown. Requests are
+    counted over a sliding window, as the upstream quota is; the token budget
+    refills continuously like TokenBucket. Limits are per `window_seconds`
+    (a minute; benchmarks compress it).
+    """
+    HEALTHY = "healthy"
+    THROTTLED = "throttled"
+    UNHEALTHY = "unhealthy"
+
+    def __init__(self, name: str, backend, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: int = 16,
+                 unhealthy_after: int = 3, unhealthy_seconds: float = 30.0,
+                 window_seconds: float = 60.0):
+        self.name = name
+        self.backend = backend
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.unhealthy_after = unhealthy_after
+        self.unhealthy_seconds = unhealthy_seconds
+        self.window_seconds = window_seconds
+        self.learned_rpm = requests_per_minute
+        self.token_budget = float(tokens_per_minute or 0)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._state = self.HEALTHY
+        self._updated_at = time.monotonic()
+        self._sent = deque()
+        self._consecutive_429 = 0
+        self._consecutive_errors = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.tokens_per_minute:
+            self.token_budget = min(
+                self.tokens_per_minute, self.token_budget + elapsed * self.tokens_per_minute / self.window_seconds
+            )
+
+    def assess(self, now: float, estimated_tokens: int, reserve: float) -> tuple:
+        """
+        (headroom, None) if a call can start now, headroom being the smallest
+        fraction of concurrency and budgets left after it; otherwise (None,
+        seconds until the budgets allow it, or None while at the concurrency
+        limit). `reserve` is the fraction of every limit the call may not use.
+        """
+        concurrency = max(1, int(self.max_concurrency * (1 - reserve)))
+        if self.in_flight >= concurrency:
+            return None, None
+        self._refill(now)
+        headroom = [1 - (self.in_flight + 1) / self.max_concurrency]
+        delays = [self.cooldown_until - now]
+        if self.learned_rpm:
+            allowed = max(1, int(self.learned_rpm * (1 - reserve)))
+            sent = self._sent_in_window(now)
+            if sent >= allowed:
+                # Wait until enough of the oldest requests leave the window
+                delays.append(self._sent[sent - allowed] + self.window_seconds - now)
+            headroom.append(1 - (sent + 1) / self.learned_rpm)
+        if self.tokens_per_minute:
+            cost = min(estimated_tokens, self.tokens_per_minute)
+            needed = min(self.tokens_per_minute, cost + reserve * self.tokens_per_minute)
+            delays.append((needed - self.token_budget) * self.window_seconds / self.tokens_per_minute)
+            headroom.append((self.token_budget - cost) / self.tokens_per_minute)
+        delay = max(delays)
+        if delay > 0:
+            return None, delay
+        return min(headroom), None
+
+    def _sent_in_window(self, now: float) -> int:
+        while self._sent and now - self._sent[0] > self.window_seconds:
+            self._sent.popleft()
+        return len(self._sent)
+
+    def reserve(self, estimated_tokens: int):
+        now = time.monotonic()
+        self.in_flight += 1
+        self.requests += 1
+        self._sent_in_window(now)
+        self._sent.append(now)
+        if self.tokens_per_minute:
+            self.token_budget -= min(estimated_tokens, self.tokens_per_minute)
+
+    def release(self):
+        self.in_flight -= 1
+
+    def settle(self, delta: float):
+        """Debit (positive) or refund (negative) tokens once the real cost is known"""
+        if self.tokens_per_minute:
+            self._refill(time.monotonic())
+            self.token_budget = min(self.tokens_per_minute, self.token_budget - delta)
+
+    def record_success(self):
+        self._state = self.HEALTHY
+        self._consecutive_429 = 0
+        self._consecutive_errors = 0
+        if self.learned_rpm and (self.requests_per_minute is None or self.learned_rpm < self.requests_per_minute):
+            # Additive increase, about 5% per window of successes, probing back up
+            raised = self.learned_rpm + 0.05
+            self.learned_rpm = min(raised, self.requests_per_minute or raised)
+
+    def record_rate_limited(self):
+        """A 429: cut the learned rate to 70% of what was really sent and cool down"""
+        now = time.monotonic()
+        sent = self._sent_in_window(now)
+        self.learned_rpm = max(1.0, 0.7 * min(sent, self.learned_rpm or sent))
+        self.rate_limited += 1
+        self._consecutive_429 += 1
+        self.cooldown_until = now + min(self.window_seconds, 2.0 ** (self._consecutive_429 - 1))
+        self._state = self.THROTTLED
+
+    def record_error(self, retryable: bool):
+        """Upstream failures; non-retryable ones are about the request, not the key"""
+        if not retryable:
+            return
+        self.errors += 1
+        self._consecutive_errors += 1
+        if self._consecutive_errors >= self.unhealthy_after:
+            self.cooldown_until = time.monotonic() + self.unhealthy_seconds
+            self._state = self.UNHEALTHY
+
+    @property
+    def state(self) -> str:
+        if self._state != self.HEALTHY and time.monotonic() >= self.cooldown_until:
+            return self.HEALTHY
+        return self._state
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "learned_rpm": round(self.learned_rpm, 1) if self.learned_rpm else None,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+        }
+
+
+class _Admission:
+    """The key a call was admitted on; failover swaps it in place"""
+    __slots__ = ("slot", "estimated_tokens")
+
+    def __init__(self, slot: KeySlot, estimated_tokens: int):
+        self.slot = slot
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, actual_tokens: Optional[int]):
+        if self.slot is not None and actual_tokens:
+            self.slot.settle(actual_tokens - self.estimated_tokens)
+
+
+class KeyPool:
+    """
+    Schedules calls over several KeySlots. Waiters are served strictly by
+    (lane, arrival): interactive before batch, FIFO within a lane. Batch calls
+    leave `1 - batch_share` of every key's budgets and concurrency to the
+    interactive lane. A failover waits at most `failover_wait_seconds` for
+    another key; past that the 429 is raised for the caller to back off.
+    """
+
+    def __init__(self, slots: Sequence[KeySlot], batch_share: float = 0.75, failover_wait_seconds: float = 1.0):
+        if not slots:
+            raise ValueError("KeyPool needs at least one key")
+        self.slots: List[KeySlot] = list(slots)
+        self.model_name = self.slots[0].backend.model_name
+        self.batch_share = batch_share
+        self.failover_wait_seconds = failover_wait_seconds
+        self._waiters = []
+        self._order = itertools.count()
+        self._changed = None
+        self.failovers = 0
+        self.failover_timeouts = 0
+        self.lane_waits = {INTERACTIVE: 0, BATCH: 0}
+
+    @classmethod
+    def for_keys(cls, api_keys: Sequence[str], model_name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: int = 16) -> "KeyPool":
+        """One GeminiBackend (and client) per key, all with the same per-key limits"""
+        from backends import GeminiBackend
+
+        return cls([
+            KeySlot(
+                f"key{index}:...{api_key[-4:]}",
+                GeminiBackend(api_key, model_name),
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                max_concurrency=max_concurrency
+            )
+            for index, api_key in enumerate(api_keys, 1)
+        ])
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def _wait(self, timeout: Optional[float]):
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _pick(self, priority: int, estimated_tokens: int, exclude) -> tuple:
+        """The key with the most headroom, or (None, seconds to wait or None)"""
+        now = time.monotonic()
+        reserve = 0.0 if priority == INTERACTIVE else 1 - self.batch_share
+        best, best_headroom, wait = None, None, None
+        for slot in self.slots:
+            if slot in exclude:
+                continue
+            headroom, delay = slot.assess(now, estimated_tokens, reserve)
+            if headroom is not None:
+                if best_headroom is None or headroom > best_headroom:
+                    best, best_headroom = slot, headroom
+            elif delay is not None:
+                wait = delay if wait is None else min(wait, delay)
+        return best, wait
+
+    async def _admit(self, estimated_tokens: int, exclude=()) -> KeySlot:
+        priority = current_lane.get()
+        entry = (priority, next(self._order))
+        heapq.heappush(self._waiters, entry)
+        waited = False
+        try:
+            while True:
+                if self._waiters[0] == entry:
+                    slot, wait = self._pick(priority, estimated_tokens, exclude)
+                    if slot is not None:
+                        heapq.heappop(self._waiters)
+                        slot.reserve(estimated_tokens)
+                        # The next waiter may fit on another key
+                        self._notify()
+                        return slot
+                else:
+                    wait = None
+                if not waited:
+                    waited = True
+                    self.lane_waits[priority] = self.lane_waits.get(priority, 0) + 1
+                await self._wait(wait)
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+
+    def _release(self, slot: Optional[KeySlot]):
+        if slot is not None:
+            slot.release()
+            self._notify()
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        Wait for a key in the caller's lane, then yield a callback that settles
+        the key's token budget against the real token count (RateLimiter's interface)
+        """
+        admission = _Admission(await self._admit(estimated_tokens), estimated_tokens)
+        # Not a token reset: a stream driven by iterate_sync exits in another context
+        previous = _admission.get()
+        _admission.set(admission)
+        try:
+            yield admission.settle
+        finally:
+            _admission.set(previous)
+            self._release(admission.slot)
+
+    async def _failover(self, admission: _Admission, tried: set) -> bool:
+        """Move the call to an untried key; False if none is admitted within the failover budget"""
+        slot, admission.slot = admission.slot, None
+        self._release(slot)
+        try:
+            admission.slot = await asyncio.wait_for(
+                self._admit(admission.estimated_tokens, exclude=tried), self.failover_wait_seconds
+            )
+        except asyncio.TimeoutError:
+            self.failover_timeouts += 1
+            return False
+        self.failovers += 1
+        return True
+
+    async def generate(self, prompt: str, tools: list, tool_config: dict) -> GenerationResult:
+        admission = _admission.get()
+        if admission is None:
+            async with self.acquire(estimate_tokens(prompt)):
+                return await self.generate(prompt, tools, tool_config)
+        tried = set()
+        while True:
+            slot = admission.slot
+            try:
+                result = await slot.backend.generate(prompt, tools, tool_config)
+            except RateLimitedError:
+                slot.record_rate_limited()
+                tried.add(slot)
+                if len(tried) == len(self.slots) or not await self._failover(admission, tried):
+                    raise
+                continue
+            except UpstreamError as e:
+                slot.record_error(e.retryable)
+                raise
+            slot.record_success()
+            return result
+
+    async def stream_json(self, prompt: str, parameters: dict) -> AsyncIterator[str]:
+        """Stream on the admitted key; a 429 fails over only before the first chunk"""
+        admission = _admission.get()
+        if admission is None:
+            async with self.acquire(estimate_tokens(prompt)):
+                async for chunk in self.stream_json(prompt, parameters):
+                    yield chunk
+            return
+        tried = set()
+        while True:
+            slot = admission.slot
+            streamed = False
+            try:
+                async for chunk in slot.backend.stream_json(prompt, parameters):
+                    streamed = True
+                    yield chunk
+            except RateLimitedError:
+                slot.record_rate_limited()
+                tried.add(slot)
+                if streamed or len(tried) == len(self.slots) or not await self._failover(admission, tried):
+                    raise
+                continue
+            except UpstreamError as e:
+                slot.record_error(e.retryable)
+                raise
+            slot.record_success()
+            return
+
+    @property
+    def in_flight(self) -> int:
+        return sum(slot.in_flight for slot in self.slots)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "keys": {slot.name: slot.stats for slot in self.slots},
+            "waiting": len(self._waiters),
+            "failovers": self.failovers,
+            "failover_timeouts": self.failover_timeouts,
+            "lane_waits": {"interactive": self.lane_waits[INTERACTIVE], "batch": self.lane_waits[BATCH]},
+        }
@@ -0,0 +1,162 @@
+"""
+Hot-path instrumentation for the normalization pipeline.
+
+Per-stage timers (extract, prompt, queue, model, decode, validate, render, ...),
+token counts from the response usage metadata, and counters for cache lookups,
+retries and error classes. Metrics are exported in the Prometheus text format
+and, per request, as one JSON log line on the "veo.metrics" logger.
+
+When disabled, stage() and request() return a shared no-op context manager,
+so the instrumented code costs one attribute check per call.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("veo.metrics")
+
+_NULL = nullcontext()
+_current_request = contextvars.ContextVar("veo_metrics_request", default=None)
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(STAGE_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+                break
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """Process-wide stage histograms and counters; disabled by default"""
+
+    def __init__(self, enabled: bool = False, log_json: bool = False):
+        self.enabled = enabled
+        self.log_json = log_json
+        self._lock = threading.Lock()
+        self._stages = defaultdict(_Histogram)
+        self._counters = defaultdict(float)
+
+    def stage(self, name: str):
+        """Context manager timing one pipeline stage"""
+        if not self.enabled:
+            return _NULL
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def observe(self, stage: str, seconds: float):
+        """Record a stage duration measured elsewhere"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stages[stage].observe(seconds)
+        record = _current_request.get()
+        if record is not None:
+            stages = record["stages"]
+            stages[stage] = round(stages.get(stage, 0.0) + seconds * 1000, 3)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+        record = _current_request.get()
+        if record is not None:
+            key = name if not labels else f"{name}.{'.'.join(map(str, labels.values()))}"
+            record["counters"][key] = record["counters"].get(key, 0) + amount
+
+    def tokens(self, prompt_tokens, output_tokens):
+        """Token counts from the response usage metadata"""
+        if prompt_tokens:
+            self.inc("tokens_total", prompt_tokens, kind="prompt")
+        if output_tokens:
+            self.inc("tokens_total", output_tokens, kind="output")
+
+    def request(self, kind: str):
+        """
+        Context manager around one request: collects its stages and counters,
+        counts its error class if it raises, and logs it as a JSON line
+        """
+        if not self.enabled:
+            return _NULL
+        return self._request(kind)
+
+    @contextmanager
+    def _request(self, kind: str):
+        record = {"event": kind, "stages": {}, "counters": {}, "error": None}
+        token = _current_request.set(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            self.inc("errors_total", type=type(e).__name__)
+            raise
+        finally:
+            _current_request.reset(token)
+            record["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self.inc("requests_total", kind=kind)
+            with self._lock:
+                self._stages[f"{kind}_total"].observe(record["total_ms"] / 1000)
+            if self.log_json:
+                logger.info(json.dumps(record))
+
+    def snapshot(self) -> dict:
+        """Stage counts and mean milliseconds, plus counters, as plain data"""
+        with self._lock:
+            stages = {
+                name: {"count": hist.count, "mean_ms": hist.sum / hist.count * 1000 if hist.count else 0.0}
+                for name, hist in sorted(self._stages.items())
+            }
+            counters = {
+                f"{name}{_labels(labels)}": value for (name, labels), value in sorted(self._counters.items())
+            }
+        return {"stages": stages, "counters": counters}
+
+    def prometheus(self, prefix: str = "veo") -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_stage_seconds Time spent per pipeline stage")
+            lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for name, hist in sorted(self._stages.items()):
+                cumulative = 0
+                for bound, count in zip(STAGE_BUCKETS, hist.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {hist.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {hist.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {hist.count}')
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{prefix}_{name}{_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
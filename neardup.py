@@ -0,0 +1,353 @@
+"""
+Near-duplicate index of normalized inputs.
+
+The response cache only matches inputs that are identical after whitespace
+normalization. This index also finds inputs that differ by casing,
+punctuation, request boilerplate or a swapped adjective. Each input is
+reduced to unigram and bigram shingles of its content words, summarized by a MinHash
+signature of SIGNATURE_SIZE values (one-permutation hashing with rotation
+densification: one hash per shingle instead of one per shingle and
+permutation) and bucketed with LSH (NUM_BANDS bands of BAND_ROWS rows), so
+candidates come from one indexed lookup instead of a scan. Candidates are
+ranked by the exact Jaccard similarity of their shingles.
+
+Entries live in SQLite, in memory or in a file that persists across restarts;
+nothing is loaded up front, so opening a large index is instant.
+
+A match becomes a Seed: the stored VeoPromptSchema plus the fields that must
+be regenerated because their values mention words the new input dropped (or,
+when it adds new detail, every descriptive field). The enforcer reuses the
+prompt as is when the match is above `threshold` and nothing needs
+regenerating, and otherwise asks the model for the regenerated fields only.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from extractor import ALL_PATHS, extract
+from repair import known_values
+from schemas import VeoPromptSchema
+
+SIGNATURE_SIZE = 64
+BAND_ROWS = 4
+NUM_BANDS = SIGNATURE_SIZE // BAND_ROWS
+DEFAULT_MAX_CANDIDATES = 8
+
+_EMPTY = 1 << 64
+# Offset added per bin borrowed during densification, so borrowed values differ from the source bin
+_DENSIFY_OFFSET = 1 << 58
+
+# Aspect ratios and durations are single tokens ("9:16", "8s") so that changing them changes similarity
+_WORD = re.compile(r"(\d+)\s*:\s*(\d+)|(\d+)\s*-?\s*(?:seconds?|secs?|s)\b|[a-z0-9]+")
+# Function words and request boilerplate ("please make a video of ...") that carry no content
+STOPWORDS = frozenset(
+    "a an and as at by can could create for from generate i in into is it its make me my of on or please"
+    " show the then thanks to video want with would you".split()
+)
+# Fields written from the description's wording rather than technical vocabulary
+DESCRIPTIVE_PATHS = frozenset(
+    path for path in ALL_PATHS if path.split(".")[0] in ("subject", "scene", "audio")
+) | {"camera_motion.description", "style"}
+# Technical parameters (aspect_ratio, duration_seconds, shot.*, ...) checked against local extraction
+TECHNICAL_PATHS = ALL_PATHS - DESCRIPTIVE_PATHS
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries ("
+    " id INTEGER PRIMARY KEY,"
+    " namespace TEXT NOT NULL,"
+    " text TEXT NOT NULL,"
+    " payload TEXT NOT NULL,"
+    " technical TEXT,"
+    " created_at REAL NOT NULL,"
+    " UNIQUE (namespace, text))",
+    "CREATE TABLE IF NOT EXISTS buckets ("
+    " bucket INTEGER NOT NULL,"
+    " entry_id INTEGER NOT NULL,"
+    " PRIMARY KEY (bucket, entry_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS buckets_by_entry ON buckets (entry_id)",
+)
+
+
+def words(text: str) -> list:
+    """Lower-cased alphanumeric words, with ratios and durations as units; punctuation is dropped"""
+    tokens = []
+    for match in _WORD.finditer(text.lower()):
+        if match.group(1):
+            tokens.append(f"{match.group(1)}:{match.group(2)}")
+        elif match.group(3):
+            tokens.append(f"{match.group(3)}s")
+        else:
+            tokens.append(match.group(0))
+    return tokens
+
+
+def content_words(text: str) -> list:
+    return [word for word in words(text) if word not in STOPWORDS]
+
+
+def shingles(tokens: list) -> set:
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+
+def jaccard(first: set, second: set) -> float:
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(shingle_set: set) -> list:
+    """
+    One-permutation MinHash of a non-empty shingle set: each shingle hash goes
+    to one of SIGNATURE_SIZE bins, which keep their minimum. Empty bins borrow
+    from the next non-empty bin to the right, offset by the distance.
+    """
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    for shingle in shingle_set:
+        value = _hash64(shingle)
+        index = value % SIGNATURE_SIZE
+        value //= SIGNATURE_SIZE
+        if value < bins[index]:
+            bins[index] = value
+    signature = list(bins)
+    for index in range(SIGNATURE_SIZE):
+        if bins[index] != _EMPTY:
+            continue
+        for distance in range(1, SIGNATURE_SIZE):
+            value = bins[(index + distance) % SIGNATURE_SIZE]
+            if value != _EMPTY:
+                signature[index] = value + distance * _DENSIFY_OFFSET
+                break
+    return signature
+
+
+def band_buckets(signature: list, namespace: str) -> list:
+    """One signed 64-bit bucket id per LSH band, scoped to `namespace`"""
+    prefix = namespace.encode("utf-8")
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+        digest = hashlib.blake2b(
+            prefix + struct.pack(f"<B{BAND_ROWS}Q", band, *rows), digest_size=8
+        ).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def _leaves(data: dict, prefix: str = ""):
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _leaves(value, f"{path}.")
+        elif value is not None:
+            yield path, value
+
+
+@dataclass(frozen=True)
+class Seed:
+    """
+    A stored neighbour of a new input: its prompt, the values still valid for
+    the new input and the leaf paths to regenerate. `reuse` when the prompt
+    can be returned as is.
+    """
+    similarity: float
+    prompt: VeoPromptSchema
+    values: dict
+    paths: frozenset
+    regenerate: frozenset
+    reuse: bool
+
+
+def seed_from(prompt: VeoPromptSchema, stored_text: str, unstructured_text: str,
+              similarity: float, threshold: float, stored_technical: Optional[dict] = None) -> Seed:
+    """
+    Fields of `prompt` whose values mention a word missing from the new text
+    are regenerated, and so are technical parameters that local extraction
+    reads differently from the two inputs ("16:9" -> "9:16", "vertical video"
+    -> "not vertical video"). `stored_technical` is the extraction of the
+    original stored input; the stored text has lost its stopwords, so it is
+    only re-extracted when that is missing. New words that do not simply
+    replace dropped ones carry detail the stored prompt lacks, so every
+    descriptive field is regenerated.
+    """
+    old_words = set(content_words(stored_text))
+    new_words = set(content_words(unstructured_text))
+    removed = old_words - new_words
+    added = new_words - old_words
+    data = prompt.model_dump(mode="json")
+    stale = frozenset(
+        path for path, value in _leaves(data)
+        if removed & set(words(" ".join(value) if isinstance(value, list) else str(value)))
+    )
+    old_technical = extract(stored_text).flat() if stored_technical is None else stored_technical
+    new_technical = extract(unstructured_text).flat()
+    stale |= {path for path in TECHNICAL_PATHS if old_technical.get(path) != new_technical.get(path)}
+    regenerate = stale
+    if added and (len(added) > len(removed) or not stale):
+        regenerate |= DESCRIPTIVE_PATHS
+    values, paths = known_values(data, regenerate)
+    return Seed(
+        similarity=similarity,
+        prompt=prompt,
+        values=values,
+        paths=paths,
+        regenerate=regenerate,
+        reuse=similarity >= threshold and not regenerate
+    )
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index from past inputs to their validated prompts. Lookups
+    return the most similar input at or above `seed_threshold`; `threshold`
+    is the similarity above which an unchanged prompt is reused.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, seed_threshold: float = 0.7,
+                 max_entries: Optional[int] = 100_000, max_candidates: int = DEFAULT_MAX_CANDIDATES):
+        if not 0 < seed_threshold <= threshold <= 1:
+            raise ValueError("Expected 0 < seed_threshold <= threshold <= 1")
+        self.path = path or ":memory:"
+        self.threshold = threshold
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        if "technical" not in columns:
+            # Indexes written before technical values were stored re-extract from the stored text
+            self._conn.execute("ALTER TABLE entries ADD COLUMN technical TEXT")
+        self._conn.commit()
+        self.lookups = 0
+        self.reused = 0
+        self.seeded = 0
+        self.regenerated_fields = 0
+        self.lookup_seconds = 0.0
+
+    def add(self, unstructured_text: str, prompt: VeoPromptSchema, namespace: str = ""):
+        """Index an input with its validated prompt (replacing the prompt of an identical input)"""
+        tokens = content_words(unstructured_text)
+        if not tokens:
+            return
+        text = " ".join(tokens)
+        buckets = band_buckets(minhash(shingles(tokens)), namespace)
+        payload = prompt.model_dump_json()
+        technical = json.dumps(extract(unstructured_text).flat())
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO entries (namespace, text, payload, technical, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (namespace, text, payload, technical, time.time()),
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    "UPDATE entries SET payload = ?, technical = ?, created_at = ? WHERE namespace = ? AND text = ?",
+                    (payload, technical, time.time(), namespace, text),
+                )
+                return
+            entry_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO buckets (bucket, entry_id) VALUES (?, ?)",
+                [(bucket, entry_id) for bucket in buckets],
+            )
+            if self.max_entries is not None and entry_id % 1000 == 0:
+                self._trim(entry_id)
+
+    def _trim(self, newest_id: int):
+        """Drop the oldest entries beyond max_entries (ids only grow, so a range delete suffices)"""
+        cutoff = newest_id - self.max_entries
+        if cutoff > 0:
+            self._conn.execute("DELETE FROM buckets WHERE entry_id <= ?", (cutoff,))
+            self._conn.execute("DELETE FROM entries WHERE id <= ?", (cutoff,))
+
+    def lookup(self, unstructured_text: str, namespace: str = "") -> Optional[tuple]:
+        """
+        (similarity, stored text, VeoPromptSchema, technical values or None)
+        of the closest input at or above seed_threshold
+        """
+        tokens = content_words(unstructured_text)
+        if not tokens:
+            return None
+        query = shingles(tokens)
+        buckets = band_buckets(minhash(query), namespace)
+        with self._lock:
+            # Rank candidates on the bucket index alone, then fetch only the best few entries
+            rows = self._conn.execute(
+                "SELECT e.text, e.payload, e.technical FROM ("
+                " SELECT entry_id, COUNT(*) AS shared FROM buckets"
+                f" WHERE bucket IN ({','.join('?' * len(buckets))})"
+                " GROUP BY entry_id ORDER BY shared DESC, entry_id DESC LIMIT ?) c"
+                " JOIN entries e ON e.id = c.entry_id WHERE e.namespace = ?",
+                (*buckets, self.max_candidates, namespace),
+            ).fetchall()
+        best = None
+        for text, payload, technical in rows:
+            similarity = jaccard(query, shingles(text.split()))
+            if similarity >= self.seed_threshold and (best is None or similarity > best[0]):
+                best = (similarity, text, payload, technical)
+        if best is None:
+            return None
+        similarity, text, payload, technical = best
+        return (similarity, text, VeoPromptSchema.model_validate_json(payload),
+                None if technical is None else json.loads(technical))
+
+    def seed(self, unstructured_text: str, namespace: str = "") -> Optional[Seed]:
+        """Seed from the closest stored input, or None when nothing is similar enough"""
+        started = time.perf_counter()
+        match = self.lookup(unstructured_text, namespace)
+        seed = None if match is None else seed_from(
+            match[2], match[1], unstructured_text, match[0], self.threshold, match[3]
+        )
+        with self._lock:
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started
+            if seed is not None:
+                if seed.reuse:
+                    self.reused += 1
+                else:
+                    self.seeded += 1
+                    self.regenerated_fields += len(seed.regenerate)
+        return seed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM buckets")
+            self._conn.execute("DELETE FROM entries")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.lookups
+            return {
+                "lookups": lookups,
+                "reused": self.reused,
+                "seeded": self.seeded,
+                "misses": lookups - self.reused - self.seeded,
+                "reuse_rate": self.reused / lookups if lookups else 0.0,
+                "seed_rate": self.seeded / lookups if lookups else 0.0,
+                "avg_fields_regenerated": self.regenerated_fields / self.seeded if self.seeded else 0.0,
+                "avg_lookup_ms": 1000 * self.lookup_seconds / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,86 @@
+"""
+Multi-prompt packing: normalize several descriptions in one model call.
+
+Items are packed greedily up to a maximum pack size while the estimated
+request (prompt + declaration + expected output) stays under a token budget.
+The expected output per item starts from a conservative estimate and adapts to
+the usage metadata of previous packed responses.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from rate_limit import estimate_tokens
+
+DEFAULT_PACK_SIZE = 8
+DEFAULT_PACK_TOKEN_BUDGET = 16000
+INITIAL_OUTPUT_TOKENS_PER_ITEM = 400
+
+
+@dataclass
+class PackItem:
+    """One description inside a packed request; `id` is stable across retries"""
+    id: str
+    text: str
+    cache_key: str
+    known_values: Optional[dict] = None
+    attempts: int = 0
+
+    def tag(self) -> str:
+        return f"[id:{self.id}] {' '.join(self.text.split())}"
+
+
+class PackSizer:
+    """Greedy packer with an adaptive estimate of output tokens per item"""
+
+    def __init__(self, overhead_tokens: int = 0):
+        self.overhead_tokens = overhead_tokens
+        self.output_tokens_per_item = INITIAL_OUTPUT_TOKENS_PER_ITEM
+
+    def item_tokens(self, item: PackItem) -> int:
+        return estimate_tokens(item.tag()) + self.output_tokens_per_item
+
+    def packs(self, items: list, max_pack_size: int = DEFAULT_PACK_SIZE,
+              token_budget: int = DEFAULT_PACK_TOKEN_BUDGET) -> list:
+        """Split items into packs that respect the size limit and the token budget"""
+        packs = []
+        current, current_tokens = [], self.overhead_tokens
+        for item in items:
+            tokens = self.item_tokens(item)
+            if current and (len(current) >= max_pack_size or current_tokens + tokens > token_budget):
+                packs.append(current)
+                current, current_tokens = [], self.overhead_tokens
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        return packs
+
+    def observe(self, items: int, output_tokens: Optional[int]):
+        """Blend the observed output tokens per item into the running estimate"""
+        if not items or not output_tokens:
+            return
+        observed = output_tokens / items
+        self.output_tokens_per_item = int(0.7 * self.output_tokens_per_item + 0.3 * observed)
+
+
+def render_descriptions(items: list) -> str:
+    return "\n".join(item.tag() for item in items)
+
+
+def demultiplex(function_calls: list, items: list) -> dict:
+    """
+    Map item id -> raw entry from one or more packed function calls
+    (the model may split its answer into parallel calls); unknown or
+    repeated ids are ignored
+    """
+    wanted = {item.id for item in items}
+    entries = {}
+    prompts = [entry for call in function_calls for entry in (call.args.get("prompts") or [])]
+    for entry in prompts:
+        if not isinstance(entry, dict):
+            continue
+        entry = dict(entry)
+        item_id = str(entry.pop("id", ""))
+        if item_id in wanted and item_id not in entries:
+            entries[item_id] = entry
+    return entries
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used before usage metadata is known"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket refilled continuously at `rate_per_minute`.
+    Waiters are served in FIFO order so large requests are not starved.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate_per_second)
+
+    def adjust(self, delta: float):
+        """Debit (positive) or refund (negative) tokens once the real cost is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """
+    Shared admission control for Gemini calls: a concurrency semaphore plus
+    token buckets for requests per minute and tokens per minute. Limits left
+    as None are not enforced.
+    """
+
+    def __init__(self, max_concurrency: int = 64, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._semaphore = None
+        self.in_flight = 0
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new request would have to wait for a concurrency slot"""
+        return self._semaphore is not None and self._semaphore.locked()
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        Wait for a concurrency slot and budget, then yield a callback that
+        settles the token bucket against the real token count
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if self.requests is not None:
+                await self.requests.acquire(1)
+            if self.tokens is not None:
+                await self.tokens.acquire(estimated_tokens)
+
+            def settle(actual_tokens: Optional[int]):
+                if self.tokens is not None and actual_tokens:
+                    self.tokens.adjust(actual_tokens - estimated_tokens)
+
+            self.in_flight += 1
+            try:
+                yield settle
+            finally:
+                self.in_flight -= 1
@@ -0,0 +1,263 @@
+"""
+Local repair of model output before validation.
+
+Function-call args are usually close to VeoPromptSchema but not always exact:
+durations like 5, 7.5 or "8s", aspect ratios like "16x9" or "portrait", numbers
+or booleans as strings, a comma-separated string where a list is expected, or
+null for a field that has a default. repair() fixes these in one walk over the
+model's fields without another model call; whatever still fails validation is
+re-asked from the model field by field (see invalid_paths).
+"""
+import re
+import threading
+from collections import Counter
+from collections.abc import Mapping
+from enum import Enum
+from typing import Type
+
+from pydantic import BaseModel, ValidationError
+
+from declarations import unwrap_annotation
+from extractor import ALL_PATHS
+from schemas import AspectRatio, Duration, VeoPromptSchema
+
+_DURATIONS = sorted(member.value for member in Duration)
+_NUMBER = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(?:s|sec|secs|seconds?)?\s*$")
+_RATIO = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(?::|x|/|by|to)\s*(\d+(?:\.\d+)?)\s*$")
+_ASPECT_RATIO_WORDS = {
+    "landscape": AspectRatio.WIDESCREEN,
+    "widescreen": AspectRatio.WIDESCREEN,
+    "horizontal": AspectRatio.WIDESCREEN,
+    "cinematic": AspectRatio.WIDESCREEN,
+    "vertical": AspectRatio.VERTICAL,
+    "portrait": AspectRatio.VERTICAL,
+    "mobile": AspectRatio.VERTICAL,
+}
+_TRUE = {"true", "yes", "1", "on"}
+_FALSE = {"false", "no", "0", "off"}
+
+
+def snap_duration(value):
+    """Nearest supported duration for a number or a string like "5s"; ties round up"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        match = _NUMBER.match(value.lower())
+        if not match:
+            return None
+        value = float(match.group(1))
+    if not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return min(_DURATIONS, key=lambda allowed: (abs(allowed - value), -allowed))
+
+
+def normalize_aspect_ratio(value):
+    """AspectRatio value for spellings like "16x9", "9/16", "1.78" or "portrait" """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        ratio = float(value)
+    elif isinstance(value, str):
+        text = value.strip().lower()
+        match = _RATIO.match(text)
+        if match:
+            width, height = float(match.group(1)), float(match.group(2))
+            ratio = width / height if height else 0.0
+        else:
+            try:
+                ratio = float(text)
+            except ValueError:
+                for word, aspect_ratio in _ASPECT_RATIO_WORDS.items():
+                    if word in text:
+                        return aspect_ratio.value
+                return None
+    else:
+        return None
+    if ratio <= 0 or abs(ratio - 1.0) < 0.05:
+        return None
+    return AspectRatio.WIDESCREEN.value if ratio > 1 else AspectRatio.VERTICAL.value
+
+
+def _repair_enum(enum_cls: Type[Enum], value):
+    if enum_cls is Duration:
+        return snap_duration(value)
+    if enum_cls is AspectRatio:
+        return normalize_aspect_ratio(value)
+    if isinstance(value, str):
+        wanted = value.strip().lower()
+        for member in enum_cls:
+            if wanted in (str(member.value).lower(), member.name.lower()):
+                return member.value
+    return None
+
+
+def _repair_scalar(annotation, value):
+    if annotation is str:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return str(int(value)) if float(value).is_integer() else str(value)
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return ", ".join(value)
+    elif annotation is bool and isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    elif annotation is int and isinstance(value, (float, str)):
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        if number.is_integer():
+            return int(number)
+    return None
+
+
+def _is_valid_scalar(annotation, value) -> bool:
+    if annotation is bool:
+        return isinstance(value, bool)
+    if annotation is str:
+        return isinstance(value, str)
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return any(value == member.value and type(value) is type(member.value) for member in annotation)
+    return True
+
+
+def _repair_value(annotation, value, path: str, fixes: list):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _repair_model(annotation, value, f"{path}.", fixes)
+    if _is_valid_scalar(annotation, value):
+        return value
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        repaired = _repair_enum(annotation, value)
+    else:
+        repaired = _repair_scalar(annotation, value)
+    if repaired is None:
+        return value
+    fixes.append(path)
+    return repaired
+
+
+def _repair_model(model_cls: Type[BaseModel], data, prefix: str, fixes: list):
+    if not isinstance(data, Mapping):
+        return data
+    repaired = {}
+    for name, field in model_cls.model_fields.items():
+        path = f"{prefix}{name}"
+        annotation, is_list = unwrap_annotation(field.annotation)
+        value = data.get(name)
+        if value is None:
+            if name in data and not field.is_required() and field.default is not None:
+                # null for a field with a default: let the default apply
+                fixes.append(path)
+            elif name in data:
+                repaired[name] = None
+            elif (field.is_required() and isinstance(annotation, type) and issubclass(annotation, BaseModel)
+                  and not any(child.is_required() for child in annotation.model_fields.values())):
+                # Missing nested object whose fields all have defaults
+                repaired[name] = {}
+                fixes.append(path)
+            continue
+        if is_list:
+            if isinstance(value, str):
+                value = [item.strip() for item in re.split(r"[,;\n]", value) if item.strip()]
+                fixes.append(path)
+            if isinstance(value, list):
+                value = [_repair_value(annotation, item, path, fixes) for item in value]
+            repaired[name] = value
+        else:
+            repaired[name] = _repair_value(annotation, value, path, fixes)
+    return repaired
+
+
+def repair(data, model_cls: Type[BaseModel] = VeoPromptSchema) -> tuple:
+    """
+    Coerce model output towards `model_cls` in one pass. Returns the repaired
+    data (unknown keys dropped) and the dotted paths that were changed.
+    """
+    fixes = []
+    return _repair_model(model_cls, data, "", fixes), fixes
+
+
+def invalid_paths(error: ValidationError) -> frozenset:
+    """Leaf paths affected by a VeoPromptSchema validation error (a bad object covers all its leaves)"""
+    paths = set()
+    for detail in error.errors():
+        parts = []
+        for part in detail["loc"]:
+            if not isinstance(part, str):
+                break
+            parts.append(part)
+            if ".".join(parts) in ALL_PATHS:
+                break
+        path = ".".join(parts)
+        paths.update(
+            leaf for leaf in ALL_PATHS
+            if not path or leaf == path or leaf.startswith(f"{path}.")
+        )
+    return frozenset(paths)
+
+
+def known_values(data: dict, exclude: frozenset, prefix: str = "") -> tuple:
+    """Nested values and leaf paths of `data` without the paths in `exclude`"""
+    values = {}
+    paths = set()
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            child_values, child_paths = known_values(value, exclude, f"{path}.")
+            if child_values:
+                values[key] = child_values
+                paths |= child_paths
+        elif path in ALL_PATHS and path not in exclude and value is not None:
+            values[key] = value
+            paths.add(path)
+    return values, frozenset(paths)
+
+
+class RepairStats:
+    """How often local repair or a targeted re-ask saved a full retry"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.valid = 0
+        self.repaired = 0
+        self.reasks = 0
+        self.reasks_recovered = 0
+        self.fixes = Counter()
+
+    def record_valid(self):
+        with self._lock:
+            self.responses += 1
+            self.valid += 1
+
+    def record_repaired(self, fixes: list):
+        with self._lock:
+            self.responses += 1
+            self.repaired += 1
+            self.fixes.update(fixes)
+
+    def record_invalid(self, fixes: list):
+        with self._lock:
+            self.responses += 1
+            self.fixes.update(fixes)
+
+    def record_reask(self, recovered: bool):
+        with self._lock:
+            self.reasks += 1
+            self.reasks_recovered += recovered
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "valid_as_returned": self.valid,
+                "repaired_locally": self.repaired,
+                "repair_rate": self.repaired / self.responses if self.responses else 0.0,
+                "targeted_reasks": self.reasks,
+                "reasks_recovered": self.reasks_recovered,
+                "full_retries_avoided": self.repaired + self.reasks_recovered,
+                "top_fixes": dict(self.fixes.most_common(5)),
+            }
@@ -0,0 +1,118 @@
+"""
+Tail-latency controls for model calls: jittered exponential backoff, a
+latency tracker that drives hedged requests, and a circuit breaker that fails
+fast while the upstream is degraded. The enforcer composes them per call.
+"""
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from errors import CircuitOpenError
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable upstream errors"""
+    max_attempts: int = 3
+    base_delay_seconds: float = 0.5
+    max_delay_seconds: float = 8.0
+
+    def delay(self, attempt: int, rng: random.Random = random) -> float:
+        """Sleep before retry number `attempt` (1-based): uniform in [0, base * 2^(attempt-1)], capped"""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (attempt - 1))
+        return rng.uniform(0, ceiling)
+
+
+class LatencyTracker:
+    """Recent successful call latencies; the hedging delay is their p95"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """None until enough samples have been seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive retryable failures and rejects
+    calls for `reset_timeout_seconds`; then lets a single probe through
+    (half-open) and closes again once a call succeeds.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError("Gemini is unavailable (circuit open); failing fast")
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError("Gemini is unavailable (circuit half-open, probe in flight)")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release(self):
+        """Give back a half-open probe slot after a failure that says nothing about upstream health"""
+        with self._lock:
+            self._probing = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
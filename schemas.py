@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from enum import Enum
 
 class AspectRatio(str, Enum):
@@ -62,8 +62,8 @@ class VeoPromptSchema(BaseModel):
     audio: Optional[Audio] = Field(None, description="Audio specifications")
     
     # Generation parameters
-    duration_seconds: Duration = Field(Duration.LONG, description="Video duration in seconds")
-    aspect_ratio: AspectRatio = Field(AspectRatio.WIDESCREEN, description="Video aspect ratio")
+    duration_seconds: Duration = Field(Duration.LONG, description="Video duration in seconds: 8 for detailed scenes, 6 for medium length, 4 for short clips")
+    aspect_ratio: AspectRatio = Field(AspectRatio.WIDESCREEN, description="Video aspect ratio: 16:9 for landscape/cinematic, 9:16 for vertical/mobile content")
     generate_audio: bool = Field(True, description="Whether to generate audio")
     
     # Advanced controls
@@ -116,3 +116,17 @@ class VeoPromptResponse(BaseModel):
     status: str
     structured_prompt: VeoPromptSchema
     raw_text_input: str
+
+class ErrorResponse(BaseModel):
+    """API error model"""
+    status: str = "error"
+    error: str
+    raw_text_input: Optional[str] = None
+
+class BatchInput(BaseModel):
+    """Input model for batch normalization"""
+    inputs: List[UnstructuredInput] = Field(..., description="Descriptions to normalize", max_length=100)
+
+class BatchResponse(BaseModel):
+    """API response model for batch normalization, one result per input in order"""
+    results: List[Union[VeoPromptResponse, ErrorResponse]]
@@ -0,0 +1,192 @@
+"""
+Headless HTTP service for the VeoPromptResponse contract.
+
+A dependency-free ASGI application: one GeminiSchemaEnforcer per worker
+process, created at startup and reused for every request so the upstream
+gRPC channel stays open. Configuration comes from config.load_config()
+(environment variables first, then .streamlit/secrets.toml). Run it with
+any ASGI server, e.g.
+
+    GEMINI_API_KEY=... uvicorn server:app --workers 4
+    GEMINI_API_KEY=... python server.py --port 8000 --workers 4
+
+Endpoints:
+    POST /normalize        UnstructuredInput -> VeoPromptResponse
+    POST /normalize/batch  BatchInput        -> BatchResponse (packed into shared model calls,
+                                                            scheduled in the batch lane)
+    GET  /healthz
+    GET  /metrics          Prometheus text format (set METRICS_ENABLED=true)
+"""
+import json
+
+from pydantic import ValidationError
+
+from errors import CircuitOpenError, DeadlineExceededError, RateLimitedError, SchemaEnforcerError
+from keypool import BATCH, KeyPool, lane
+from schemas import BatchInput, BatchResponse, ErrorResponse, UnstructuredInput, VeoPromptResponse
+
+MAX_BODY_BYTES = 1024 * 1024
+
+_enforcer = None
+
+
+def get_enforcer():
+    """Process-wide enforcer, created on first use"""
+    global _enforcer
+    if _enforcer is None:
+        from gemini_service import GeminiSchemaEnforcer
+
+        _enforcer = GeminiSchemaEnforcer.from_config()
+    return _enforcer
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_body(receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get("body", b""))
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+async def _send_json(send, status: int, payload: str, content_type: bytes = b"application/json"):
+    body = payload.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _status_for(error: Exception) -> int:
+    if isinstance(error, CircuitOpenError):
+        return 503
+    if isinstance(error, DeadlineExceededError):
+        return 504
+    if isinstance(error, RateLimitedError):
+        return 429
+    return 502
+
+
+def _response_for(text: str, outcome):
+    """VeoPromptResponse for a result or a degraded fallback, ErrorResponse otherwise"""
+    if isinstance(outcome, CircuitOpenError) and outcome.fallback is not None:
+        return VeoPromptResponse(status="degraded", structured_prompt=outcome.fallback, raw_text_input=text)
+    if isinstance(outcome, Exception):
+        return ErrorResponse(error=str(outcome), raw_text_input=text)
+    return VeoPromptResponse(status="success", structured_prompt=outcome, raw_text_input=text)
+
+
+async def normalize(body: bytes) -> str:
+    try:
+        request = UnstructuredInput.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPError(400, str(e))
+    try:
+        outcome = await get_enforcer().anormalize_to_schema(request.text)
+    except SchemaEnforcerError as e:
+        outcome = e
+    response = _response_for(request.text, outcome)
+    if isinstance(response, ErrorResponse):
+        raise HTTPError(_status_for(outcome), str(outcome))
+    return response.model_dump_json()
+
+
+async def normalize_batch(body: bytes) -> str:
+    try:
+        request = BatchInput.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPError(400, str(e))
+    with lane(BATCH):
+        outcomes = await get_enforcer().anormalize_many([item.text for item in request.inputs])
+    results = [_response_for(item.text, outcome) for item, outcome in zip(request.inputs, outcomes)]
+    return BatchResponse(results=results).model_dump_json()
+
+
+ROUTES = {
+    "/normalize": normalize,
+    "/normalize/batch": normalize_batch,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                get_enforcer()
+            except SchemaEnforcerError as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/") or "/"
+    method = scope["method"]
+    try:
+        if path == "/healthz":
+            if method != "GET":
+                raise HTTPError(405, "Method not allowed")
+            health = {"status": "ok"}
+            if _enforcer is not None:
+                health["circuit"] = _enforcer.circuit_breaker.state
+                if isinstance(_enforcer.backend, KeyPool):
+                    health["keys"] = {
+                        name: key["state"] for name, key in _enforcer.backend.stats["keys"].items()
+                    }
+            await _send_json(send, 200, json.dumps(health))
+            return
+        if path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "Method not allowed")
+            await _send_json(send, 200, get_enforcer().metrics.prometheus(), b"text/plain; version=0.0.4")
+            return
+        handler = ROUTES.get(path)
+        if handler is None:
+            raise HTTPError(404, "Not found")
+        if method != "POST":
+            raise HTTPError(405, "Method not allowed")
+        payload = await handler(await _read_body(receive))
+        await _send_json(send, 200, payload)
+    except HTTPError as e:
+        await _send_json(send, e.status, ErrorResponse(error=str(e)).model_dump_json())
+    except Exception:
+        # A bug, not an upstream failure: answer 500 and let the ASGI server log the traceback
+        await _send_json(send, 500, ErrorResponse(error="Internal server error").model_dump_json())
+        raise
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the Veo schema normalizer over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,52 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: the first caller for a key starts the
+    call, every concurrent caller with the same key awaits that same result or
+    error. Keys are dropped as soon as the call finishes, so nothing is cached.
+    Like the other asyncio primitives here, an instance belongs to one event loop.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key, call):
+        """
+        Run `call()` (a coroutine factory) once per key among concurrent callers.
+        The call runs in a task owned by the flight, so cancelling any caller,
+        including the one that started it, leaves it running for the others.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.followers += 1
+        else:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when nobody was left waiting
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    @property
+    def stats(self) -> dict:
+        requests = self.leaders + self.followers
+        return {
+            "upstream_calls": self.leaders,
+            "coalesced": self.followers,
+            "coalesced_ratio": self.followers / requests if requests else 0.0,
+            "in_flight": self.in_flight,
+        }
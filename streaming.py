@@ -0,0 +1,102 @@
+"""
+Incremental parsing of a streamed JSON prompt into VeoPromptSchema sections.
+
+SectionParser scans streamed text once and hands back each top-level member
+(subject, scene, shot, ...) as soon as its value is complete, so the UI can
+show sections before the whole response has arrived.
+"""
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """One completed section (`section` is the field name), or the final validated result"""
+    section: Optional[str]
+    value: Any
+    elapsed_seconds: float
+    final: bool = False
+
+
+class SectionParser:
+    """Feed JSON text chunks; get back (key, value) for each completed top-level member"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+
+    def feed(self, chunk: str) -> list:
+        self._text += chunk
+        members = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1 and char == "{":
+                    self._member_start = i + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    members.extend(self._member(text[self._member_start:i]))
+                    self._member_start = None
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                members.extend(self._member(text[self._member_start:i]))
+                self._member_start = i + 1
+        # Keep only the member still being parsed so long streams stay linear
+        cut = self._member_start if self._member_start is not None else len(text)
+        self._text = text[cut:]
+        self._pos = len(text) - cut
+        if self._member_start is not None:
+            self._member_start = 0
+        return members
+
+    @staticmethod
+    def _member(fragment: str) -> list:
+        if not fragment.strip():
+            return []
+        try:
+            return list(json.loads("{" + fragment + "}").items())
+        except json.JSONDecodeError:
+            return []
+
+
+class StreamStats:
+    """Time to first field versus total latency of streamed normalizations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.first_field_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def record(self, first_field_seconds: Optional[float], total_seconds: float):
+        with self._lock:
+            self.streams += 1
+            self.first_field_seconds += first_field_seconds if first_field_seconds is not None else total_seconds
+            self.total_seconds += total_seconds
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "streams": self.streams,
+                "avg_time_to_first_field": self.first_field_seconds / self.streams if self.streams else 0.0,
+                "avg_total_latency": self.total_seconds / self.streams if self.streams else 0.0,
+            }
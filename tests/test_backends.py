@@ -0,0 +1,62 @@
+import asyncio
+import warnings
+
+import pytest
+
+from backends import GeminiBackend
+from declarations import TOOL_CONFIG, TOOLS
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", FutureWarning)
+    protos = pytest.importorskip("google.generativeai").protos
+
+
+class FakeClient:
+    """Records requests and answers like GenerativeServiceAsyncClient"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, request):
+        self.requests.append(request)
+        call = protos.FunctionCall(name="create_veo_prompt", args={"style": "film noir"})
+        return protos.GenerateContentResponse(
+            candidates=[protos.Candidate(content=protos.Content(parts=[protos.Part(function_call=call)]))],
+            usage_metadata=protos.GenerateContentResponse.UsageMetadata(total_token_count=42),
+        )
+
+    async def stream_generate_content(self, request):
+        self.requests.append(request)
+
+        async def chunks():
+            for text in ('{"style": ', '"noir"}'):
+                yield protos.GenerateContentResponse(
+                    candidates=[protos.Candidate(content=protos.Content(parts=[protos.Part(text=text)]))]
+                )
+        return chunks()
+
+
+def _backend():
+    backend = GeminiBackend("test-key", "gemini-2.0-flash")
+    backend.client = FakeClient()
+    return backend
+
+
+def test_generate_sends_tools_to_the_keyed_client():
+    backend = _backend()
+    result = asyncio.run(backend.generate("A rainy alley", TOOLS, TOOL_CONFIG))
+    request = backend.client.requests[0]
+    assert request.model == "models/gemini-2.0-flash"
+    assert request.tools[0].function_declarations[0].name == "create_veo_prompt"
+    assert result.function_calls[0].args == {"style": "film noir"}
+    assert result.total_tokens == 42
+
+
+def test_stream_json_yields_text_chunks():
+    backend = _backend()
+
+    async def collect():
+        return [chunk async for chunk in backend.stream_json("A rainy alley", {})]
+
+    assert "".join(asyncio.run(collect())) == '{"style": "noir"}'
+    assert backend.client.requests[0].generation_config.response_mime_type == "application/json"
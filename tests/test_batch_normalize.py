@@ -0,0 +1,52 @@
+import io
+import json
+
+import pytest
+
+from backends import StubBackend
+from batch_normalize import main, run_job
+from gemini_service import GeminiSchemaEnforcer
+from jobs import JobStore
+
+DESCRIPTIONS = [f"A lighthouse keeper climbs the stairs, take {n}" for n in range(12)]
+
+
+def _run(tmp_path, ordered: bool):
+    enforcer = GeminiSchemaEnforcer(backend=StubBackend(latency_seconds=0.0, seed=0), pre_extract=False)
+    store = JobStore(str(tmp_path / f"jobs-{ordered}.db"))
+    records = [(line, json.dumps({"text": text})) for line, text in enumerate(DESCRIPTIONS, 1)]
+    records.append((len(records) + 1, "not json"))
+    out, errors_out = io.StringIO(), io.StringIO()
+    summary = run_job(enforcer, store, "job", iter(records), out, errors_out, concurrency=3,
+                      checkpoint_every=5, ordered=ordered)
+    store.close()
+    return summary, out.getvalue().splitlines(), errors_out.getvalue().splitlines()
+
+
+def test_unordered_job_writes_every_result_once(tmp_path):
+    ordered, ordered_lines, ordered_errors = _run(tmp_path, ordered=True)
+    unordered, unordered_lines, unordered_errors = _run(tmp_path, ordered=False)
+    # Stub payloads depend on call interleaving, so compare which inputs were written
+    assert [json.loads(line)["raw_text_input"] for line in ordered_lines] == DESCRIPTIONS
+    assert sorted(json.loads(line)["raw_text_input"] for line in unordered_lines) == sorted(DESCRIPTIONS)
+    assert len(unordered_errors) == len(ordered_errors) == 1
+    assert unordered.pending == ordered.pending == 0
+
+
+@pytest.mark.parametrize("flags, expected", [([], 12), (["--concurrency", "3"], 3)])
+def test_concurrency_defaults_to_the_configured_limit(tmp_path, monkeypatch, flags, expected):
+    configs = []
+
+    def from_config(cls, config):
+        configs.append(config)
+        return cls(backend=StubBackend(latency_seconds=0.0, seed=0), pre_extract=False)
+
+    monkeypatch.setattr(GeminiSchemaEnforcer, "from_config", classmethod(from_config))
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setenv("MAX_CONCURRENT_REQUESTS", "12")
+    source = tmp_path / "inputs.jsonl"
+    source.write_text(json.dumps({"text": DESCRIPTIONS[0]}) + "\n")
+    output = tmp_path / "results.jsonl"
+    assert main([str(source), "-o", str(output), "--errors", str(tmp_path / "errors.jsonl"), *flags]) == 0
+    assert configs[0].max_concurrent_requests == expected
+    assert json.loads(output.read_text())["status"] == "success"
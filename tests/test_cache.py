@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import cache
+from cache import ResponseCache, make_cache_key
+from schemas import VeoPromptSchema
+
+EXAMPLE = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+
+
+def _prompt(style: str) -> VeoPromptSchema:
+    data = json.loads(json.dumps(EXAMPLE))
+    data["style"] = style
+    return VeoPromptSchema(**data)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_keys_ignore_whitespace_but_not_model_or_config():
+    key = make_cache_key("A red  kite\nover hills", "model", "config")
+    assert key == make_cache_key(" A red kite over hills ", "model", "config")
+    assert key != make_cache_key("A red kite over hills", "other-model", "config")
+    assert key != make_cache_key("A red kite over hills", "model", "other-config")
+
+
+def test_entries_expire_after_the_ttl(clock):
+    responses = ResponseCache(ttl_seconds=60)
+    responses.set("key", _prompt("noir"))
+    clock[0] += 59
+    assert responses.get("key").style == "noir"
+    clock[0] += 2
+    assert responses.get("key") is None
+    assert responses.stats["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    responses = ResponseCache(max_entries=2)
+    responses.set("first", _prompt("first"))
+    responses.set("second", _prompt("second"))
+    responses.get("first")
+    responses.set("third", _prompt("third"))
+    assert responses.get("second") is None
+    assert responses.get("first").style == "first"
+    assert responses.get("third").style == "third"
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=path).set("key", _prompt("noir"))
+    responses = ResponseCache(db_path=path)
+    assert responses.stats["entries"] == 0
+    assert responses.get("key").style == "noir"
+    assert responses.get("key").style == "noir"
+    assert responses.stats["entries"] == 1
+    assert (responses.hits, responses.disk_hits, responses.misses) == (2, 1, 0)
+
+
+def test_expired_disk_entries_are_misses(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(db_path=path, ttl_seconds=60).set("key", _prompt("noir"))
+    clock[0] += 61
+    responses = ResponseCache(db_path=path, ttl_seconds=60)
+    assert responses.get("key") is None
+    assert responses.stats["misses"] == 1
+
+
+def test_counters_and_hit_rate():
+    responses = ResponseCache()
+    assert responses.stats["hit_rate"] == 0.0
+    responses.get("missing")
+    responses.set("key", _prompt("noir"))
+    responses.get("key")
+    responses.get("key")
+    stats = responses.stats
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (2, 0, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    responses.clear()
+    assert responses.get("key") is None
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from columnar import ColumnarWriter, read_prompts
+from schemas import VeoPromptSchema
+
+EXAMPLE = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+
+
+def _prompts(count: int) -> list:
+    prompts = []
+    for index in range(count):
+        data = json.loads(json.dumps(EXAMPLE))
+        data["subject"]["description"] = f"subject {index}"
+        data["shot"]["framing"] = f"framing {index % 7}"
+        data["style"] = f"style {index}"
+        data["aspect_ratio"] = "9:16" if index % 2 else "16:9"
+        prompts.append(VeoPromptSchema(**data))
+    return prompts
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow", ".feather", ".jsonl"])
+def test_round_trip_over_several_row_groups(tmp_path, suffix):
+    if suffix != ".jsonl":
+        pytest.importorskip("pyarrow")
+    prompts = _prompts(25)
+    path = str(tmp_path / f"prompts{suffix}")
+    with ColumnarWriter(path, row_group_size=4) as writer:
+        assert writer.write_all(prompts) == 25
+    assert list(read_prompts(path, batch_size=3)) == prompts
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow", ".jsonl"])
+def test_round_trip_keeps_explicit_nulls_and_empty_objects(tmp_path, suffix):
+    if suffix != ".jsonl":
+        pytest.importorskip("pyarrow")
+    data = json.loads(json.dumps(EXAMPLE))
+    data["shot"]["frame_rate"] = None
+    data["audio"] = {}
+    empty_audio = VeoPromptSchema(**data)
+    data["audio"] = None
+    data["negative_prompt"] = None
+    no_audio = VeoPromptSchema(**data)
+    path = str(tmp_path / f"prompts{suffix}")
+    with ColumnarWriter(path) as writer:
+        writer.write_all([empty_audio, no_audio])
+    first, second = read_prompts(path)
+    assert first.shot.frame_rate is None
+    assert first.audio is not None and first.audio.model_dump() == empty_audio.audio.model_dump()
+    assert second.audio is None and second.negative_prompt is None
+    assert [first, second] == [empty_audio, no_audio]
+
+
+def test_parquet_row_groups_do_not_grow(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "prompts.parquet")
+    with ColumnarWriter(path, row_group_size=500) as writer:
+        writer.write_all(_prompts(4000))
+    metadata = pq.ParquetFile(path).metadata
+    style = metadata.schema.names.index("style")
+    sizes = [metadata.row_group(index).column(style).total_uncompressed_size
+             for index in range(metadata.num_row_groups)]
+    assert len(sizes) == 8
+    # Each row group holds 500 new styles; a cumulative dictionary would grow with every group
+    assert max(sizes) < 1.5 * min(sizes)
@@ -0,0 +1,50 @@
+import copy
+
+import pytest
+
+from declarations import PARAMETERS, verify_declaration
+from errors import DeclarationDriftError
+from schemas import VeoPromptSchema
+
+
+def _resolve(node: dict, defs: dict) -> dict:
+    for option in node.get("anyOf", ()):
+        if option.get("type") != "null":
+            node = {**option, **{key: value for key, value in node.items() if key != "anyOf"}}
+    for ref in [node.get("$ref")] + [item.get("$ref") for item in node.get("allOf", ())]:
+        if ref:
+            node = {**defs[ref.rsplit("/", 1)[-1]], **node}
+    return node
+
+
+def _compare(declared: dict, node: dict, defs: dict, path: str):
+    node = _resolve(node, defs)
+    assert declared["type"] == node["type"], path
+    if "enum" in node:
+        if node["type"] == "string":
+            assert declared["enum"] == node["enum"], path
+        else:
+            assert f"One of: {', '.join(map(str, node['enum']))}." in declared["description"], path
+    if node["type"] == "object":
+        assert set(declared["properties"]) == set(node["properties"]), path
+        assert set(declared.get("required", ())) == set(node.get("required", ())), path
+        for name, child in node["properties"].items():
+            _compare(declared["properties"][name], child, defs, f"{path}.{name}")
+    elif node["type"] == "array":
+        _compare(declared["items"], node["items"], defs, f"{path}[]")
+
+
+def test_declaration_matches_model_json_schema():
+    schema = VeoPromptSchema.model_json_schema()
+    _compare(PARAMETERS, schema, schema.get("$defs", {}), "VeoPromptSchema")
+
+
+def test_declaration_matches_model_fields():
+    verify_declaration(PARAMETERS)
+
+
+def test_drift_is_detected():
+    parameters = copy.deepcopy(PARAMETERS)
+    parameters["properties"]["aspect_ratio"]["enum"].pop()
+    with pytest.raises(DeclarationDriftError, match="aspect_ratio"):
+        verify_declaration(parameters)
@@ -0,0 +1,55 @@
+import pytest
+
+from extractor import extract
+
+
+@pytest.mark.parametrize("text", [
+    "A close-up of her hands, then a wide shot of the hall",
+    "Film noir lighting in a cheerful anime world",
+    "A slow dolly in that ends on a crane shot",
+])
+def test_conflicting_single_valued_fields_are_dropped(text):
+    paths = extract(text).paths
+    assert not paths & {"shot.framing", "style", "camera_motion.type"}
+
+
+def test_scene_nouns_are_not_camera_details():
+    text = "A teenager texts on her iPhone while a delivery drone hovers over pots and pans"
+    assert not extract(text).paths & {"shot.camera_equipment", "camera_motion.type"}
+
+
+@pytest.mark.parametrize("text, path, value", [
+    ("Shot on iPhone at a night market", "shot.camera_equipment", "iPhone"),
+    ("Drone footage of a rocky coastline", "camera_motion.type", "drone"),
+    ("The camera slowly pans across the valley", "camera_motion.type", "pan"),
+])
+def test_camera_context_is_recognized(text, path, value):
+    assert extract(text).flat()[path] == value
+
+
+@pytest.mark.parametrize("text", [
+    "A climber scales a vertical cliff face at dawn",
+    "Vertical blinds cast striped shadows across the office",
+])
+def test_scene_words_are_not_aspect_ratios(text):
+    assert "aspect_ratio" not in extract(text).paths
+
+
+@pytest.mark.parametrize("text", [
+    "A film with a muted color palette and a slow cello score",
+    "A silent monk walks through the courtyard while bells ring",
+])
+def test_scene_words_do_not_disable_audio(text):
+    assert "generate_audio" not in extract(text).paths
+
+
+@pytest.mark.parametrize("text, path, value", [
+    ("A vertical video of a street dancer", "aspect_ratio", "9:16"),
+    ("Portrait orientation, a cat on a windowsill", "aspect_ratio", "9:16"),
+    ("A harbor at dusk, 9:16", "aspect_ratio", "9:16"),
+    ("A desert road at noon, no audio", "generate_audio", False),
+    ("A desert road at noon, without sound", "generate_audio", False),
+    ("A silent film of a clown juggling", "generate_audio", False),
+])
+def test_format_phrases_are_recognized(text, path, value):
+    assert extract(text).flat()[path] == value
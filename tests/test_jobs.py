@@ -0,0 +1,64 @@
+from errors import InvalidResponseError, UpstreamError
+from jobs import DONE, FAILED, PENDING, JobStore
+
+
+def _status(store, input_hash):
+    return store._conn.execute("SELECT status FROM results WHERE input_hash = ?", (input_hash,)).fetchone()[0]
+
+
+def _store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), max_attempts=2)
+    store.open_job("first")
+    store.add_items("first", [(1, "h1", "a fox in the snow", None)], 1, complete=True)
+    return store
+
+
+def test_invalid_response_counts_toward_max_attempts(tmp_path):
+    store = _store(tmp_path)
+    store.record([("h1", InvalidResponseError("no function call"))])
+    assert _status(store, "h1") == PENDING
+    store.record([("h1", InvalidResponseError("no function call"))])
+    assert _status(store, "h1") == FAILED
+
+
+def test_failed_input_is_retried_by_a_later_job(tmp_path):
+    store = _store(tmp_path)
+    store.record([("h1", UpstreamError("bad request", retryable=False))])
+    assert _status(store, "h1") == FAILED
+
+    store.open_job("second")
+    store.add_items("second", [(1, "h1", "a fox in the snow", None)], 1, complete=True)
+    assert [text for _, text in store.pending("second")] == ["a fox in the snow"]
+
+
+def test_rerun_retries_failed_inputs_but_keeps_done_ones(tmp_path):
+    store = _store(tmp_path)
+    store.add_items("first", [(2, "h2", "a heron at dawn", None)], 2, complete=True)
+    store.record([("h1", UpstreamError("bad request", retryable=False))])
+    store._conn.execute("UPDATE results SET status = ? WHERE input_hash = 'h2'", (DONE,))
+    store.open_job("first")
+    assert _status(store, "h1") == PENDING
+    assert _status(store, "h2") == DONE
+
+
+def test_finished_pages_on_the_completion_cursor(tmp_path):
+    store = _store(tmp_path)
+    store.add_items("first", [(2, "h2", "a heron at dawn", None), (3, None, None, "not json")], 3, complete=True)
+    store.record([("h2", UpstreamError("bad request", retryable=False))])
+    read = list(store.finished("first"))
+    assert [result.seq for result in read] == [3, 2]
+    assert [result.seq for result in store.finished("first", page_size=1)] == [3, 2]
+    cursor = max(result.finished_seq for result in read)
+
+    # An earlier input finishing later is still picked up after the cursor
+    store.record([("h1", InvalidResponseError("no function call"))] * 2)
+    assert [result.seq for result in store.finished("first", after=cursor)] == [1]
+    assert [result.seq for result in store.finished("first", after=cursor, page_size=1)] == [1]
+
+
+def test_input_done_in_an_earlier_job_is_finished_when_ingested(tmp_path):
+    store = _store(tmp_path)
+    store._conn.execute("UPDATE results SET status = ? WHERE input_hash = 'h1'", (DONE,))
+    store.open_job("second")
+    store.add_items("second", [(1, "h1", "a fox in the snow", None)], 1, complete=True)
+    assert [result.status for result in store.finished("second")] == [DONE]
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+import pytest
+
+from backends import StubBackend
+from errors import RateLimitedError
+from keypool import KeyPool, KeySlot
+
+
+class ThrottledBackend(StubBackend):
+    async def generate(self, prompt, tools, tool_config):
+        raise RateLimitedError("429 quota exceeded (test)")
+
+
+def test_failover_wait_is_bounded():
+    busy = KeySlot("busy", StubBackend(seed=0), max_concurrency=1)
+    pool = KeyPool([KeySlot("throttled", ThrottledBackend(seed=0)), busy], failover_wait_seconds=0.05)
+    # The only other key is at its concurrency limit for longer than the failover budget
+    busy.reserve(0)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(RateLimitedError):
+            async with pool.acquire():
+                await pool.generate("a fox in the snow", [], {})
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 0.5
+    assert pool.stats["failover_timeouts"] == 1
+    assert pool.stats["waiting"] == 0
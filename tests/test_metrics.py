@@ -0,0 +1,10 @@
+from metrics import Metrics
+
+
+def test_prometheus_counters_keep_full_precision():
+    metrics = Metrics(enabled=True)
+    metrics.inc("tokens_total", 123_456_789, kind="prompt")
+    metrics.inc("tokens_total", 0.1, kind="output")
+    text = metrics.prometheus()
+    assert 'veo_tokens_total{kind="prompt"} 123456789.0' in text
+    assert 'veo_tokens_total{kind="output"} 0.1' in text
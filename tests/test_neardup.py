@@ -0,0 +1,58 @@
+from backends import StubBackend
+from gemini_service import GeminiSchemaEnforcer
+from neardup import NearDuplicateIndex, words
+from schemas import AspectRatio
+
+DESCRIPTION = (
+    "A young woman with long dark hair walks confidently down a rainy city street at night, "
+    "neon signs reflecting in the puddles, moody cinematic atmosphere with soft rain sounds, "
+    "medium tracking shot on a steadicam, {format}"
+)
+
+
+def _enforcer():
+    return GeminiSchemaEnforcer(backend=StubBackend(latency_seconds=0.0, seed=0),
+                                near_duplicates=NearDuplicateIndex())
+
+
+def test_ratio_and_duration_are_single_tokens():
+    assert words("9 : 16, 8 seconds") == ["9:16", "8s"]
+    assert set(words("16:9")) != set(words("9:16"))
+
+
+def test_trivial_edit_is_reused():
+    enforcer = _enforcer()
+    first = enforcer.normalize_to_schema(DESCRIPTION.format(format="16:9"))
+    again = enforcer.normalize_to_schema(DESCRIPTION.format(format="16:9").upper() + "!")
+    assert again == first
+    assert enforcer.near_duplicates.stats["reused"] == 1
+
+
+def test_changed_aspect_ratio_is_not_reused():
+    enforcer = _enforcer()
+    enforcer.normalize_to_schema(DESCRIPTION.format(format="16:9"))
+    result = enforcer.normalize_to_schema(DESCRIPTION.format(format="9:16"))
+    assert AspectRatio(result.aspect_ratio) == AspectRatio.VERTICAL
+    assert enforcer.near_duplicates.stats["reused"] == 0
+
+
+def test_negated_technical_parameter_is_regenerated():
+    index = NearDuplicateIndex()
+    enforcer = _enforcer()
+    stored = enforcer.normalize_to_schema(DESCRIPTION.format(format="vertical video"))
+    assert AspectRatio(stored.aspect_ratio) == AspectRatio.VERTICAL
+    index.add(DESCRIPTION.format(format="vertical video"), stored)
+    seed = index.seed(DESCRIPTION.format(format="not vertical video"))
+    assert seed is not None and not seed.reuse
+    assert "aspect_ratio" in seed.regenerate
+    assert "aspect_ratio" not in seed.values
+
+
+def test_stream_looks_up_the_index():
+    enforcer = _enforcer()
+    first = enforcer.normalize_to_schema(DESCRIPTION.format(format="16:9"))
+    calls = enforcer.backend.calls
+    events = list(enforcer.stream_to_schema(DESCRIPTION.format(format="16:9").lower()))
+    assert events[-1].final and events[-1].value == first
+    assert enforcer.backend.calls == calls
+    assert enforcer.near_duplicates.stats["reused"] == 1
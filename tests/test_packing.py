@@ -0,0 +1,99 @@
+from backends import FunctionCall, StubBackend
+from errors import InvalidResponseError
+from gemini_service import GeminiSchemaEnforcer
+from packing import PackItem, PackSizer, demultiplex
+from schemas import VeoPromptSchema
+
+TEXTS = [
+    "A red kite over green hills",
+    "A fox crossing a snowy field at dawn",
+    "A lighthouse in a storm, slow dolly in",
+    "Two children racing paper boats down a gutter",
+    "A chef plating dessert in a busy kitchen",
+]
+
+
+class DroppingBackend(StubBackend):
+    """Answers description `drop` under an unknown id in the first `failures` packed calls"""
+
+    def __init__(self, drop: str, failures: int):
+        super().__init__(latency_seconds=0.0, seed=0)
+        self.drop = drop
+        self.failures = failures
+
+    async def generate(self, prompt, tools, tool_config):
+        response = await super().generate(prompt, tools, tool_config)
+        prompts = response.function_calls[0].args["prompts"]
+        if self.failures and any(entry["id"] == self.drop for entry in prompts):
+            self.failures -= 1
+            prompts[:] = [entry if entry["id"] != self.drop else {**entry, "id": "unknown"} for entry in prompts]
+        return response
+
+
+def _items(count: int) -> list:
+    return [PackItem(f"d{index}", f"description number {index}", f"key{index}") for index in range(count)]
+
+
+def test_packs_respect_the_size_limit():
+    packs = PackSizer().packs(_items(10), max_pack_size=4)
+    assert [len(pack) for pack in packs] == [4, 4, 2]
+
+
+def test_packs_respect_the_token_budget():
+    sizer = PackSizer(overhead_tokens=100)
+    budget = 100 + 3 * sizer.item_tokens(_items(1)[0])
+    assert [len(pack) for pack in sizer.packs(_items(7), max_pack_size=8, token_budget=budget)] == [3, 3, 1]
+
+
+def test_an_oversized_item_still_gets_a_pack():
+    assert [len(pack) for pack in PackSizer().packs(_items(2), token_budget=1)] == [1, 1]
+
+
+def test_output_estimate_adapts_to_observed_usage():
+    sizer = PackSizer()
+    before = sizer.output_tokens_per_item
+    sizer.observe(4, 400)
+    assert sizer.output_tokens_per_item < before
+    sizer.observe(0, 400)
+    sizer.observe(4, None)
+    assert sizer.output_tokens_per_item == int(0.7 * before + 0.3 * 100)
+
+
+def test_demultiplex_ignores_unknown_repeated_and_malformed_entries():
+    items = _items(3)
+    calls = [
+        FunctionCall("veo_prompts", {"prompts": [{"id": "d0", "style": "first"}, {"id": "d9"}, "junk"]}),
+        FunctionCall("veo_prompts", {"prompts": [{"id": "d0", "style": "second"}, {"id": "d2", "style": "x"}]}),
+        FunctionCall("veo_prompts", {}),
+    ]
+    assert demultiplex(calls, items) == {"d0": {"style": "first"}, "d2": {"style": "x"}}
+
+
+def test_descriptions_are_packed_into_shared_calls():
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    enforcer = GeminiSchemaEnforcer(backend=backend, pre_extract=False)
+    results = enforcer.normalize_many(TEXTS + TEXTS[:1], max_pack_size=2)
+    assert all(isinstance(result, VeoPromptSchema) for result in results)
+    assert results[-1] == results[0]
+    assert backend.calls == 3
+    assert enforcer.packing_stats == {"packed_requests": 3, "packed_items": 5, "retried_items": 0}
+
+
+def test_missing_descriptions_are_repacked_and_unknown_ids_ignored():
+    backend = DroppingBackend(drop="d1", failures=1)
+    enforcer = GeminiSchemaEnforcer(backend=backend, pre_extract=False)
+    results = enforcer.normalize_many(TEXTS, max_pack_size=8)
+    assert all(isinstance(result, VeoPromptSchema) for result in results)
+    assert backend.calls == 2
+    assert enforcer.packing_stats["retried_items"] == 1
+    assert enforcer.packing_stats["packed_items"] == len(TEXTS) + 1
+
+
+def test_a_description_missing_from_every_attempt_fails_alone():
+    backend = DroppingBackend(drop="d1", failures=3)
+    enforcer = GeminiSchemaEnforcer(backend=backend, pre_extract=False)
+    results = enforcer.normalize_many(TEXTS, max_pack_size=8, max_attempts=3)
+    assert isinstance(results[1], InvalidResponseError)
+    assert all(isinstance(result, VeoPromptSchema) for index, result in enumerate(results) if index != 1)
+    assert backend.calls == 3
+    assert enforcer.packing_stats["retried_items"] == 2
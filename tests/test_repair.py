@@ -0,0 +1,20 @@
+import asyncio
+
+from backends import StubBackend
+from extractor import degraded_result
+from gemini_service import GeminiSchemaEnforcer
+
+
+def test_reask_response_is_counted_only_as_a_reask():
+    enforcer = GeminiSchemaEnforcer(backend=StubBackend(latency_seconds=0.0, seed=0))
+    data = degraded_result("A heron wades through a misty marsh at dawn").model_dump(mode="json")
+    data["scene"]["location"] = None
+    result, failure = enforcer._validate(data)
+    assert result is None
+
+    asyncio.run(enforcer._reask("A heron wades through a misty marsh at dawn", *failure))
+    stats = enforcer.repair_stats.stats
+    assert stats["responses"] == 1
+    assert stats["valid_as_returned"] == 0
+    assert stats["targeted_reasks"] == 1
+    assert stats["reasks_recovered"] == 1
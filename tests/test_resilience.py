@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from backends import StubBackend
+from gemini_service import GeminiSchemaEnforcer
+from rate_limit import RateLimiter
+from resilience import RetryPolicy
+
+
+class BrokenBackend(StubBackend):
+    """Raises the same exception on every call"""
+
+    def __init__(self, error: Exception):
+        super().__init__(latency_seconds=0.0, seed=0)
+        self.error = error
+
+    async def generate(self, prompt, tools, tool_config):
+        self.calls += 1
+        raise self.error
+
+
+def _enforcer(backend):
+    return GeminiSchemaEnforcer(backend=backend, pre_extract=False,
+                                retry_policy=RetryPolicy(base_delay_seconds=0.0))
+
+
+def test_unknown_errors_propagate_without_retries():
+    backend = BrokenBackend(KeyError("candidates"))
+    enforcer = _enforcer(backend)
+    with pytest.raises(KeyError):
+        enforcer.normalize_to_schema("A red kite over green hills")
+    assert backend.calls == 1
+    assert enforcer.resilience_stats["retries"] == 0
+
+
+def test_unknown_errors_are_returned_unchanged_by_normalize_many():
+    enforcer = _enforcer(BrokenBackend(KeyError("candidates")))
+    outcomes = enforcer.normalize_many(["A red kite over green hills", "A fox in the snow"])
+    assert all(isinstance(outcome, KeyError) for outcome in outcomes)
+
+
+def test_no_hedges_while_the_rate_limiter_is_saturated():
+    enforcer = GeminiSchemaEnforcer(backend=StubBackend(latency_seconds=0.02, seed=0), pre_extract=False,
+                                    rate_limiter=RateLimiter(max_concurrency=4), hedge=True)
+    for _ in range(enforcer.latency.min_samples):
+        enforcer.latency.record(0.1)
+
+    async def run():
+        texts = [f"A red kite over green hills, take {index}" for index in range(100)]
+        return await asyncio.gather(*(enforcer.anormalize_to_schema(text) for text in texts))
+
+    assert all(result is not None for result in asyncio.run(run()))
+    # Requests queued behind the limiter are not slow upstream calls and must not be hedged
+    assert enforcer.resilience_stats["hedges"] == 0
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+from backends import StubBackend
+from errors import DeadlineExceededError, RateLimitedError, UpstreamError
+from gemini_service import GeminiSchemaEnforcer
+from resilience import CircuitBreaker, RetryPolicy
+
+TEXT = "A red kite over green hills"
+
+
+class BrokenBackend(StubBackend):
+    """Raises the same exception on every call"""
+
+    def __init__(self, error: Exception):
+        super().__init__(latency_seconds=0.0, seed=0)
+        self.error = error
+
+    async def generate(self, prompt, tools, tool_config):
+        raise self.error
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    def use(backend, **kwargs):
+        enforcer = GeminiSchemaEnforcer(backend=backend, pre_extract=False,
+                                        retry_policy=RetryPolicy(max_attempts=1), **kwargs)
+        monkeypatch.setattr(server, "_enforcer", enforcer)
+        return enforcer
+    return use
+
+
+def _request(method: str, path: str, payload=None, sent: list = None) -> tuple:
+    """(status, decoded JSON body) of one request sent straight to the ASGI app"""
+    body = payload if isinstance(payload, bytes) else b"" if payload is None else json.dumps(payload).encode("utf-8")
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = [] if sent is None else sent
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(server.app({"type": "http", "method": method, "path": path}, receive, send))
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+def test_normalize_returns_a_prompt(use_backend):
+    use_backend(StubBackend(latency_seconds=0.0, seed=0))
+    status, body = _request("POST", "/normalize", {"text": TEXT})
+    assert status == 200
+    assert body["status"] == "success" and body["raw_text_input"] == TEXT
+    assert body["structured_prompt"]["subject"]["description"]
+
+
+def test_batch_returns_one_result_per_input_in_order(use_backend):
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    use_backend(backend)
+    texts = [TEXT, "A fox crossing a snowy field at dawn", TEXT]
+    status, body = _request("POST", "/normalize/batch", {"inputs": [{"text": text} for text in texts]})
+    assert status == 200
+    assert [result["raw_text_input"] for result in body["results"]] == texts
+    assert all(result["status"] == "success" for result in body["results"])
+    assert body["results"][0] == body["results"][2]
+    assert backend.calls == 1
+
+
+def test_batch_reports_failures_per_item(use_backend):
+    use_backend(BrokenBackend(UpstreamError("503 unavailable (test)")))
+    status, body = _request("POST", "/normalize/batch", {"inputs": [{"text": TEXT}]})
+    assert status == 200
+    assert body["results"][0]["status"] == "error"
+    assert "test" in body["results"][0]["error"]
+
+
+def test_healthz_reports_the_circuit(use_backend):
+    use_backend(StubBackend(latency_seconds=0.0, seed=0))
+    assert _request("GET", "/healthz") == (200, {"status": "ok", "circuit": "closed"})
+
+
+@pytest.mark.parametrize("method, path, payload, status", [
+    ("GET", "/missing", None, 404),
+    ("GET", "/normalize", None, 405),
+    ("POST", "/healthz", None, 405),
+    ("POST", "/normalize", b"not json", 400),
+    ("POST", "/normalize", {"words": TEXT}, 400),
+    ("POST", "/normalize", b"x" * (server.MAX_BODY_BYTES + 1), 413),
+])
+def test_request_errors(use_backend, method, path, payload, status):
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    use_backend(backend)
+    code, body = _request(method, path, payload)
+    assert code == status
+    assert body["status"] == "error"
+    assert backend.calls == 0
+
+
+@pytest.mark.parametrize("error, status", [
+    (UpstreamError("503 unavailable (test)"), 502),
+    (DeadlineExceededError("too slow (test)"), 504),
+    (RateLimitedError("429 quota (test)"), 429),
+])
+def test_upstream_errors_map_to_gateway_statuses(use_backend, error, status):
+    use_backend(BrokenBackend(error))
+    code, body = _request("POST", "/normalize", {"text": TEXT})
+    assert code == status
+    assert "test" in body["error"]
+
+
+def test_open_circuit_serves_a_degraded_prompt(use_backend):
+    use_backend(BrokenBackend(UpstreamError("503 unavailable (test)")),
+                circuit_breaker=CircuitBreaker(failure_threshold=1))
+    assert _request("POST", "/normalize", {"text": TEXT})[0] == 502
+    status, body = _request("POST", "/normalize", {"text": TEXT})
+    assert status == 200
+    assert body["status"] == "degraded" and body["raw_text_input"] == TEXT
+
+
+def test_bugs_are_internal_server_errors(use_backend):
+    use_backend(BrokenBackend(KeyError("candidates")))
+    sent = []
+    with pytest.raises(KeyError):
+        _request("POST", "/normalize", {"text": TEXT}, sent)
+    assert sent[0]["status"] == 500
+    assert json.loads(sent[1]["body"])["error"] == "Internal server error"
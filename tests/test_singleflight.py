@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_leader_cancellation_does_not_reach_followers():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "result"
+    assert calls == [1]
+    assert flight.in_flight == 0
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(flight.do("key", call), flight.do("key", call), return_exceptions=True)
+
+    outcomes = asyncio.run(run())
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats["upstream_calls"] == 1
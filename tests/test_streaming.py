@@ -0,0 +1,102 @@
+import asyncio
+
+from backends import StubBackend
+from cache import ResponseCache
+from errors import UpstreamError
+from gemini_service import GeminiSchemaEnforcer
+from rate_limit import RateLimiter
+from resilience import RetryPolicy
+
+DESCRIPTION = "A lighthouse keeper climbs the spiral stairs during a storm, slow dolly in"
+# Every required field is labelled, so local extraction completes the prompt without the model
+LABELLED = """Subject: a lighthouse keeper
+Action: climbs the spiral stairs
+Location: a lighthouse during a storm
+Time of day: night
+Lighting: lightning flashes
+Framing: wide shot
+Camera motion: slow dolly in
+Style: cinematic"""
+
+
+class FlakyBackend(StubBackend):
+    """Fails the first `failures` streams before any chunk arrives"""
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(latency_seconds=0.0, seed=0, **kwargs)
+        self.failures = failures
+
+    async def stream_json(self, prompt, parameters, chunk_chars=32):
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise UpstreamError("503 unavailable (test)")
+        async for chunk in super().stream_json(prompt, parameters, chunk_chars):
+            yield chunk
+
+
+def _enforcer(backend, **kwargs):
+    return GeminiSchemaEnforcer(backend=backend, pre_extract=False,
+                                retry_policy=RetryPolicy(base_delay_seconds=0.0), **kwargs)
+
+
+def test_stream_retries_before_first_chunk():
+    backend = FlakyBackend(failures=2)
+    enforcer = _enforcer(backend)
+    events = list(enforcer.stream_to_schema(DESCRIPTION))
+    assert events[-1].final and events[-1].value is not None
+    assert backend.calls == 3
+    assert enforcer.resilience_stats["retries"] == 2
+
+
+def test_slow_consumer_does_not_hold_the_permit():
+    rate_limiter = RateLimiter(max_concurrency=1)
+    enforcer = _enforcer(StubBackend(latency_seconds=0.0, seed=0), rate_limiter=rate_limiter)
+
+    async def run():
+        stream = enforcer.astream_to_schema(DESCRIPTION)
+        await stream.__anext__()
+        # The consumer is parked mid-stream; the producer must still finish and release its slot
+        await asyncio.sleep(0.05)
+        assert rate_limiter.in_flight == 0
+        other = await asyncio.wait_for(enforcer.anormalize_to_schema(DESCRIPTION + " at dawn"), 1.0)
+        events = [event async for event in stream]
+        return other, events
+
+    other, events = asyncio.run(run())
+    assert other is not None
+    assert events[-1].final
+
+
+def test_identical_streams_share_one_upstream_call():
+    backend = StubBackend(latency_seconds=0.01, seed=0)
+    enforcer = _enforcer(backend)
+
+    async def collect():
+        return [event async for event in enforcer.astream_to_schema(DESCRIPTION)]
+
+    async def run():
+        return await asyncio.gather(collect(), collect())
+
+    first, second = asyncio.run(run())
+    assert backend.calls == 1
+    assert first[-1].value == second[-1].value
+    assert {event.section for event in second[:-1]} == {event.section for event in first[:-1]}
+
+
+def test_stream_caches_a_locally_completed_result():
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    enforcer = GeminiSchemaEnforcer(backend=backend, cache=ResponseCache())
+    events = list(enforcer.stream_to_schema(LABELLED))
+    assert backend.calls == 0
+    assert enforcer.extraction_stats.model_calls_skipped == 1
+    assert enforcer.normalize_to_schema(LABELLED) == events[-1].value
+    assert enforcer.cache.hits == 1
+
+
+def test_stream_records_partial_extraction():
+    enforcer = GeminiSchemaEnforcer(backend=StubBackend(latency_seconds=0.0, seed=0))
+    events = list(enforcer.stream_to_schema(DESCRIPTION))
+    assert events[-1].final
+    assert enforcer.extraction_stats.inputs == 1
+    assert enforcer.extraction_stats.partial_calls == 1
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+from schemas import VeoPromptSchema
+from validate_corpus import chunk_ranges, main, validate_files
+
+EXAMPLE = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+# Invalid records on lines 2, 5 and 9, a blank line 7, and no newline after the last record
+INVALID_LINES = [2, 5, 9]
+
+
+def _corpus(tmp_path) -> str:
+    lines = []
+    for line in range(1, 11):
+        data = json.loads(json.dumps(EXAMPLE))
+        data["subject"]["description"] = "x" * (line * 37)
+        if line in INVALID_LINES:
+            data["duration_seconds"] = 5
+        lines.append("" if line == 7 else json.dumps(data))
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(lines))
+    return str(path)
+
+
+def _invalid(path: str, **kwargs) -> list:
+    out = io.StringIO()
+    report = validate_files([path], invalid_out=out, **kwargs)
+    assert (report.records, report.invalid) == (9, 3)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 100, 1000, 1 << 20])
+def test_chunks_are_contiguous_and_newline_aligned(tmp_path, chunk_bytes):
+    path = _corpus(tmp_path)
+    with open(path, "rb") as f:
+        data = f.read()
+    ranges = chunk_ranges(path, chunk_bytes)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges[:-1])
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 100, 1000, 1 << 20])
+def test_line_numbers_survive_chunking(tmp_path, chunk_bytes):
+    path = _corpus(tmp_path)
+    # Chunk sizes that split records mid-line must still report the original line numbers
+    invalid = _invalid(path, workers=1, chunk_bytes=chunk_bytes)
+    assert [record["line"] for record in invalid] == INVALID_LINES
+    assert all(record["file"] == path for record in invalid)
+    assert invalid[0]["errors"][0]["field"] == "duration_seconds"
+
+
+def test_process_pool_matches_in_process_validation(tmp_path):
+    path = _corpus(tmp_path)
+    assert _invalid(path, workers=2, chunk_bytes=100) == _invalid(path, workers=1, chunk_bytes=100)
+
+
+def test_report_histograms_and_exit_code(tmp_path, capsys):
+    path = _corpus(tmp_path)
+    assert main([path, "--workers", "1", "--json"]) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report["failures_by_field"] == {"duration_seconds": 3}
+    assert sum(report["failures_by_field_and_type"].values()) == 3
@@ -0,0 +1,100 @@
+import io
+import json
+import zipfile
+
+from backends import StubBackend
+from errors import UpstreamError
+from gemini_service import GeminiSchemaEnforcer
+from resilience import RetryPolicy
+from schemas import AspectRatio, Duration, VeoPromptSchema
+from variants import derive, export_zip, needs_reframe
+
+EXAMPLE = VeoPromptSchema.model_config["json_schema_extra"]["example"]
+# 16:9, "medium tracking shot" moving "alongside subject": composed for a horizontal frame
+WIDE = VeoPromptSchema(**EXAMPLE)
+
+
+class BrokenBackend(StubBackend):
+    def __init__(self):
+        super().__init__(latency_seconds=0.0, seed=0)
+
+    async def generate(self, prompt, tools, tool_config):
+        self.calls += 1
+        raise UpstreamError("503 unavailable (test)")
+
+
+def _close_up() -> VeoPromptSchema:
+    data = json.loads(json.dumps(EXAMPLE))
+    data["shot"]["framing"] = "close-up"
+    data["camera_motion"] = {"type": "static", "description": "locked off on the face"}
+    return VeoPromptSchema(**data)
+
+
+def _enforcer(backend):
+    return GeminiSchemaEnforcer(backend=backend, pre_extract=False, retry_policy=RetryPolicy(max_attempts=1))
+
+
+def test_derive_rewrites_only_technical_parameters():
+    variant = derive(WIDE, AspectRatio.VERTICAL, Duration.SHORT)
+    assert (variant.aspect_ratio, variant.duration_seconds) == (AspectRatio.VERTICAL, Duration.SHORT)
+    assert variant.model_dump(exclude={"aspect_ratio", "duration_seconds"}) == \
+        WIDE.model_dump(exclude={"aspect_ratio", "duration_seconds"})
+
+
+def test_reframe_is_needed_only_for_a_shot_composed_for_the_other_orientation():
+    assert needs_reframe(WIDE, AspectRatio.VERTICAL)
+    assert not needs_reframe(WIDE, AspectRatio.WIDESCREEN)
+    assert not needs_reframe(_close_up(), AspectRatio.VERTICAL)
+
+
+def test_safe_variants_are_derived_locally():
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    prompt = _close_up()
+    variants = _enforcer(backend).variants(prompt)
+    assert backend.calls == 0
+    assert [(variant.aspect_ratio, variant.duration) for variant in variants] == [
+        (aspect_ratio, duration) for aspect_ratio in AspectRatio for duration in Duration
+    ]
+    for variant in variants:
+        assert not variant.reframed and variant.note is None
+        assert variant.prompt == derive(prompt, variant.aspect_ratio, variant.duration)
+
+
+def test_orientation_change_is_reframed_once_for_every_duration():
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    variants = _enforcer(backend).variants(WIDE)
+    assert backend.calls == 1
+    vertical = [variant for variant in variants if variant.aspect_ratio == AspectRatio.VERTICAL]
+    assert all(variant.reframed for variant in vertical)
+    assert all(variant.prompt.shot == vertical[0].prompt.shot for variant in vertical)
+    for variant in vertical:
+        assert variant.prompt.aspect_ratio == AspectRatio.VERTICAL
+        assert variant.prompt.duration_seconds == variant.duration
+        assert variant.prompt.subject == WIDE.subject
+    assert not any(variant.reframed for variant in variants if variant.aspect_ratio == AspectRatio.WIDESCREEN)
+
+
+def test_failed_reframe_falls_back_to_the_local_variant():
+    backend = BrokenBackend()
+    variants = _enforcer(backend).variants(WIDE, aspect_ratios=[AspectRatio.VERTICAL], durations=[Duration.LONG])
+    assert backend.calls == 1
+    (variant,) = variants
+    assert not variant.reframed
+    assert "UpstreamError" in variant.note
+    assert variant.prompt == derive(WIDE, AspectRatio.VERTICAL)
+
+
+def test_reframe_can_be_turned_off():
+    backend = StubBackend(latency_seconds=0.0, seed=0)
+    variants = _enforcer(backend).variants(WIDE, durations=[Duration.LONG], reframe=False)
+    assert backend.calls == 0
+    assert [variant.prompt for variant in variants] == [derive(WIDE, ratio) for ratio in AspectRatio]
+
+
+def test_export_zip_has_one_file_per_variant_and_a_manifest():
+    variants = _enforcer(StubBackend(latency_seconds=0.0, seed=0)).variants(_close_up())
+    with zipfile.ZipFile(io.BytesIO(export_zip(variants))) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+        assert len(manifest) == len(variants) == 6
+        first = VeoPromptSchema.model_validate_json(archive.read(manifest[0]["file"]))
+    assert first == variants[0].prompt
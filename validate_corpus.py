@@ -0,0 +1,243 @@
+"""
+Offline re-validation of archived Veo prompts against the current schemas.py.
+
+Validates JSONL files of VeoPromptSchema objects (or, with --response,
+VeoPromptResponse records as written by batch_normalize.py) straight from the
+JSON bytes with the model's compiled validator, without building dicts
+first. Each file is memory-mapped and split into newline-aligned chunks that
+a process pool validates in parallel; workers map the file themselves, so
+only byte offsets and small summaries cross process boundaries. The report
+has per-field failure histograms.
+
+    python validate_corpus.py archive/*.jsonl --workers 8
+    python validate_corpus.py results.jsonl --response --invalid-out invalid.jsonl --json
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from pydantic import ValidationError
+
+from schemas import VeoPromptResponse, VeoPromptSchema
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+MODELS = {"prompt": VeoPromptSchema, "response": VeoPromptResponse}
+
+
+def field_path(loc: tuple) -> str:
+    """Dotted field path of an error location; list indexes collapse to []"""
+    path = ""
+    for part in loc:
+        if isinstance(part, int):
+            path += "[]"
+        else:
+            path += f".{part}" if path else str(part)
+    return path or "<record>"
+
+
+@dataclass
+class ValidationReport:
+    """Counts, per-field failure histograms and timing for one or more files"""
+    records: int = 0
+    valid: int = 0
+    invalid: int = 0
+    bytes: int = 0
+    elapsed_seconds: float = 0.0
+    fields: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def merge(self, chunk: dict):
+        self.records += chunk["records"]
+        self.valid += chunk["records"] - chunk["invalid"]
+        self.invalid += chunk["invalid"]
+        self.bytes += chunk["bytes"]
+        self.fields.update(chunk["fields"])
+        self.errors.update(chunk["errors"])
+
+    def to_dict(self) -> dict:
+        return {
+            "records": self.records,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "bytes": self.bytes,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "records_per_second": round(self.records_per_second, 1),
+            "failures_by_field": dict(self.fields.most_common()),
+            "failures_by_field_and_type": dict(self.errors.most_common()),
+        }
+
+    def format(self, top: int = 20) -> str:
+        lines = [
+            f"Validated {self.records} records ({self.bytes / 1e6:.1f} MB) in {self.elapsed_seconds:.2f}s "
+            f"({self.records_per_second:,.0f} records/s)",
+            f"  valid:   {self.valid}",
+            f"  invalid: {self.invalid}",
+        ]
+        if self.fields:
+            width = max(len(name) for name, _ in self.fields.most_common(top))
+            lines.append("Failures by field:")
+            for name, count in self.fields.most_common(top):
+                bar = "#" * max(1, round(40 * count / self.invalid)) if self.invalid else ""
+                lines.append(f"  {name:<{width}} {count:>8}  {bar}")
+            lines.append("Failures by field and error type:")
+            for name, count in self.errors.most_common(top):
+                lines.append(f"  {name}: {count}")
+        return "\n".join(lines)
+
+
+def chunk_ranges(path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> list:
+    """(start, end) byte ranges of about `chunk_bytes`, each ending after a newline"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = data.find(b"\n", min(size, start + chunk_bytes) - 1)
+            end = size if end == -1 else end + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def validate_chunk(path: str, start: int, end: int, kind: str = "prompt", collect_invalid: bool = False) -> dict:
+    """
+    Validate the lines in [start, end) of a JSONL file. Returns counts,
+    failure histograms and, with collect_invalid, (line index within the
+    chunk, errors) for every invalid record.
+    """
+    validate_json = MODELS[kind].__pydantic_validator__.validate_json
+    records = 0
+    invalid = []
+    invalid_count = 0
+    fields = Counter()
+    errors = Counter()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        index = -1
+        position = start
+        while position < end:
+            newline = data.find(b"\n", position, end)
+            line_end = end if newline == -1 else newline
+            line = data[position:line_end]
+            position = line_end + 1
+            index += 1
+            if not line.strip():
+                continue
+            records += 1
+            try:
+                validate_json(line)
+            except ValidationError as e:
+                invalid_count += 1
+                details = e.errors(include_url=False, include_input=False)
+                paths = set()
+                for detail in details:
+                    path_name = field_path(detail["loc"])
+                    paths.add(path_name)
+                    errors[f"{path_name}: {detail['type']}"] += 1
+                fields.update(paths)
+                if collect_invalid:
+                    invalid.append((index, [
+                        {"field": field_path(detail["loc"]), "type": detail["type"], "message": detail["msg"]}
+                        for detail in details
+                    ]))
+    return {
+        "records": records,
+        "invalid": invalid_count,
+        "bytes": end - start,
+        "lines": index + 1,
+        "fields": fields,
+        "errors": errors,
+        "invalid_records": invalid,
+    }
+
+
+def validate_files(paths: list, kind: str = "prompt", workers: int = None,
+                   chunk_bytes: int = DEFAULT_CHUNK_BYTES, invalid_out=None) -> ValidationReport:
+    """
+    Validate every file, chunk by chunk, over a process pool (in-process when
+    there is a single chunk or workers == 1). Invalid records are written to
+    `invalid_out` as JSON lines with their file and line number.
+    """
+    report = ValidationReport()
+    started = time.perf_counter()
+    tasks = [(path, start, end) for path in paths for start, end in chunk_ranges(path, chunk_bytes)]
+    workers = workers or os.cpu_count() or 1
+    collect = invalid_out is not None
+
+    if workers == 1 or len(tasks) <= 1:
+        results = (validate_chunk(path, start, end, kind, collect) for path, start, end in tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(
+            validate_chunk,
+            *zip(*tasks),
+            [kind] * len(tasks),
+            [collect] * len(tasks)
+        )
+    try:
+        line_offsets = Counter()
+        for (path, _, _), chunk in zip(tasks, results):
+            report.merge(chunk)
+            if collect:
+                for index, details in chunk["invalid_records"]:
+                    invalid_out.write(json.dumps({
+                        "file": path,
+                        "line": line_offsets[path] + index + 1,
+                        "errors": details
+                    }) + "\n")
+            line_offsets[path] += chunk["lines"]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Validate JSONL archives of Veo prompts against schemas.py")
+    parser.add_argument("paths", nargs="+", help="JSONL files, one JSON object per line")
+    parser.add_argument("--response", action="store_true",
+                        help="Records are VeoPromptResponse objects (batch_normalize.py output)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / (1024 * 1024),
+                        help="Bytes of input per worker task, in MB")
+    parser.add_argument("--invalid-out", default=None,
+                        help="Write every invalid record's file, line and errors to this JSONL file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--top", type=int, default=20, help="Fields shown in the histograms")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    invalid_out = open(args.invalid_out, "w", encoding="utf-8") if args.invalid_out else None
+    try:
+        report = validate_files(
+            args.paths,
+            kind="response" if args.response else "prompt",
+            workers=args.workers,
+            chunk_bytes=max(1, int(args.chunk_mb * 1024 * 1024)),
+            invalid_out=invalid_out
+        )
+    finally:
+        if invalid_out is not None:
+            invalid_out.close()
+    print(json.dumps(report.to_dict(), indent=2) if args.json else report.format(args.top))
+    return 1 if report.invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Aspect-ratio and duration variants of a normalized prompt.
+
+Technical parameters (aspect_ratio, duration_seconds) are rewritten locally,
+so a 16:9 / 9:16 x 4s / 6s / 8s matrix costs no extra generation. Only a
+change of orientation whose shot is composed for the other frame (wide,
+establishing, lateral or panning moves) needs creative work; the enforcer
+then re-frames it with one narrow call limited to `shot` and `camera_motion`
+(GeminiSchemaEnforcer.variants), shared by every duration of that orientation.
+"""
+import io
+import json
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from schemas import AspectRatio, Duration, VeoPromptSchema
+
+ORIENTATIONS = {AspectRatio.WIDESCREEN: "landscape", AspectRatio.VERTICAL: "portrait"}
+
+# Shots composed for a horizontal frame that do not survive a vertical crop, and vice versa
+_HORIZONTAL_COMPOSITION = re.compile(
+    r"\b(wide|establishing|panoram\w*|landscape|extreme long|long shot|two[- ]shot|over[- ]the[- ]shoulder"
+    r"|anamorphic|pan(?:s|ning|ned)?|truck(?:s|ing)?|lateral(?:ly)?|side[- ]to[- ]side|sweep(?:s|ing)?"
+    r"|tracking alongside|orbit(?:s|ing)?)\b"
+)
+_VERTICAL_COMPOSITION = re.compile(
+    r"\b(vertical|portrait|full[- ]body|head[- ]to[- ]toe|tilt(?:s|ing|ed)?|crane up|pedestal|selfie)\b"
+)
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One cell of the variant matrix; `reframed` when the shot came from a model call"""
+    aspect_ratio: AspectRatio
+    duration: Duration
+    prompt: VeoPromptSchema
+    reframed: bool = False
+    note: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.aspect_ratio.value.replace(':', 'x')}_{self.duration.value}s"
+
+
+def needs_reframe(prompt: VeoPromptSchema, aspect_ratio: AspectRatio) -> bool:
+    """True when switching to `aspect_ratio` changes orientation and the shot is composed for the old one"""
+    if AspectRatio(prompt.aspect_ratio) == aspect_ratio:
+        return False
+    composition = " ".join(filter(None, (
+        prompt.shot.framing, prompt.shot.lens, prompt.camera_motion.type, prompt.camera_motion.description
+    ))).lower()
+    pattern = _HORIZONTAL_COMPOSITION if aspect_ratio == AspectRatio.VERTICAL else _VERTICAL_COMPOSITION
+    return pattern.search(composition) is not None
+
+
+def derive(prompt: VeoPromptSchema, aspect_ratio: AspectRatio = None, duration: Duration = None) -> VeoPromptSchema:
+    """Copy of `prompt` with only the technical parameters rewritten"""
+    update = {}
+    if aspect_ratio is not None:
+        update["aspect_ratio"] = AspectRatio(aspect_ratio)
+    if duration is not None:
+        update["duration_seconds"] = Duration(duration)
+    return prompt.model_copy(update=update)
+
+
+def variant_matrix(prompt: VeoPromptSchema, aspect_ratios: Iterable[AspectRatio],
+                   durations: Iterable[Duration], bases: Dict[AspectRatio, Variant] = None) -> List[Variant]:
+    """
+    Every aspect ratio x duration combination. `bases` holds a re-framed
+    prompt per aspect ratio (from the model); the others are derived locally.
+    """
+    bases = bases or {}
+    durations = [Duration(duration) for duration in durations]
+    variants = []
+    for aspect_ratio in (AspectRatio(value) for value in aspect_ratios):
+        base = bases.get(aspect_ratio) or Variant(aspect_ratio, Duration(prompt.duration_seconds),
+                                                  derive(prompt, aspect_ratio))
+        for duration in durations:
+            variants.append(Variant(
+                aspect_ratio, duration, derive(base.prompt, duration=duration), base.reframed, base.note
+            ))
+    return variants
+
+
+def export_zip(variants: Iterable[Variant]) -> bytes:
+    """One `veo_prompt_<ratio>_<duration>.json` per variant plus a manifest, as a zip archive"""
+    buffer = io.BytesIO()
+    manifest = []
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for variant in variants:
+            file_name = f"veo_prompt_{variant.name}.json"
+            archive.writestr(file_name, variant.prompt.model_dump_json(indent=2))
+            manifest.append({
+                "file": file_name,
+                "aspect_ratio": variant.aspect_ratio.value,
+                "duration_seconds": variant.duration.value,
+                "reframed": variant.reframed,
+                "note": variant.note,
+            })
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    return buffer.getvalue()